@@ -0,0 +1,70 @@
+"""
+Documentación de la API (Swagger / ReDoc / OpenAPI).
+
+- drf_yasg se importa recién en el primer request a la documentación y no
+  al cargar las URLs, para no sumarlo al arranque de cada worker.
+- El esquema completo (introspección de todos los serializers) se genera
+  una vez por proceso y versión de la API y se reutiliza: solo cambia con
+  un nuevo despliegue. El host y el esquema (http/https) de cada respuesta
+  se toman del request, para que la caché no crezca con cada Host distinto.
+  Las páginas de Swagger UI y ReDoc no lo incluyen, lo piden aparte con
+  `?format=openapi`.
+"""
+
+import copy
+import threading
+from functools import lru_cache
+
+_esquemas = {}
+_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def _vista(ui):
+    from drf_yasg import openapi
+    from drf_yasg.renderers import ReDocRenderer, SwaggerUIRenderer
+    from drf_yasg.views import get_schema_view
+    from rest_framework.response import Response
+
+    SchemaView = get_schema_view(
+        openapi.Info(
+            title="Logística Global API",
+            default_version='v1',
+            description="Documentación de la API Logística",
+        ),
+        public=True,
+    )
+
+    class EsquemaCacheadoView(SchemaView):
+        def get(self, request, version='', format=None):
+            if isinstance(request.accepted_renderer, (SwaggerUIRenderer, ReDocRenderer)):
+                # Página de la UI: no incluye el esquema
+                return super().get(request, version, format)
+            clave = request.version or version or ''
+            esquema = _esquemas.get(clave)
+            if esquema is None:
+                with _lock:
+                    esquema = _esquemas.get(clave)
+                    if esquema is None:
+                        esquema = _esquemas[clave] = super().get(request, version, format).data
+            # El host forma parte del esquema (Swagger 2.0): se completa por respuesta
+            esquema = copy.copy(esquema)
+            esquema['host'] = request.get_host()
+            esquema['schemes'] = [request.scheme]
+            return Response(esquema)
+
+    if ui:
+        return EsquemaCacheadoView.with_ui(ui, cache_timeout=0)
+    return EsquemaCacheadoView.without_ui(cache_timeout=0)
+
+
+def swagger(request, *args, **kwargs):
+    return _vista('swagger')(request, *args, **kwargs)
+
+
+def redoc(request, *args, **kwargs):
+    return _vista('redoc')(request, *args, **kwargs)
+
+
+def esquema(request, *args, **kwargs):
+    return _vista(None)(request, *args, **kwargs)
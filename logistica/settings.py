@@ -10,11 +10,28 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import copy
+import os
 from pathlib import Path
 from datetime import timedelta
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+
+def _env_bool(nombre, defecto=False):
+    """Interpreta una variable de entorno como booleano (1/true/si)."""
+    valor = os.environ.get(nombre)
+    if valor is None:
+        return defecto
+    return valor.strip().lower() in ('1', 'true', 'yes', 'si', 'sí', 'on')
+
+
+def _env_int(nombre, defecto):
+    """Interpreta una variable de entorno como entero."""
+    valor = os.environ.get(nombre)
+    return int(valor) if valor not in (None, '') else defecto
+
+
 SECRET_KEY = 'CÁMBIAME-ESTE-VALOR-ANTES-DE-SUBIR-A-PRODUCCIÓN'
 
 DEBUG = True   # Cambia a False al pasar a producción
@@ -53,6 +70,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'transporte.routers.ReplicaMiddleware',
+    'transporte.auditoria.AuditoriaMiddleware',
 ]
 
 ROOT_URLCONF = 'logistica.urls'
@@ -79,15 +98,111 @@ WSGI_APPLICATION = 'logistica.wsgi.application'
 
 
 # ============================================================
-# BASE DE DATOS (SQLite por ahora, luego PostgreSQL en EC2)
+# BASE DE DATOS
 # ============================================================
+# Configuración leída desde variables de entorno.
+# - Local: SQLite en modo WAL (lecturas concurrentes con una escritura).
+# - Producción (EC2): PostgreSQL con el pool nativo de Django 5
+#   (requiere `psycopg[pool]`) o conexiones persistentes.
+
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite').lower()
+
+if DB_ENGINE in ('postgres', 'postgresql'):
+    DB_POOL = _env_bool('DB_POOL', True)
+    _db_options = {}
+    if DB_POOL:
+        # Pool de psycopg 3: cada worker mantiene entre min_size y max_size
+        # conexiones abiertas y las reutiliza entre requests.
+        _db_options['pool'] = {
+            'min_size': _env_int('DB_POOL_MIN_SIZE', 2),
+            'max_size': _env_int('DB_POOL_MAX_SIZE', 10),
+            'timeout': _env_int('DB_POOL_TIMEOUT', 10),
+        }
+
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'logistica'),
+            'USER': os.environ.get('DB_USER', 'logistica'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            # El pool y CONN_MAX_AGE son excluyentes: con pool, Django exige 0.
+            'CONN_MAX_AGE': 0 if DB_POOL else _env_int('DB_CONN_MAX_AGE', 600),
+            'CONN_HEALTH_CHECKS': not DB_POOL,
+            'OPTIONS': _db_options,
+        }
+    }
+else:
+    DB_POOL = False
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': _env_int('DB_CONN_MAX_AGE', 600),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                # Segundos que una conexión espera un lock antes de fallar
+                # (equivale a PRAGMA busy_timeout).
+                'timeout': _env_int('SQLITE_BUSY_TIMEOUT', 20),
+                # Tomar el lock de escritura al iniciar la transacción evita
+                # "database is locked" al promover una lectura a escritura.
+                'transaction_mode': 'IMMEDIATE',
+                # WAL modifica el archivo de la base y deja db.sqlite3-wal y
+                # db.sqlite3-shm junto a él; la base local no se versiona
+                # (ver .gitignore) y se crea con `python manage.py migrate`.
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                ),
+            },
+            # Los tests usan un archivo y no la base en memoria compartida,
+            # donde las conexiones concurrentes fallan con "table is locked"
+            # en vez de esperar el lock (ver CodigosConcurrenciaTests).
+            'TEST': {'NAME': os.environ.get('DB_TEST_NAME', BASE_DIR / 'test_db.sqlite3')},
+        }
+    }
+
+
+# Réplica de lectura opcional. Se activa definiendo DB_REPLICA_HOST
+# (PostgreSQL) o DB_REPLICA_NAME (p. ej. un segundo archivo SQLite local).
+# Hereda la configuración de `default` y solo sobrescribe lo indicado.
+REPLICA_DB_ALIAS = 'replica'
+REPLICA_PIN_SECONDS = _env_int('DB_REPLICA_PIN_SECONDS', 5)
+
+if os.environ.get('DB_REPLICA_HOST') or os.environ.get('DB_REPLICA_NAME'):
+    DATABASES[REPLICA_DB_ALIAS] = copy.deepcopy(DATABASES['default'])
+    DATABASES[REPLICA_DB_ALIAS].update({
+        'NAME': os.environ.get('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'HOST': os.environ.get('DB_REPLICA_HOST', DATABASES['default'].get('HOST', '')),
+        'PORT': os.environ.get('DB_REPLICA_PORT', DATABASES['default'].get('PORT', '')),
+        # En tests la réplica apunta a la misma base que `default`.
+        'TEST': {'MIRROR': 'default'},
+    })
+
+DATABASE_ROUTERS = ['transporte.routers.ReplicaRouter']
+
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# ============================================================
+# CACHÉ
+# ============================================================
+# Redis si se define REDIS_URL (compartido entre workers de gunicorn);
+# en local, memoria del proceso.
+
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'logistica',
+        }
     }
-}
 
 
 # ============================================================
@@ -123,13 +238,57 @@ STATICFILES_DIRS = [
     BASE_DIR / 'static',
 ]
 
+# JWT_STATELESS=1 autentica con los claims firmados del token, sin leer el
+# usuario de la base en cada request (ver transporte/authentication.py).
+JWT_STATELESS = _env_bool('JWT_STATELESS', False)
+# Segundos que cada proceso reutiliza su copia de las revocaciones (guardadas en la base)
+JWT_REVOCACION_REFRESCO = _env_int('JWT_REVOCACION_REFRESCO', 5)
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'transporte.authentication.JWTSinConsultaAuthentication'
+        if JWT_STATELESS else
+        'transporte.authentication.JWTConRevocacionAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.AllowAny',
     ),
+    # orjson si está instalado; si no, json de la librería estándar
+    'DEFAULT_RENDERER_CLASSES': (
+        'transporte.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'transporte.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+    # Límites por usuario JWT (anónimos por IP) y por endpoint.
+    # Requieren una caché compartida (REDIS_URL) para valer entre workers.
+    'DEFAULT_THROTTLE_CLASSES': (
+        'transporte.throttling.UsuarioThrottle',
+        'transporte.throttling.AnonimoThrottle',
+        'transporte.throttling.EndpointThrottle',
+    ),
+    'DEFAULT_THROTTLE_RATES': {
+        'usuario': os.environ.get('THROTTLE_USUARIO', '2000/min'),
+        'anonimo': os.environ.get('THROTTLE_ANONIMO', '300/min'),
+        'listas': os.environ.get('THROTTLE_LISTAS', '120/min'),
+        'exportaciones': os.environ.get('THROTTLE_EXPORTACIONES', '10/min'),
+        'analitica': os.environ.get('THROTTLE_ANALITICA', '30/min'),
+        'seguimiento': os.environ.get('THROTTLE_SEGUIMIENTO', '1200/min'),
+    },
+    # Cantidad de proxies (Nginx) delante de gunicorn, para tomar la IP real
+    'NUM_PROXIES': _env_int('NUM_PROXIES', 0) or None,
+}
+
+
+SIMPLE_JWT = {
+    # Incluye username, is_staff, is_superuser y permisos en el token
+    'TOKEN_OBTAIN_SERIALIZER': 'transporte.authentication.TokenConClaimsSerializer',
+    'TOKEN_USER_CLASS': 'transporte.authentication.UsuarioToken',
+    # No renueva tokens revocados (cierre de sesión, cambio de permisos)
+    'TOKEN_REFRESH_SERIALIZER': 'transporte.authentication.TokenRefreshConRevocacionSerializer',
 }
 
 
@@ -5,25 +5,13 @@ from django.shortcuts import render
 # Vistas HTML
 from transporte import views as tviews
 
-# Swagger
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
+# Swagger / ReDoc (drf_yasg se carga en el primer request, ver logistica/openapi.py)
+from logistica import openapi
 
 # JWT
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 
-# Configuración de la documentación de la API (Swagger/Redoc)
-schema_view = get_schema_view(
-    openapi.Info(
-        title="Logística Global API",
-        default_version='v1',
-        description="Documentación de la API Logística",
-    ),
-    public=True,
-)
-
-
 urlpatterns = [
 
     # ===========================
@@ -44,13 +32,14 @@ urlpatterns = [
     # ===========================
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('api/token/logout/', tviews.TokenLogoutView.as_view(), name='token_logout'),
 
     # ===========================
     # SWAGGER (Documentación API)
     # ===========================
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='swagger-ui'),
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='redoc-ui'),
-    path('openapi/', schema_view.without_ui(cache_timeout=0), name='openapi-schema'),
+    path('swagger/', openapi.swagger, name='swagger-ui'),
+    path('redoc/', openapi.redoc, name='redoc-ui'),
+    path('openapi/', openapi.esquema, name='openapi-schema'),
 
     # ===========================
     # FRONT-END (HTML)
@@ -0,0 +1,440 @@
+"""
+Analítica de rentabilidad y utilización por ruta.
+
+Dos caminos con la misma salida:
+- `metricas_rutas_sql`: agregados calculados por la base (GROUP BY ruta).
+- `metricas_rutas_numpy`: trae una fila por despacho a arreglos NumPy y
+  agrega vectorizado (`np.bincount`). Se usa para recalcular escenarios
+  "what-if" (costo por km, costo por kg-km) sobre ventanas grandes sin
+  volver a consultar la base por cada escenario.
+
+`despachos_por_ubicacion` agrupa por ubicación de origen y/o destino
+usando las claves enteras de `Ubicacion`.
+
+`pronostico` estima despachos y kg diarios por ruta para las próximas
+semanas (estacionalidad semanal + suavizado exponencial con tendencia).
+
+Los despachos CANCELADO no se consideran. Las cargas adicionales de los
+despachos consolidados suman kg, kg-km e ingresos (y peso al factor de
+carga) a su despacho, que se cuenta una sola vez: se agregan en consultas
+aparte para que el JOIN con la tabla intermedia no repita despachos.
+"""
+
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, FloatField, Sum
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.utils import timezone
+
+from .models import Carga, Despacho, DespachoArchivado, DespachoCarga, Ruta, Ubicacion
+from .versiones import version_tablas
+
+DECIMALES = 4
+
+
+def _despachos(desde, hasta):
+    return Despacho.objects.filter(fecha__gte=desde, fecha__lte=hasta).exclude(estado='CANCELADO')
+
+
+def _capacidad(prefijo=''):
+    # Capacidad del activo asignado (vehículo o aeronave); NULL si no hay
+    return NullIf(Coalesce(f'{prefijo}vehiculo__capacidad_kg', f'{prefijo}aeronave__capacidad_kg'), 0)
+
+
+def _adicionales(despachos):
+    """Cargas adicionales (DespachoCarga) de los despachos del queryset."""
+    return DespachoCarga.objects.filter(despacho__in=despachos.values('pk'))
+
+
+def _redondear(valor):
+    return None if valor is None else round(float(valor), DECIMALES)
+
+
+def _fila(ruta, despachos, peso_kg, kg_km, ingresos, factor_carga):
+    """Arma la fila de salida de una ruta a partir de sus agregados."""
+    km_recorridos = ruta['distancia_km'] * despachos
+    return {
+        "ruta": ruta['id'],
+        "origen": ruta['origen'],
+        "destino": ruta['destino'],
+        "tipo_transporte": ruta['tipo_transporte'],
+        "distancia_km": ruta['distancia_km'],
+        "despachos": int(despachos),
+        "peso_kg": int(peso_kg),
+        "kg_km": int(kg_km),
+        "ingresos": int(ingresos),
+        "ingreso_por_km": _redondear(ingresos / km_recorridos) if km_recorridos else None,
+        "factor_carga_promedio": _redondear(factor_carga),
+    }
+
+
+def metricas_rutas_sql(desde, hasta):
+    """Métricas por ruta calculadas con agregados en la base."""
+    despachos = _despachos(desde, hasta)
+    # El factor de carga promedio es la suma de peso/capacidad de cada
+    # despacho con activo dividida por cuántos son; así las adicionales se
+    # pueden sumar aparte
+    agregados = (
+        despachos
+        .values('ruta_id')
+        .annotate(
+            despachos=Count('id'),
+            peso_kg=Coalesce(Sum('carga__peso_kg'), 0),
+            kg_km=Coalesce(Sum(F('carga__peso_kg') * F('ruta__distancia_km')), 0),
+            ingresos=Coalesce(Sum('carga__valor'), 0),
+            suma_factor=Coalesce(Sum(Cast('carga__peso_kg', FloatField()) / _capacidad()), 0.0),
+            con_activo=Count(_capacidad()),
+        )
+        .order_by()
+    )
+    agregados = {a['ruta_id']: a for a in agregados}
+    adicionales = (
+        _adicionales(despachos)
+        .values('despacho__ruta_id')
+        .annotate(
+            peso_kg=Sum('carga__peso_kg'),
+            kg_km=Sum(F('carga__peso_kg') * F('despacho__ruta__distancia_km')),
+            ingresos=Sum('carga__valor'),
+            suma_factor=Coalesce(
+                Sum(Cast('carga__peso_kg', FloatField()) / _capacidad('despacho__')), 0.0
+            ),
+        )
+        .order_by()
+    )
+    for extra in adicionales:
+        a = agregados[extra.pop('despacho__ruta_id')]
+        for campo, valor in extra.items():
+            a[campo] += valor
+    rutas = Ruta.objects.filter(pk__in=agregados).values(
+        'id', 'origen', 'destino', 'tipo_transporte', 'distancia_km'
+    )
+    return [
+        _fila(
+            ruta, a['despachos'], a['peso_kg'], a['kg_km'], a['ingresos'],
+            a['suma_factor'] / a['con_activo'] if a['con_activo'] else None,
+        )
+        for ruta in rutas
+        for a in (agregados[ruta['id']],)
+    ]
+
+
+def cargar_arreglos(desde, hasta):
+    """
+    Una fila por despacho como arreglos NumPy:
+    ruta, peso_kg, valor (con las cargas adicionales), distancia_km y
+    capacidad (NaN si no hay activo).
+    """
+    despachos = _despachos(desde, hasta)
+    adicionales = {
+        despacho: (peso, valor) for despacho, peso, valor in
+        _adicionales(despachos).values_list('despacho_id').annotate(
+            Sum('carga__peso_kg'), Sum('carga__valor'),
+        ).order_by()
+    }
+    filas = despachos.values_list(
+        'id', 'ruta_id', 'carga__peso_kg', 'carga__valor', 'ruta__distancia_km',
+    ).annotate(capacidad=_capacidad()).order_by()
+    sin_adicionales = (0, 0)
+    datos = np.array(
+        [
+            (r, p + extra[0], v + extra[1], d, np.nan if c is None else c)
+            for i, r, p, v, d, c in filas
+            for extra in (adicionales.get(i, sin_adicionales),)
+        ],
+        dtype=np.float64,
+    ).reshape(-1, 5)
+    return {
+        "ruta": datos[:, 0].astype(np.int64),
+        "peso_kg": datos[:, 1],
+        "valor": datos[:, 2],
+        "distancia_km": datos[:, 3],
+        "capacidad": datos[:, 4],
+    }
+
+
+def metricas_rutas_numpy(arreglos, costo_km=0.0, costo_kg_km=0.0):
+    """
+    Métricas por ruta agregadas con NumPy. Si se indican costos, agrega
+    `costo` y `margen` (ingresos - costo) por ruta.
+    """
+    ids, grupo = np.unique(arreglos["ruta"], return_inverse=True)
+    n = len(ids)
+    kg_km = arreglos["peso_kg"] * arreglos["distancia_km"]
+
+    despachos = np.bincount(grupo, minlength=n)
+    peso = np.bincount(grupo, weights=arreglos["peso_kg"], minlength=n)
+    kgkm = np.bincount(grupo, weights=kg_km, minlength=n)
+    ingresos = np.bincount(grupo, weights=arreglos["valor"], minlength=n)
+    km = np.bincount(grupo, weights=arreglos["distancia_km"], minlength=n)
+
+    # Factor de carga promedio solo sobre despachos con activo asignado
+    factor = arreglos["peso_kg"] / arreglos["capacidad"]
+    con_activo = ~np.isnan(factor)
+    suma_factor = np.bincount(grupo[con_activo], weights=factor[con_activo], minlength=n)
+    cuenta_factor = np.bincount(grupo[con_activo], minlength=n)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        factor_promedio = np.where(cuenta_factor > 0, suma_factor / cuenta_factor, np.nan)
+
+    costo = costo_km * km + costo_kg_km * kgkm
+    calcular_costo = bool(costo_km or costo_kg_km)
+
+    rutas = {
+        r['id']: r for r in Ruta.objects.filter(pk__in=ids.tolist()).values(
+            'id', 'origen', 'destino', 'tipo_transporte', 'distancia_km'
+        )
+    }
+    resultado = []
+    for i, ruta_id in enumerate(ids.tolist()):
+        fila = _fila(
+            rutas[ruta_id], despachos[i], peso[i], kgkm[i], ingresos[i],
+            None if np.isnan(factor_promedio[i]) else factor_promedio[i],
+        )
+        if calcular_costo:
+            fila["costo"] = _redondear(costo[i])
+            fila["margen"] = _redondear(ingresos[i] - costo[i])
+        resultado.append(fila)
+    return resultado
+
+
+# ==========================================
+# POR UBICACIÓN
+# ==========================================
+
+AGRUPACIONES_UBICACION = {
+    'origen': ('origen',),
+    'destino': ('destino',),
+    'par': ('origen', 'destino'),
+}
+
+
+def despachos_por_ubicacion(desde, hasta, agrupar='origen'):
+    """
+    Despachos, kg e ingresos por ubicación de origen, de destino o por par
+    origen-destino (`agrupar`), ordenado por cantidad de despachos.
+    """
+    extremos = AGRUPACIONES_UBICACION[agrupar]
+    columnas = [f'ruta__ubicacion_{extremo}' for extremo in extremos]
+    despachos = _despachos(desde, hasta)
+    agregados = list(
+        despachos
+        .values(*columnas)
+        .annotate(
+            despachos=Count('id'),
+            peso_kg=Coalesce(Sum('carga__peso_kg'), 0),
+            ingresos=Coalesce(Sum('carga__valor'), 0),
+        )
+        .order_by('-despachos', *columnas)
+    )
+    adicionales = {
+        tuple(extra[f'despacho__{columna}'] for columna in columnas): extra
+        for extra in _adicionales(despachos)
+        .values(*(f'despacho__{columna}' for columna in columnas))
+        .annotate(peso_kg=Sum('carga__peso_kg'), ingresos=Sum('carga__valor'))
+        .order_by()
+    }
+    for a in agregados:
+        extra = adicionales.get(tuple(a[columna] for columna in columnas))
+        if extra is not None:
+            a['peso_kg'] += extra['peso_kg']
+            a['ingresos'] += extra['ingresos']
+    ids = {a[columna] for a in agregados for columna in columnas}
+    nombres = dict(Ubicacion.objects.filter(pk__in=ids).values_list('pk', 'nombre'))
+
+    resultado = []
+    for a in agregados:
+        fila = {}
+        for extremo, columna in zip(extremos, columnas):
+            fila[extremo] = a[columna]
+            fila[f'{extremo}_nombre'] = nombres[a[columna]]
+        fila.update(despachos=a['despachos'], peso_kg=a['peso_kg'], ingresos=a['ingresos'])
+        resultado.append(fila)
+    return resultado
+
+
+# ==========================================
+# PRONÓSTICO
+# ==========================================
+
+# Días de historia con que se ajusta el modelo (al menos dos semanas)
+HISTORIA_DIAS = max(14, getattr(settings, 'PRONOSTICO_HISTORIA_DIAS', 182))
+
+# Horizonte que se calcula y se guarda en caché; las consultas piden hasta este máximo
+MAXIMO_DIAS = 90
+
+CACHE_SEGUNDOS = getattr(settings, 'PRONOSTICO_CACHE_SEGUNDOS', 24 * 3600)
+
+# Grilla de parámetros del suavizado; cada serie se queda con la de menor error
+ALFAS = (0.05, 0.1, 0.2, 0.3, 0.5)
+BETAS = (0.01, 0.05, 0.1, 0.2)
+# Amortiguación de la tendencia: evita que se dispare en horizontes largos
+AMORTIGUACION = 0.9
+
+
+def _acumular(matriz, filas, posicion, desde):
+    """Suma filas (ruta_id, fecha, valor) en la matriz ruta x día."""
+    filas = [(posicion[r], (f - desde).days, v) for r, f, v in filas if r in posicion]
+    if filas:
+        fila, columna, valor = (np.array(x) for x in zip(*filas))
+        np.add.at(matriz, (fila, columna), valor.astype(np.float64))
+
+
+def cargar_series(desde, hasta):
+    """
+    Despachos y kg por ruta y día entre `desde` y `hasta` (incluye archivados
+    y cargas adicionales) como matrices NumPy (ruta x día), con consultas
+    agrupadas. Retorna (ids de ruta, despachos, peso_kg).
+    """
+    ids = np.array(sorted(Ruta.objects.values_list('pk', flat=True)), dtype=np.int64)
+    posicion = {ruta: i for i, ruta in enumerate(ids.tolist())}
+    forma = (len(ids), (hasta - desde).days + 1)
+    despachos, peso = np.zeros(forma), np.zeros(forma)
+
+    vigentes = _despachos(desde, hasta)
+    archivados = DespachoArchivado.objects.filter(
+        fecha__gte=desde, fecha__lte=hasta, eliminado_en__isnull=True,
+    ).exclude(estado='CANCELADO')
+    for consulta in (vigentes, archivados):
+        filas = list(consulta.values_list('ruta_id', 'fecha').annotate(
+            despachos=Count('id'), peso_kg=Coalesce(Sum('carga__peso_kg'), 0),
+        ).order_by())
+        _acumular(despachos, [(r, f, n) for r, f, n, _ in filas], posicion, desde)
+        _acumular(peso, [(r, f, kg) for r, f, _, kg in filas], posicion, desde)
+
+    # Cargas adicionales de los despachos consolidados: solo suman kg
+    Intermedia = DespachoArchivado.cargas_adicionales.through
+    adicionales = (
+        DespachoCarga.objects.filter(despacho__in=vigentes).values_list(
+            'despacho__ruta_id', 'despacho__fecha'),
+        Intermedia.objects.filter(despachoarchivado__in=archivados).values_list(
+            'despachoarchivado__ruta_id', 'despachoarchivado__fecha'),
+    )
+    for consulta in adicionales:
+        _acumular(peso, consulta.annotate(peso_kg=Sum('carga__peso_kg')).order_by(), posicion, desde)
+    return ids, despachos, peso
+
+
+def ajustar(series, dia_semana_inicio):
+    """
+    Ajusta todas las series (filas de `series`, una columna por día) a la
+    vez: estacionalidad semanal aditiva y suavizado exponencial con
+    tendencia amortiguada (Holt) sobre la serie desestacionalizada, con
+    los parámetros de la grilla que minimizan el error a un paso de cada
+    serie. Retorna (nivel, tendencia, estacional (serie x día de semana), rmse).
+    """
+    n, dias = series.shape
+    semana = (dia_semana_inicio + np.arange(dias)) % 7
+    estacional = np.stack([series[:, semana == d].mean(axis=1) for d in range(7)], axis=1)
+    estacional -= estacional.mean(axis=1, keepdims=True)
+    desestacionalizada = series - estacional[:, semana]
+
+    # Una fila por combinación de parámetros, una columna por serie
+    alfa, beta = (x.reshape(-1, 1) for x in np.meshgrid(ALFAS, BETAS, indexing='ij'))
+    nivel = np.tile(desestacionalizada[:, :7].mean(axis=1), (alfa.size, 1))
+    tendencia = np.zeros_like(nivel)
+    error_cuadratico = np.zeros_like(nivel)
+    for dia in range(7, dias):
+        previsto = nivel + AMORTIGUACION * tendencia
+        error = desestacionalizada[:, dia] - previsto
+        error_cuadratico += error ** 2
+        nivel = previsto + alfa * error
+        tendencia = AMORTIGUACION * tendencia + alfa * beta * error
+
+    mejor = error_cuadratico.argmin(axis=0)
+    columnas = np.arange(n)
+    rmse = np.sqrt(error_cuadratico[mejor, columnas] / (dias - 7))
+    return nivel[mejor, columnas], tendencia[mejor, columnas], estacional, rmse
+
+
+def proyectar(nivel, tendencia, estacional, dia_semana_inicio, dias):
+    """Valores esperados (serie x día) para los `dias` siguientes, sin negativos."""
+    horizonte = np.arange(1, dias + 1)
+    tendencia_acumulada = np.cumsum(AMORTIGUACION ** horizonte)
+    semana = (dia_semana_inicio + horizonte - 1) % 7
+    valores = nivel[:, None] + tendencia[:, None] * tendencia_acumulada + estacional[:, semana]
+    return np.maximum(valores, 0)
+
+
+def _calcular_pronostico(hoy):
+    desde_historia = hoy - timedelta(days=HISTORIA_DIAS)
+    ids, despachos, peso = cargar_series(desde_historia, hoy - timedelta(days=1))
+    n = len(ids)
+
+    # Despachos y kg de todas las rutas en un solo ajuste
+    series = np.vstack([despachos, peso])
+    nivel, tendencia, estacional, rmse = ajustar(series, desde_historia.weekday())
+    valores = proyectar(nivel, tendencia, estacional, hoy.weekday(), MAXIMO_DIAS)
+
+    rutas = {
+        r['id']: r for r in Ruta.objects.filter(pk__in=ids.tolist()).values(
+            'id', 'origen', 'destino', 'tipo_transporte'
+        )
+    }
+    fechas = [str(hoy + timedelta(days=i)) for i in range(MAXIMO_DIAS)]
+    resultado = {}
+    for i, ruta_id in enumerate(ids.tolist()):
+        ruta = rutas[ruta_id]
+        resultado[ruta_id] = {
+            "ruta": ruta_id,
+            "origen": ruta['origen'],
+            "destino": ruta['destino'],
+            "tipo_transporte": ruta['tipo_transporte'],
+            "historia_despachos": int(despachos[i].sum()),
+            "error_despachos": _redondear(rmse[i]),
+            "error_peso_kg": _redondear(rmse[n + i]),
+            "despachos": np.round(valores[i], 2).tolist(),
+            "peso_kg": np.round(valores[n + i], 1).tolist(),
+        }
+    return {"historia_desde": str(desde_historia), "fechas": fechas, "rutas": resultado}
+
+
+def pronostico(hoy=None):
+    """
+    Pronóstico de `MAXIMO_DIAS` días desde `hoy` para todas las rutas.
+    Se guarda en caché hasta que cambian los despachos, el archivo o las
+    cargas (versión de esas tablas).
+    """
+    hoy = hoy or timezone.localdate()
+    version = version_tablas(Despacho, DespachoArchivado, Carga, Ruta)
+    clave = f"pronostico:{hoy}:{HISTORIA_DIAS}:{version}"
+    resultado = cache.get(clave)
+    if resultado is None:
+        resultado = _calcular_pronostico(hoy)
+        cache.set(clave, resultado, CACHE_SEGUNDOS)
+    return resultado
+
+
+def pronostico_rutas(dias, ruta=None, hoy=None):
+    """
+    Pronóstico diario de los próximos `dias` (hasta `MAXIMO_DIAS`) para
+    todas las rutas o solo para `ruta`, ordenado por despachos esperados.
+    Retorna None si `ruta` no está en los datos leídos (por ejemplo, si aún
+    no llega a la réplica).
+    """
+    datos = pronostico(hoy)
+    fechas = datos["fechas"][:dias]
+    if ruta is None:
+        seleccion = datos["rutas"].values()
+    elif ruta in datos["rutas"]:
+        seleccion = [datos["rutas"][ruta]]
+    else:
+        return None
+    rutas = []
+    for r in seleccion:
+        despachos, peso = r["despachos"][:dias], r["peso_kg"][:dias]
+        fila = {k: v for k, v in r.items() if k not in ("despachos", "peso_kg")}
+        fila["total_despachos"] = round(sum(despachos), 2)
+        fila["total_peso_kg"] = round(sum(peso), 1)
+        fila["dias"] = [
+            {"fecha": f, "despachos": d, "peso_kg": p} for f, d, p in zip(fechas, despachos, peso)
+        ]
+        rutas.append(fila)
+    rutas.sort(key=lambda r: r["total_despachos"], reverse=True)
+    return {
+        "desde": fechas[0],
+        "hasta": fechas[-1],
+        "historia_desde": datos["historia_desde"],
+        "rutas": rutas,
+    }
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class TransporteConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'transporte'
+
+    def ready(self):
+        # Registrar señales (invalidación de cachés por versión de tabla)
+        from . import signals  # noqa: F401
+        # Registrar las tareas disponibles para los workers
+        from . import tareas  # noqa: F401
@@ -0,0 +1,66 @@
+"""
+Archivo de despachos antiguos.
+
+Mueve los despachos cerrados (ENTREGADO/CANCELADO) y los eliminados
+lógicamente con fecha anterior a un corte desde `Despacho` hacia
+`DespachoArchivado`, en lotes con su propia transacción, para que las
+consultas del día a día no recorran años de historial. Las cargas
+adicionales de los despachos consolidados se copian junto con ellos.
+"""
+
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Despacho, DespachoArchivado, DespachoCarga, ESTADOS_CERRADOS
+from .versiones import incrementar_version
+
+CAMPOS = (
+    'id', 'codigo', 'fecha', 'ruta_id', 'carga_id', 'vehiculo_id', 'aeronave_id',
+    'conductor_id', 'piloto_id', 'estado', 'eta', 'atrasado', 'eliminado_en',
+    'consolidado_en_id',
+)
+
+
+def archivables(antes):
+    """Despachos que se pueden archivar con fecha anterior a `antes`."""
+    return Despacho.todos.filter(
+        Q(estado__in=ESTADOS_CERRADOS) | Q(eliminado_en__isnull=False),
+        fecha__lt=antes,
+    )
+
+
+def _copiar_cargas_adicionales(ids):
+    Intermedia = DespachoArchivado.cargas_adicionales.through
+    Intermedia.objects.bulk_create(
+        Intermedia(despachoarchivado_id=despacho_id, carga_id=carga_id)
+        for despacho_id, carga_id in DespachoCarga.objects.filter(
+            despacho_id__in=ids
+        ).values_list('despacho_id', 'carga_id')
+    )
+
+
+def archivar(antes, lote=1000, progreso=None):
+    """
+    Archiva por lotes y retorna la cantidad de despachos movidos.
+    `progreso(movidos, total)` se llama después de cada lote.
+    """
+    total = archivables(antes).count()
+    movidos = 0
+    while True:
+        with transaction.atomic():
+            filas = list(archivables(antes).order_by('pk').values(*CAMPOS)[:lote])
+            if not filas:
+                break
+            ids = [f['id'] for f in filas]
+            for f in filas:
+                f['consolidado_en'] = f.pop('consolidado_en_id')
+            DespachoArchivado.objects.bulk_create(DespachoArchivado(**f) for f in filas)
+            _copiar_cargas_adicionales(ids)
+            Despacho.todos.filter(pk__in=ids).delete()
+        movidos += len(filas)
+        if progreso is not None:
+            progreso(movidos, total)
+
+    if movidos:
+        incrementar_version(DespachoArchivado)
+    return movidos
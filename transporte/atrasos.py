@@ -0,0 +1,67 @@
+"""
+Llegada estimada (ETA) y detección de despachos atrasados.
+
+`Despacho.eta` se calcula al guardar (ver `calcular_eta`). Los cambios que
+no pasan por `save()` (distancia o tipo de una ruta) se propagan con
+`recalcular_eta`. `marcar_atrasados` recorre, por el índice (estado, eta),
+solo los despachos EN_RUTA con eta vencida que aún no estaban marcados, así
+que su costo depende de los atrasos nuevos y no del tamaño de la tabla.
+"""
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import auditoria
+from .models import Despacho, calcular_eta
+from .versiones import incrementar_version
+
+ESTADOS_ABIERTOS = ('PENDIENTE', 'EN_RUTA')
+
+
+def recalcular_eta(ruta):
+    """Actualiza la eta de los despachos abiertos de la ruta; retorna cuántos cambió."""
+    despachos = Despacho.objects.filter(ruta=ruta, estado__in=ESTADOS_ABIERTOS)
+    ahora = timezone.now()
+    actualizados = 0
+    for fecha in despachos.values_list('fecha', flat=True).distinct().order_by():
+        eta = calcular_eta(fecha, ruta.distancia_km, ruta.tipo_transporte)
+        cambios = {'eta': eta}
+        if eta > ahora:
+            cambios['atrasado'] = False
+        actualizados += despachos.filter(fecha=fecha).exclude(eta=eta).update(**cambios)
+    if actualizados:
+        # `update()` no dispara señales
+        incrementar_version(Despacho)
+    return actualizados
+
+
+def atrasados(ahora=None):
+    """Despachos EN_RUTA con eta vencida aún no marcados como atrasados."""
+    return Despacho.objects.filter(
+        estado='EN_RUTA', eta__lt=ahora or timezone.now(), atrasado=False,
+    )
+
+
+def marcar_atrasados(ahora=None, lote=1000, progreso=None):
+    """
+    Marca por lotes los despachos atrasados y retorna cuántos marcó.
+    `progreso(marcados, total)` se llama después de cada lote.
+    """
+    ahora = ahora or timezone.now()
+    total = atrasados(ahora).count()
+    marcados = 0
+    while True:
+        with transaction.atomic():
+            ids = list(atrasados(ahora).order_by('estado', 'eta').values_list('pk', flat=True)[:lote])
+            if not ids:
+                break
+            Despacho.objects.filter(pk__in=ids).update(atrasado=True)
+            for pk in ids:
+                auditoria.registrar(Despacho, pk, 'MODIFICAR', {'atrasado': [False, True]})
+        marcados += len(ids)
+        if progreso is not None:
+            progreso(marcados, total)
+
+    if marcados:
+        incrementar_version(Despacho)
+    return marcados
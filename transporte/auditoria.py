@@ -0,0 +1,225 @@
+"""
+Auditoría de cambios de los modelos de `transporte`.
+
+- `post_init` guarda una copia de los valores con que se cargó cada
+  instancia; `post_save`/`post_delete` la comparan con los valores actuales
+  y registran solo los campos que cambiaron. No se hace ninguna consulta
+  extra para obtener el estado anterior.
+- Los registros se acumulan en un buffer por proceso (solo cuando la
+  transacción confirma) y se escriben con un único `bulk_create`: al
+  terminar cada request (`AuditoriaMiddleware`) o cada trabajo, al llegar a
+  `AUDITORIA_LOTE` registros y al salir del proceso.
+- El usuario se toma del request en curso (también con JWT, ya que DRF
+  asigna `request.user` al request de Django) o del creador del trabajo.
+
+Los many-to-many se registran en el objeto que declara el campo, como
+`{campo: [ids_antes, ids_después]}` (`m2m_changed`).
+
+`Job`, `ClaveIdempotencia` y la propia tabla de auditoría no se auditan. Los cambios masivos
+con `update()` no disparan señales: registrarlos con `registrar()`.
+"""
+
+import atexit
+import contextvars
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save
+from django.utils import timezone
+
+from .models import (
+    ClaveIdempotencia, DespachoCarga, GeneracionTokens, Job, RegistroAuditoria, SecuenciaCodigo,
+    TokenRevocado,
+)
+
+# Registros acumulados a partir de los cuales se escribe sin esperar el fin del request
+LOTE = getattr(settings, 'AUDITORIA_LOTE', 200)
+
+# DespachoCarga es la tabla intermedia de un many-to-many: se audita en el despacho
+EXCLUIDOS = {
+    Job, RegistroAuditoria, ClaveIdempotencia, SecuenciaCodigo, DespachoCarga,
+    GeneracionTokens, TokenRevocado,
+}
+
+_INICIAL = '_auditoria_inicial'
+_RELACIONES = '_auditoria_relaciones'
+
+_request = contextvars.ContextVar('auditoria_request', default=None)
+_usuario = contextvars.ContextVar('auditoria_usuario', default=None)
+
+_lock = threading.Lock()
+_buffer = []
+
+
+# ==========================================
+# USUARIO ACTUAL
+# ==========================================
+
+def _usuario_actual():
+    usuario_id = _usuario.get()
+    if usuario_id is not None:
+        return usuario_id
+    request = _request.get()
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user.pk
+    return None
+
+
+@contextmanager
+def como_usuario(usuario_id):
+    """Atribuye al usuario indicado los cambios hechos dentro del bloque."""
+    token = _usuario.set(usuario_id)
+    try:
+        yield
+    finally:
+        _usuario.reset(token)
+        escribir()
+
+
+class AuditoriaMiddleware:
+    """Expone el request a la auditoría y escribe el buffer al terminar."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _request.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            _request.reset(token)
+            escribir()
+
+
+# ==========================================
+# BUFFER
+# ==========================================
+
+def registrar(modelo, objeto_id, accion, cambios, usuario_id=None):
+    """Agrega un registro al buffer cuando la transacción en curso confirma."""
+    registro = RegistroAuditoria(
+        modelo=modelo._meta.model_name, objeto_id=objeto_id, accion=accion,
+        cambios=cambios, usuario_id=usuario_id if usuario_id is not None else _usuario_actual(),
+        fecha=timezone.now(),
+    )
+    transaction.on_commit(lambda: _agregar(registro))
+
+
+def _agregar(registro):
+    with _lock:
+        _buffer.append(registro)
+        lleno = len(_buffer) >= LOTE
+    if lleno:
+        escribir()
+
+
+def escribir():
+    """Escribe los registros pendientes en un solo INSERT."""
+    global _buffer
+    with _lock:
+        pendientes, _buffer = _buffer, []
+    if pendientes:
+        RegistroAuditoria.objects.bulk_create(pendientes, batch_size=500)
+
+
+atexit.register(escribir)
+
+
+# ==========================================
+# SEÑALES
+# ==========================================
+
+def _valores(instance):
+    # Solo campos cargados: los diferidos no se leen (evita consultas)
+    cargados = instance.__dict__
+    return {
+        f.attname: cargados[f.attname]
+        for f in instance._meta.concrete_fields
+        if not f.primary_key and f.attname in cargados
+    }
+
+
+def _al_cargar(sender, instance, **kwargs):
+    setattr(instance, _INICIAL, _valores(instance))
+
+
+def _al_guardar(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    actuales = _valores(instance)
+    if created:
+        cambios = {campo: [None, valor] for campo, valor in actuales.items() if valor is not None}
+        accion = 'CREAR'
+    else:
+        anteriores = getattr(instance, _INICIAL, {})
+        campos = update_fields if update_fields is not None else actuales
+        cambios = {
+            campo: [anteriores[campo], actuales[campo]]
+            for campo in (instance._meta.get_field(n).attname for n in campos)
+            if campo in anteriores and campo in actuales and anteriores[campo] != actuales[campo]
+        }
+        accion = 'MODIFICAR'
+    # La próxima comparación parte de lo recién guardado
+    setattr(instance, _INICIAL, actuales)
+    if cambios:
+        registrar(sender, instance.pk, accion, cambios)
+
+
+def _al_eliminar(sender, instance, **kwargs):
+    valores = getattr(instance, _INICIAL, None) or _valores(instance)
+    registrar(sender, instance.pk, 'ELIMINAR', {
+        campo: [valor, None] for campo, valor in valores.items() if valor is not None
+    })
+
+
+def _relacionados(campo, pks):
+    """`{pk: [ids relacionados]}` de los objetos indicados, en una consulta."""
+    origen = campo.m2m_field_name() + '_id'
+    destino = campo.m2m_reverse_field_name() + '_id'
+    valores = {pk: [] for pk in pks}
+    pares = campo.remote_field.through._base_manager.filter(
+        **{origen + '__in': pks}
+    ).order_by(destino).values_list(origen, destino)
+    for pk, relacionado in pares:
+        valores[pk].append(relacionado)
+    return valores
+
+
+def _al_cambiar_relacion(campo):
+    """Receptor de `m2m_changed` para un campo: compara los ids antes y después."""
+    def receptor(sender, instance, action, reverse, pk_set, **kwargs):
+        if action.startswith('pre_'):
+            if not reverse:
+                pks = [instance.pk]
+            elif pk_set is not None:
+                pks = list(pk_set)
+            else:
+                pks = list(campo.model._base_manager.filter(
+                    **{campo.name: instance.pk}
+                ).values_list('pk', flat=True))
+            instance.__dict__.setdefault(_RELACIONES, {})[campo.name] = _relacionados(campo, pks)
+            return
+        antes = instance.__dict__.get(_RELACIONES, {}).pop(campo.name, {})
+        despues = _relacionados(campo, list(antes))
+        for pk, ids in antes.items():
+            if ids != despues[pk]:
+                registrar(campo.model, pk, 'MODIFICAR', {campo.name: [ids, despues[pk]]})
+    return receptor
+
+
+def conectar(modelos):
+    """Conecta las señales de auditoría a los modelos indicados."""
+    for modelo in modelos:
+        if modelo in EXCLUIDOS:
+            continue
+        post_init.connect(_al_cargar, sender=modelo, dispatch_uid=f'auditoria_init_{modelo.__name__}')
+        post_save.connect(_al_guardar, sender=modelo, dispatch_uid=f'auditoria_save_{modelo.__name__}')
+        post_delete.connect(_al_eliminar, sender=modelo, dispatch_uid=f'auditoria_delete_{modelo.__name__}')
+        for campo in modelo._meta.local_many_to_many:
+            m2m_changed.connect(
+                _al_cambiar_relacion(campo), sender=campo.remote_field.through, weak=False,
+                dispatch_uid=f'auditoria_m2m_{modelo.__name__}_{campo.name}',
+            )
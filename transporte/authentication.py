@@ -0,0 +1,205 @@
+"""
+Autenticación JWT sin consulta a la base por request.
+
+`JWTAuthentication` de simplejwt carga el `User` desde la base en cada
+request autenticado. Con `JWTSinConsultaAuthentication` se confía en los
+claims firmados que se agregan al emitir el token (`TokenConClaimsSerializer`):
+id, username, is_staff, is_superuser y permisos.
+
+Como el token no se consulta contra la base, las revocaciones se guardan en
+la base (`GeneracionTokens`, `TokenRevocado`), compartida por todos los
+workers:
+
+- Cada token lleva la generación de tokens de su usuario (claim `gen`).
+  `revocar_usuario` la incrementa y rechaza todo lo emitido antes; se usa
+  al desactivar al usuario, al cambiar su contraseña, is_staff,
+  is_superuser, grupos o permisos (ver `transporte.signals`).
+- `revocar_token` rechaza un token puntual (cierre de sesión) hasta que expire.
+
+Cada proceso guarda una copia local de las revocaciones que aún pueden
+afectar a un token vigente y la relee cada `JWT_REVOCACION_REFRESCO`
+segundos; el refresco de tokens consulta la base directamente.
+`JWTConRevocacionAuthentication` aplica la misma revocación cuando sí se
+lee el usuario de la base (JWT_STATELESS desactivado).
+"""
+
+import threading
+import time
+from datetime import datetime, timezone as tz
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework_simplejwt.authentication import (
+    JWTAuthentication, JWTStatelessUserAuthentication,
+)
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import GeneracionTokens, TokenRevocado
+
+
+# ==========================================
+# EMISIÓN DE TOKENS
+# ==========================================
+
+class TokenConClaimsSerializer(TokenObtainPairSerializer):
+    """Agrega al token los datos necesarios para no consultar al usuario."""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token['username'] = user.get_username()
+        token['is_staff'] = user.is_staff
+        token['is_superuser'] = user.is_superuser
+        token['perms'] = sorted(user.get_all_permissions())
+        token['gen'] = generacion(user.pk)
+        return token
+
+
+class UsuarioToken(TokenUser):
+    """Usuario respaldado por el token, con los permisos de sus claims."""
+
+    def get_all_permissions(self, obj=None):
+        return set(self.token.get('perms', ()))
+
+    def has_perm(self, perm, obj=None):
+        return self.is_superuser or perm in self.get_all_permissions()
+
+    def has_perms(self, perm_list, obj=None):
+        return all(self.has_perm(perm, obj) for perm in perm_list)
+
+    def has_module_perms(self, module):
+        return self.is_superuser or any(
+            perm.startswith(f"{module}.") for perm in self.get_all_permissions()
+        )
+
+
+# ==========================================
+# REVOCACIÓN
+# ==========================================
+
+def _duracion_maxima():
+    """Vida del token más largo: una revocación más antigua ya no afecta a ninguno."""
+    return max(jwt_settings.ACCESS_TOKEN_LIFETIME, jwt_settings.REFRESH_TOKEN_LIFETIME)
+
+
+def generacion(user_id):
+    """Generación de tokens vigente del usuario (0 si nunca se revocaron)."""
+    return GeneracionTokens.objects.using(DEFAULT_DB_ALIAS).filter(
+        usuario_id=user_id
+    ).values_list('generacion', flat=True).first() or 0
+
+
+def _leer_revocaciones():
+    ahora = timezone.now()
+    generaciones = GeneracionTokens.objects.using(DEFAULT_DB_ALIAS).filter(
+        modificado__gt=ahora - _duracion_maxima()
+    ).values_list('usuario_id', 'generacion')
+    tokens = TokenRevocado.objects.using(DEFAULT_DB_ALIAS).filter(
+        expira__gt=ahora
+    ).values_list('jti', flat=True)
+    return {
+        'usuarios': {str(usuario): gen for usuario, gen in generaciones},
+        'tokens': set(tokens),
+    }
+
+
+class _Revocaciones:
+    """Copia local (por proceso) de las revocaciones guardadas en la base."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._datos = {'usuarios': {}, 'tokens': set()}
+        self._leido = None
+
+    def actuales(self):
+        refresco = getattr(settings, 'JWT_REVOCACION_REFRESCO', 5)
+        if self._leido is None or time.monotonic() - self._leido > refresco:
+            with self._lock:
+                self._datos = _leer_revocaciones()
+                self._leido = time.monotonic()
+        return self._datos
+
+    def invalidar(self):
+        self._leido = None
+
+
+revocaciones = _Revocaciones()
+
+
+def revocar_usuario(user_id):
+    """Rechaza todos los tokens emitidos al usuario hasta ahora."""
+    ahora = timezone.now()
+    actualizar = GeneracionTokens.objects.filter(usuario_id=user_id)
+    if not actualizar.update(generacion=F('generacion') + 1, modificado=ahora):
+        try:
+            with transaction.atomic():
+                GeneracionTokens.objects.create(usuario_id=user_id, generacion=1)
+        except IntegrityError:
+            # Otro proceso creó la fila al mismo tiempo
+            actualizar.update(generacion=F('generacion') + 1, modificado=ahora)
+    revocaciones.invalidar()
+    transaction.on_commit(revocaciones.invalidar)
+
+
+def revocar_token(token):
+    """Rechaza un token puntual (por su jti) hasta que expire."""
+    expira = datetime.fromtimestamp(token['exp'], tz=tz.utc)
+    TokenRevocado.objects.filter(expira__lte=timezone.now()).delete()
+    TokenRevocado.objects.get_or_create(jti=token[jwt_settings.JTI_CLAIM], defaults={'expira': expira})
+    revocaciones.invalidar()
+    transaction.on_commit(revocaciones.invalidar)
+
+
+def _revocado(token, datos):
+    if token.get(jwt_settings.JTI_CLAIM) in datos['tokens']:
+        return True
+    vigente = datos['usuarios'].get(str(token.get(jwt_settings.USER_ID_CLAIM)), 0)
+    return token.get('gen', 0) < vigente
+
+
+def comprobar_revocacion(token):
+    """Lanza AuthenticationFailed si el token fue revocado (según la copia local)."""
+    if _revocado(token, revocaciones.actuales()):
+        raise AuthenticationFailed("El token fue revocado.", code='token_revoked')
+
+
+class JWTSinConsultaAuthentication(JWTStatelessUserAuthentication):
+    """
+    Autenticación JWT sin consultar la tabla de usuarios.
+    `request.user` es un `UsuarioToken`: para relaciones usar `request.user.pk`.
+    """
+
+    def get_user(self, validated_token):
+        comprobar_revocacion(validated_token)
+        return super().get_user(validated_token)
+
+
+class JWTConRevocacionAuthentication(JWTAuthentication):
+    """`JWTAuthentication` de simplejwt que además rechaza los tokens revocados."""
+
+    def get_user(self, validated_token):
+        comprobar_revocacion(validated_token)
+        return super().get_user(validated_token)
+
+
+class TokenRefreshConRevocacionSerializer(TokenRefreshSerializer):
+    """No renueva refresh tokens revocados (consulta la base, no la copia local)."""
+
+    def validate(self, attrs):
+        refresh = RefreshToken(attrs['refresh'])
+        user_id = refresh.get(jwt_settings.USER_ID_CLAIM)
+        datos = {
+            'usuarios': {str(user_id): generacion(user_id)},
+            'tokens': set(TokenRevocado.objects.using(DEFAULT_DB_ALIAS).filter(
+                jti=refresh.get(jwt_settings.JTI_CLAIM)
+            ).values_list('jti', flat=True)),
+        }
+        if _revocado(refresh, datos):
+            raise InvalidToken("El token fue revocado.")
+        return super().validate(attrs)
@@ -0,0 +1,128 @@
+"""
+Ejecución de varias llamadas a la API en un solo request (POST /batch/).
+
+Cada sub-request se resuelve contra el URLconf y se despacha directamente
+a la vista (sin HTTP), en el mismo hilo y con la misma conexión a la base.
+Solo se aceptan URLs de los ViewSets del router. La autenticación del
+request externo se reutiliza (`ForcedAuthentication` de DRF), así que el
+token o la sesión se validan una sola vez; los permisos y el throttling de
+cada vista se aplican igual que en una llamada normal.
+
+Con `atomico=True` todo corre en una transacción: ante la primera
+respuesta de error se revierte y las solicitudes restantes no se ejecutan
+(status 424).
+"""
+
+import io
+import json
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework.viewsets import ViewSetMixin
+
+MAXIMO = getattr(settings, 'BATCH_MAXIMO', 20)
+
+METODOS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+
+# Headers del request externo que no se trasladan a los sub-requests
+_HEADERS_EXCLUIDOS = ('HTTP_IDEMPOTENCY_KEY', 'HTTP_CONTENT_LENGTH', 'HTTP_CONTENT_TYPE')
+
+
+class SolicitudInvalida(Exception):
+    """Sub-request mal formado o dirigido a una URL no permitida."""
+
+
+class _Revertir(Exception):
+    """Fuerza el rollback del lote atómico."""
+
+
+def _sub_request(request, metodo, url, cuerpo):
+    partes = urlsplit(url)
+    contenido = b'' if cuerpo is None else json.dumps(cuerpo).encode()
+
+    sub = HttpRequest()
+    sub.method = metodo
+    sub.path = sub.path_info = partes.path
+    sub.META = {
+        clave: valor for clave, valor in request.META.items()
+        if (clave.startswith('HTTP_') and clave not in _HEADERS_EXCLUIDOS)
+        or clave in ('REMOTE_ADDR', 'SERVER_NAME', 'SERVER_PORT', 'wsgi.url_scheme')
+    }
+    sub.META.update({
+        'REQUEST_METHOD': metodo,
+        'PATH_INFO': partes.path,
+        'QUERY_STRING': partes.query,
+        'HTTP_ACCEPT': 'application/json',
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(contenido)),
+    })
+    sub.GET = QueryDict(partes.query)
+    sub._stream = io.BytesIO(contenido)
+    sub._read_started = False
+    # Reutilizar la autenticación del request externo
+    sub._force_auth_user = request.user
+    sub._force_auth_token = request.auth
+    return sub
+
+
+def _vista(url):
+    try:
+        coincidencia = resolve(urlsplit(url).path)
+    except Resolver404:
+        raise SolicitudInvalida(f"URL no encontrada: {url}")
+    clase = getattr(coincidencia.func, 'cls', None)
+    if clase is None or not issubclass(clase, ViewSetMixin):
+        raise SolicitudInvalida(f"Solo se admiten URLs de la API (ViewSets): {url}")
+    return coincidencia
+
+
+def _ejecutar(request, solicitud):
+    if not isinstance(solicitud, dict):
+        raise SolicitudInvalida("Cada solicitud debe ser un objeto.")
+    metodo = str(solicitud.get('metodo', 'GET')).upper()
+    url = solicitud.get('url')
+    if metodo not in METODOS:
+        raise SolicitudInvalida(f"Método no admitido: {metodo}")
+    if not isinstance(url, str) or not url.startswith('/'):
+        raise SolicitudInvalida("'url' debe ser una ruta absoluta, p. ej. /rutas/.")
+
+    coincidencia = _vista(url)
+    sub = _sub_request(request, metodo, url, solicitud.get('cuerpo'))
+    response = coincidencia.func(sub, *coincidencia.args, **coincidencia.kwargs)
+    return response.status_code, getattr(response, 'data', None)
+
+
+def ejecutar_lote(request, solicitudes, atomico=False):
+    """Ejecuta las solicitudes en orden y retorna una respuesta por cada una."""
+    respuestas = []
+
+    def procesar():
+        for i, solicitud in enumerate(solicitudes):
+            try:
+                status, cuerpo = _ejecutar(request, solicitud)
+            except SolicitudInvalida as exc:
+                status, cuerpo = 400, {"detail": str(exc)}
+            respuesta = {"status": status, "cuerpo": cuerpo}
+            if isinstance(solicitud, dict) and 'id' in solicitud:
+                respuesta["id"] = solicitud['id']
+            respuestas.append(respuesta)
+            if atomico and status >= 400:
+                for pendiente in solicitudes[i + 1:]:
+                    omitida = {"status": 424, "cuerpo": {"detail": "No ejecutada: el lote se revirtió."}}
+                    if isinstance(pendiente, dict) and 'id' in pendiente:
+                        omitida["id"] = pendiente['id']
+                    respuestas.append(omitida)
+                raise _Revertir()
+
+    if not atomico:
+        procesar()
+        return respuestas
+    try:
+        with transaction.atomic():
+            procesar()
+    except _Revertir:
+        pass
+    return respuestas
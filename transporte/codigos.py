@@ -0,0 +1,126 @@
+"""
+Generación de códigos de despacho en el servidor.
+
+Los números salen de una fila de `SecuenciaCodigo`. En lugar de tocar esa
+fila en cada alta (lo que serializa a todos los workers sobre el mismo
+lock), cada proceso reserva un bloque de `DESPACHO_CODIGO_BLOQUE` números
+en una transacción corta y los entrega desde memoria. Los números de un
+bloque que no se alcanzan a usar (reinicio del proceso) quedan como
+huecos: los códigos son únicos, no correlativos.
+
+Si quien pide está dentro de una transacción, la reserva no puede ir en
+esa transacción: la fila de la secuencia quedaría bloqueada hasta que
+confirme (serializando todas las altas) y, si se revierte, el resto del
+bloque podría repetirse en otro proceso. Por eso se reserva en una
+conexión aparte, en autocommit. En SQLite no se puede (la transacción en
+curso ya tiene el único lock de escritura de la base, y las escrituras ya
+van de a una): ahí se reservan solo los números necesarios dentro de la
+transacción, sin guardar sobrantes.
+
+El formato se configura con `DESPACHO_CODIGO_FORMATO` (por defecto
+"DSP-{numero:08d}"). Los códigos con el prefijo del formato quedan
+reservados para el servidor (ver `DespachoSerializer.validate_codigo`).
+"""
+
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import F
+
+from .models import SecuenciaCodigo
+
+SECUENCIA_DESPACHO = 'despacho'
+FORMATO = getattr(settings, 'DESPACHO_CODIGO_FORMATO', 'DSP-{numero:08d}')
+PREFIJO = FORMATO.split('{', 1)[0]
+BLOQUE = getattr(settings, 'DESPACHO_CODIGO_BLOQUE', 100)
+
+
+def reservar(nombre, cantidad):
+    """
+    Reserva `cantidad` números consecutivos de la secuencia y retorna el
+    primero. Un solo UPDATE: los procesos concurrentes esperan solo lo que
+    dura esta transacción.
+    """
+    alias = router.db_for_write(SecuenciaCodigo)
+    secuencia = SecuenciaCodigo.objects.using(alias).filter(nombre=nombre)
+    with transaction.atomic(using=alias):
+        if not secuencia.update(siguiente=F('siguiente') + cantidad):
+            try:
+                with transaction.atomic(using=alias):
+                    SecuenciaCodigo.objects.using(alias).create(nombre=nombre, siguiente=1 + cantidad)
+                return 1
+            except IntegrityError:
+                # Otro proceso la creó al mismo tiempo
+                secuencia.update(siguiente=F('siguiente') + cantidad)
+        return secuencia.values_list('siguiente', flat=True).get() - cantidad
+
+
+def reservar_aparte(nombre, cantidad):
+    """
+    Como `reservar`, pero en una conexión propia en autocommit: la reserva
+    se confirma al instante aunque quien la pide siga en una transacción.
+    """
+    alias = router.db_for_write(SecuenciaCodigo)
+    conexion = connections.create_connection(alias)
+    tabla = conexion.ops.quote_name(SecuenciaCodigo._meta.db_table)
+    try:
+        with conexion.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {tabla} (nombre, siguiente) VALUES (%s, %s) "
+                f"ON CONFLICT (nombre) DO UPDATE SET siguiente = {tabla}.siguiente + %s "
+                f"RETURNING siguiente",
+                [nombre, 1 + cantidad, cantidad],
+            )
+            return cursor.fetchone()[0] - cantidad
+    finally:
+        conexion.close()
+
+
+class Asignador:
+    """Entrega números de una secuencia desde bloques reservados en memoria."""
+
+    def __init__(self, nombre, bloque=BLOQUE):
+        self.nombre = nombre
+        self.bloque = bloque
+        self.reservas = 0  # Transacciones de reserva hechas por este proceso
+        self._lock = threading.Lock()
+        self._siguiente = self._fin = 0
+
+    def numeros(self, cantidad=1):
+        """Retorna `cantidad` números nuevos (únicos entre procesos)."""
+        conexion = transaction.get_connection(router.db_for_write(SecuenciaCodigo))
+        en_transaccion = conexion.in_atomic_block
+        with self._lock:
+            numeros = []
+            while len(numeros) < cantidad:
+                if self._siguiente >= self._fin:
+                    faltan = cantidad - len(numeros)
+                    if en_transaccion and conexion.vendor == 'sqlite':
+                        # Sin guardar sobrantes: la reserva se revierte con la transacción
+                        inicio = reservar(self.nombre, faltan)
+                        self.reservas += 1
+                        numeros.extend(range(inicio, inicio + faltan))
+                        break
+                    tamano = max(self.bloque, faltan)
+                    reservar_bloque = reservar_aparte if en_transaccion else reservar
+                    self._siguiente = reservar_bloque(self.nombre, tamano)
+                    self._fin = self._siguiente + tamano
+                    self.reservas += 1
+                tomados = min(cantidad - len(numeros), self._fin - self._siguiente)
+                numeros.extend(range(self._siguiente, self._siguiente + tomados))
+                self._siguiente += tomados
+            return numeros
+
+
+asignador_despachos = Asignador(SECUENCIA_DESPACHO)
+
+
+def codigos_despacho(cantidad):
+    """Códigos nuevos para `cantidad` despachos (p. ej. en una importación)."""
+    return [FORMATO.format(numero=numero) for numero in asignador_despachos.numeros(cantidad)]
+
+
+def codigo_despacho():
+    """Código nuevo para un despacho."""
+    return codigos_despacho(1)[0]
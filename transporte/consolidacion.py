@@ -0,0 +1,187 @@
+"""
+Consolidación de cargas en despachos.
+
+Un despacho lleva su `carga` principal y, si se consolidó, otras cargas en
+`cargas_adicionales`. El peso total no puede superar la capacidad del
+vehículo o la aeronave asignada (sin activo, la capacidad no se conoce y
+no se valida).
+
+`consolidar` agrupa los despachos PENDIENTE de una misma ruta y fecha y
+reparte sus cargas en la menor cantidad de despachos (primer ajuste
+decreciente): se llenan primero los despachos con activo, del de mayor
+capacidad al de menor, y lo que no cabe va a uno sin activo. Los despachos
+que quedan vacíos se eliminan lógicamente y apuntan (`consolidado_en`) al
+despacho que se llevó su carga principal; `destino` sigue esa cadena para
+el seguimiento. Una carga que no cabe en ningún activo libre se queda en su
+despacho.
+"""
+
+from collections import defaultdict
+
+from django.db import transaction
+
+from .models import Despacho, DespachoArchivado, DespachoCarga
+
+SIN_LIMITE = float('inf')
+
+
+def capacidad_kg(vehiculo, aeronave):
+    """Capacidad del activo asignado, o None si no hay activo (o no se informó)."""
+    activo = vehiculo or aeronave
+    if activo is None:
+        return None
+    return activo.capacidad_kg or None
+
+
+def validar_capacidad(peso, vehiculo, aeronave):
+    """
+    Mensaje de error si el peso total (kg) supera la capacidad del activo
+    asignado; None si cabe.
+    """
+    capacidad = capacidad_kg(vehiculo, aeronave)
+    if capacidad is not None and peso > capacidad:
+        return f"El peso total ({peso} kg) supera la capacidad de {vehiculo or aeronave} ({capacidad} kg)."
+    return None
+
+
+def _cargas(despacho, adicionales):
+    return [despacho.carga, *adicionales.get(despacho.pk, ())]
+
+
+def planificar(despachos, adicionales):
+    """
+    Reparte las cargas de un grupo de despachos. `adicionales` es
+    `{despacho_id: [cargas]}`. Retorna `{despacho: [cargas]}` con los
+    despachos que se conservan; los demás quedan vacíos.
+    """
+    capacidades = {d.pk: capacidad_kg(d.vehiculo, d.aeronave) for d in despachos}
+    # Primero los activos de mayor capacidad; los despachos sin activo al final
+    candidatos = sorted(
+        despachos, key=lambda d: (capacidades[d.pk] is None, -(capacidades[d.pk] or 0), d.pk)
+    )
+    origen = {carga: d for d in despachos for carga in _cargas(d, adicionales)}
+    cargas = sorted(origen, key=lambda c: (-c.peso_kg, c.pk))
+
+    asignadas = {}
+    libre = {}
+    for carga in cargas:
+        destino = next((d for d in asignadas if libre[d.pk] >= carga.peso_kg), None)
+        if destino is None:
+            destino = next((
+                d for d in candidatos
+                if d not in asignadas and (capacidades[d.pk] or SIN_LIMITE) >= carga.peso_kg
+            ), None) or origen[carga]
+            if destino not in asignadas:
+                asignadas[destino] = []
+                libre[destino.pk] = capacidades[destino.pk] or SIN_LIMITE
+        asignadas[destino].append(carga)
+        libre[destino.pk] -= carga.peso_kg
+    return asignadas
+
+
+def _pendientes(fecha=None, ruta=None):
+    despachos = Despacho.objects.filter(estado='PENDIENTE')
+    if fecha is not None:
+        despachos = despachos.filter(fecha=fecha)
+    if ruta is not None:
+        despachos = despachos.filter(ruta_id=ruta)
+    return despachos
+
+
+def _aplicar(asignadas, vaciados):
+    destinos = {carga: despacho for despacho, cargas in asignadas.items() for carga in cargas}
+    for despacho, cargas in asignadas.items():
+        principal = despacho.carga if despacho.carga in cargas else cargas[0]
+        if principal != despacho.carga:
+            despacho.carga = principal
+            despacho.save(update_fields=['carga'])
+        nuevas = sorted((c for c in cargas if c != principal), key=lambda c: c.pk)
+        despacho.cargas_adicionales.set(nuevas)
+    for despacho in vaciados:
+        despacho.cargas_adicionales.clear()
+        despacho.eliminar(consolidado_en=destinos[despacho.carga])
+
+
+def destino(pk):
+    """
+    Id del despacho (vigente o archivado) que lleva hoy las cargas del
+    despacho `pk` si este se consolidó en otro; None si no se consolidó.
+    """
+    resultado = None
+    vistos = set()
+    while pk not in vistos:
+        vistos.add(pk)
+        siguiente = (
+            Despacho.todos.filter(pk=pk).values_list('consolidado_en_id', flat=True).first()
+            or DespachoArchivado.objects.filter(pk=pk).values_list('consolidado_en', flat=True).first()
+        )
+        if siguiente is None:
+            break
+        resultado = pk = siguiente
+    return resultado
+
+
+def consolidar(fecha=None, ruta=None, simular=False):
+    """
+    Consolida los despachos PENDIENTE por ruta y fecha (opcionalmente solo
+    de una fecha o ruta). Con `simular` retorna el plan sin aplicarlo.
+    """
+    with transaction.atomic():
+        despachos = _pendientes(fecha, ruta).select_related('carga', 'vehiculo', 'aeronave')
+        if not simular:
+            despachos = despachos.select_for_update(of=('self',))
+        despachos = list(despachos.order_by('ruta_id', 'fecha', 'pk'))
+
+        adicionales = defaultdict(list)
+        relaciones = DespachoCarga.objects.filter(
+            despacho__in=_pendientes(fecha, ruta).values('pk')
+        ).select_related('carga').order_by('carga_id')
+        for relacion in relaciones:
+            adicionales[relacion.despacho_id].append(relacion.carga)
+
+        grupos = defaultdict(list)
+        for despacho in despachos:
+            grupos[despacho.ruta_id, despacho.fecha].append(despacho)
+
+        detalle = []
+        for (ruta_id, dia), grupo in grupos.items():
+            if len(grupo) < 2:
+                continue
+            asignadas = planificar(grupo, adicionales)
+            if len(asignadas) == len(grupo):
+                continue
+            vaciados = [d for d in grupo if d not in asignadas]
+            if not simular:
+                _aplicar(asignadas, vaciados)
+            detalle.append(_resumen(ruta_id, dia, grupo, asignadas, vaciados))
+
+    return {
+        "simulado": simular,
+        "grupos": len(detalle),
+        "despachos_antes": sum(g["despachos_antes"] for g in detalle),
+        "despachos_despues": sum(g["despachos_despues"] for g in detalle),
+        "detalle": detalle,
+    }
+
+
+def _resumen(ruta_id, dia, grupo, asignadas, vaciados):
+    conservados = []
+    for despacho, cargas in sorted(asignadas.items(), key=lambda item: item[0].pk):
+        capacidad = capacidad_kg(despacho.vehiculo, despacho.aeronave)
+        peso = sum(c.peso_kg for c in cargas)
+        conservados.append({
+            "despacho": despacho.pk,
+            "codigo": despacho.codigo,
+            "cargas": sorted(c.pk for c in cargas),
+            "peso_kg": peso,
+            "capacidad_kg": capacidad,
+            "excede_capacidad": capacidad is not None and peso > capacidad,
+        })
+    return {
+        "ruta": ruta_id,
+        "fecha": str(dia),
+        "despachos_antes": len(grupo),
+        "despachos_despues": len(asignadas),
+        "conservados": conservados,
+        "eliminados": [d.pk for d in vaciados],
+    }
@@ -0,0 +1,147 @@
+"""
+Índice espacial en memoria sobre las coordenadas de `Ubicacion`.
+
+Grilla de celdas de `CELDA_GRADOS` grados: una consulta por radio solo
+revisa las ubicaciones de las celdas que cubren el círculo y luego filtra
+por distancia real (haversine). No requiere PostGIS, así que funciona
+igual sobre SQLite.
+
+El índice es por proceso:
+- los cambios hechos en el propio proceso se aplican de forma incremental
+  (señales de `Ubicacion`);
+- si la versión de la tabla (`transporte.versiones`) avanzó por cambios de
+  otro proceso, se recarga completo en la siguiente consulta.
+"""
+
+import math
+import threading
+
+from .models import Ubicacion
+from .versiones import version_tabla
+
+RADIO_TIERRA_KM = 6371.0088
+CELDA_GRADOS = 0.5
+_COLUMNAS = int(360 / CELDA_GRADOS)
+
+
+def distancia_km(lat1, lon1, lat2, lon2):
+    """Distancia de gran círculo (haversine) entre dos puntos."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dlat, dlon = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dlon / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _celda(lat, lon):
+    return math.floor(lat / CELDA_GRADOS), math.floor(lon / CELDA_GRADOS) % _COLUMNAS
+
+
+class IndiceEspacial:
+    """Grilla {celda: {id: (lat, lon)}} de las ubicaciones con coordenadas."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._celdas = {}
+        self._puntos = {}
+        self._version = None
+
+    # ------------------------------------------
+    # Mantenimiento
+    # ------------------------------------------
+
+    def _cargar(self):
+        version = version_tabla(Ubicacion)
+        filas = Ubicacion.objects.filter(
+            latitud__isnull=False, longitud__isnull=False,
+        ).values_list('pk', 'latitud', 'longitud')
+        self._celdas, self._puntos = {}, {}
+        for pk, lat, lon in filas:
+            self._agregar(pk, lat, lon)
+        self._version = version
+
+    def _agregar(self, pk, lat, lon):
+        self._puntos[pk] = (lat, lon)
+        self._celdas.setdefault(_celda(lat, lon), {})[pk] = (lat, lon)
+
+    def _quitar(self, pk):
+        punto = self._puntos.pop(pk, None)
+        if punto is not None:
+            celda = _celda(*punto)
+            self._celdas[celda].pop(pk, None)
+            if not self._celdas[celda]:
+                del self._celdas[celda]
+
+    def _vigente(self):
+        with self._lock:
+            if self._version != version_tabla(Ubicacion):
+                self._cargar()
+
+    def actualizar(self, pk, latitud=None, longitud=None):
+        """
+        Aplica un cambio local sin recargar todo el índice. Sin coordenadas
+        (o si la ubicación se eliminó) la quita del índice.
+        """
+        with self._lock:
+            if self._version is None:
+                return  # Aún no se cargó: lo hará la primera consulta
+            esperada = self._version
+            self._quitar(pk)
+            if latitud is not None and longitud is not None:
+                self._agregar(pk, latitud, longitud)
+            # La señal de versiones ya incrementó la tabla: si solo avanzó
+            # por este cambio, el índice sigue al día; si no, se recargará.
+            if version_tabla(Ubicacion) == esperada + 1:
+                self._version = esperada + 1
+
+    # ------------------------------------------
+    # Consultas
+    # ------------------------------------------
+
+    def en_radio(self, lat, lon, radio_km):
+        """[(id, distancia_km)] de las ubicaciones a `radio_km` o menos, de la más cercana."""
+        self._vigente()
+        with self._lock:
+            resultado = [
+                (pk, d) for pk, (plat, plon) in self._candidatos(lat, lon, radio_km)
+                for d in (distancia_km(lat, lon, plat, plon),) if d <= radio_km
+            ]
+        resultado.sort(key=lambda r: r[1])
+        return resultado
+
+    def mas_cercanas(self, lat, lon, k):
+        """[(id, distancia_km)] de las `k` ubicaciones más cercanas."""
+        radio = 50.0
+        while True:
+            encontradas = self.en_radio(lat, lon, radio)
+            if len(encontradas) >= k or radio >= math.pi * RADIO_TIERRA_KM:
+                return encontradas[:k]
+            radio *= 4
+
+    def _candidatos(self, lat, lon, radio_km):
+        dlat = math.degrees(radio_km / RADIO_TIERRA_KM)
+        filas = range(
+            math.floor(max(-90.0, lat - dlat) / CELDA_GRADOS),
+            math.floor(min(90.0, lat + dlat) / CELDA_GRADOS) + 1,
+        )
+        # Extensión en longitud del círculo; cubre todo si incluye un polo
+        seno = math.sin(min(math.pi / 2, radio_km / RADIO_TIERRA_KM)) / max(
+            1e-12, math.cos(math.radians(lat)))
+        if abs(lat) + dlat >= 90 or seno >= 1:
+            columnas = range(_COLUMNAS)
+        else:
+            dlon = math.degrees(math.asin(seno))
+            desde = math.floor((lon - dlon) / CELDA_GRADOS)
+            columnas = [c % _COLUMNAS for c in range(desde, math.floor((lon + dlon) / CELDA_GRADOS) + 1)]
+
+        if len(filas) * len(columnas) > len(self._celdas):
+            # Radio muy grande: más barato recorrer las celdas ocupadas
+            for (fila, _), puntos in self._celdas.items():
+                if fila in filas:
+                    yield from puntos.items()
+            return
+        for fila in filas:
+            for columna in columnas:
+                yield from self._celdas.get((fila, columna), {}).items()
+
+
+indice = IndiceEspacial()
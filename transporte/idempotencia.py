@@ -0,0 +1,133 @@
+"""
+Soporte del header `Idempotency-Key` en los POST de la API.
+
+El primer request con una clave reserva una fila `ClaveIdempotencia`
+(restricción única por propietario y clave, así que de dos requests
+concurrentes solo uno la obtiene) y, al terminar, guarda su respuesta. Los
+reintentos con la misma clave reciben esa respuesta con el header
+`Idempotent-Replayed: true`; si el primero sigue en curso, esperan hasta
+`IDEMPOTENCIA_ESPERA` segundos antes de responder 409.
+
+- Reusar una clave con otro cuerpo o en otro endpoint responde 422.
+- Los errores (excepciones, como las de validación, y respuestas 5xx) no
+  se guardan: el reintento se vuelve a procesar.
+- Las claves vencen a las `IDEMPOTENCIA_DURACION` segundos (24 h).
+"""
+
+import hashlib
+import random
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.throttling import BaseThrottle
+
+from .models import ClaveIdempotencia
+
+HEADER = 'Idempotency-Key'
+
+DURACION = getattr(settings, 'IDEMPOTENCIA_DURACION', 24 * 3600)
+ESPERA = getattr(settings, 'IDEMPOTENCIA_ESPERA', 10)
+INTERVALO = 0.05
+
+# Probabilidad de purgar claves vencidas en cada reserva
+PURGA = 0.01
+
+
+def _propietario(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f"u{user.pk}"
+    return f"ip{BaseThrottle().get_ident(request)}"
+
+
+def _huella(request):
+    digest = hashlib.sha256(f"{request.method} {request.path}\n".encode())
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def _reservar(propietario, clave, huella):
+    """Crea la fila en curso; retorna None si la clave ya existe."""
+    ahora = timezone.now()
+    if random.random() < PURGA:
+        ClaveIdempotencia.objects.filter(expira__lt=ahora).delete()
+    try:
+        with transaction.atomic():
+            return ClaveIdempotencia.objects.create(
+                propietario=propietario, clave=clave, huella=huella,
+                expira=ahora + timedelta(seconds=DURACION),
+            )
+    except IntegrityError:
+        return None
+
+
+def _repetir(registro):
+    response = Response(registro.respuesta, status=registro.status_code)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotente(request, procesar):
+    """
+    Ejecuta `procesar()` (que retorna un Response) una sola vez por
+    `Idempotency-Key`. Sin el header, simplemente lo ejecuta.
+    """
+    clave = request.headers.get(HEADER)
+    if not clave:
+        return procesar()
+    if len(clave) > 255:
+        return Response({"detail": f"{HEADER} admite hasta 255 caracteres."},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    propietario, huella = _propietario(request), _huella(request)
+    limite = time.monotonic() + ESPERA
+    while True:
+        reserva = _reservar(propietario, clave, huella)
+        if reserva is not None:
+            break
+        registro = ClaveIdempotencia.objects.filter(propietario=propietario, clave=clave).first()
+        if registro is None:
+            continue  # Se liberó entre el INSERT y la lectura: reintentar la reserva
+        if registro.expira < timezone.now():
+            registro.delete()
+            continue
+        if registro.huella != huella:
+            return Response(
+                {"detail": f"{HEADER} ya se usó con otra solicitud."},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        if registro.completa:
+            return _repetir(registro)
+        if time.monotonic() >= limite:
+            return Response(
+                {"detail": f"La solicitud con este {HEADER} todavía se está procesando."},
+                status=status.HTTP_409_CONFLICT,
+            )
+        time.sleep(INTERVALO)
+
+    try:
+        response = procesar()
+    except Exception:
+        reserva.delete()
+        raise
+
+    if response.status_code >= 500:
+        reserva.delete()
+        return response
+    reserva.completa = True
+    reserva.status_code = response.status_code
+    reserva.respuesta = response.data
+    reserva.save(update_fields=['completa', 'status_code', 'respuesta'])
+    return response
+
+
+class IdempotenciaMixin:
+    """Mixin para ViewSets: `create` respeta el header `Idempotency-Key`."""
+
+    def create(self, request, *args, **kwargs):
+        return idempotente(request, lambda: super(IdempotenciaMixin, self).create(request, *args, **kwargs))
@@ -0,0 +1,211 @@
+"""
+Subsistema de trabajos en segundo plano.
+
+- `tarea(nombre)`: registra una función como tipo de trabajo.
+- `encolar(tipo, **parametros)`: crea un `Job` pendiente.
+- `reclamar(worker)`: toma el siguiente trabajo disponible. En PostgreSQL usa
+  `SELECT ... FOR UPDATE SKIP LOCKED`; en SQLite, un UPDATE condicional
+  (compare-and-swap) sobre el estado.
+- `ejecutar(job)`: corre la tarea y registra resultado, error o reintento.
+  Mientras corre, un hilo renueva el latido del trabajo; el resultado solo
+  se guarda si el trabajo sigue asignado a este worker.
+
+Las tareas reciben el `Job` como primer argumento y los parámetros como
+keywords; pueden informar avance con `job.reportar_progreso(actual, total)`.
+"""
+
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .auditoria import como_usuario
+from .models import Job
+
+# Segundos sin latido tras los cuales un trabajo EN_PROCESO se considera
+# abandonado (worker caído) y vuelve a la cola.
+LATIDO_TIMEOUT = getattr(settings, 'JOBS_LATIDO_TIMEOUT', 600)
+
+# Cada cuántos segundos renueva el latido el worker mientras corre una tarea
+LATIDO_INTERVALO = getattr(settings, 'JOBS_LATIDO_INTERVALO', LATIDO_TIMEOUT / 4)
+
+# Espera base entre reintentos: 30s, 60s, 120s, ...
+REINTENTO_BASE = getattr(settings, 'JOBS_REINTENTO_BASE', 30)
+
+_TAREAS = {}
+
+
+def tarea(nombre):
+    """Decorador que registra una función como tipo de trabajo."""
+    def registrar(funcion):
+        _TAREAS[nombre] = funcion
+        return funcion
+    return registrar
+
+
+def tareas_registradas():
+    """Nombres de los tipos de trabajo disponibles."""
+    return sorted(_TAREAS)
+
+
+def encolar(tipo, usuario=None, max_intentos=3, **parametros):
+    """Crea un trabajo pendiente del tipo indicado."""
+    if tipo not in _TAREAS:
+        raise ValueError(f"Tipo de trabajo desconocido: {tipo}")
+    return Job.objects.create(
+        tipo=tipo, parametros=parametros, max_intentos=max_intentos,
+        creado_por_id=usuario.pk if usuario is not None and usuario.is_authenticated else None,
+    )
+
+
+# ==========================================
+# RECLAMO DE TRABAJOS
+# ==========================================
+
+def _pendientes():
+    return Job.objects.filter(
+        estado='PENDIENTE', disponible_desde__lte=timezone.now()
+    ).order_by('disponible_desde', 'id')
+
+
+def reclamar(worker):
+    """
+    Marca como EN_PROCESO el siguiente trabajo disponible y lo retorna,
+    o None si la cola está vacía.
+    """
+    if connection.features.has_select_for_update_skip_locked:
+        return _reclamar_skip_locked(worker)
+    return _reclamar_condicional(worker)
+
+
+def _reclamar_skip_locked(worker):
+    # Cada worker salta las filas bloqueadas por otro: sin esperas ni dobles reclamos
+    with transaction.atomic():
+        job = _pendientes().select_for_update(skip_locked=True).first()
+        if job is None:
+            return None
+        ahora = timezone.now()
+        job.estado = 'EN_PROCESO'
+        job.intentos += 1
+        job.worker = worker
+        job.iniciado = job.latido = ahora
+        job.save(update_fields=['estado', 'intentos', 'worker', 'iniciado', 'latido'])
+        return job
+
+
+def _reclamar_condicional(worker, candidatos=5):
+    # Sin SKIP LOCKED (SQLite): el UPDATE solo afecta la fila si sigue
+    # PENDIENTE, así que de dos workers compitiendo solo uno gana.
+    for pk in _pendientes().values_list('pk', flat=True)[:candidatos]:
+        ahora = timezone.now()
+        tomado = Job.objects.filter(pk=pk, estado='PENDIENTE').update(
+            estado='EN_PROCESO', intentos=F('intentos') + 1, worker=worker,
+            iniciado=ahora, latido=ahora,
+        )
+        if tomado:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def recuperar_abandonados():
+    """
+    Devuelve a la cola los trabajos cuyo worker dejó de dar señales, o los
+    marca FALLIDO si ya agotaron sus intentos. Retorna cuántos volvieron a
+    la cola.
+    """
+    ahora = timezone.now()
+    abandonados = Job.objects.filter(
+        estado='EN_PROCESO', latido__lt=ahora - timedelta(seconds=LATIDO_TIMEOUT)
+    )
+    abandonados.filter(intentos__gte=F('max_intentos')).update(
+        estado='FALLIDO', worker='', terminado=ahora,
+        error="El worker dejó de dar señales y no quedan intentos.",
+    )
+    return abandonados.filter(intentos__lt=F('max_intentos')).update(
+        estado='PENDIENTE', worker='', disponible_desde=ahora,
+    )
+
+
+def _asignado(job):
+    """Filtro del trabajo mientras siga EN_PROCESO en el worker que lo reclamó."""
+    return Job.objects.filter(pk=job.pk, estado='EN_PROCESO', worker=job.worker)
+
+
+class _Latido(threading.Thread):
+    """Renueva `Job.latido` cada `LATIDO_INTERVALO` segundos hasta `detener()`."""
+
+    def __init__(self, job):
+        super().__init__(name=f"latido-job-{job.pk}", daemon=True)
+        self.job = job
+        self._detenido = threading.Event()
+
+    def run(self):
+        try:
+            while not self._detenido.wait(LATIDO_INTERVALO):
+                if not _asignado(self.job).update(latido=timezone.now()):
+                    break  # Otro worker lo recuperó: no hay latido que mantener
+        finally:
+            # El hilo tiene su propia conexión
+            connection.close()
+
+    def detener(self):
+        self._detenido.set()
+        self.join()
+
+
+# ==========================================
+# EJECUCIÓN
+# ==========================================
+
+def ejecutar(job):
+    """Ejecuta un trabajo ya reclamado y registra su resultado."""
+    funcion = _TAREAS.get(job.tipo)
+    latido = _Latido(job)
+    latido.start()
+    try:
+        try:
+            if funcion is None:
+                raise ValueError(f"Tipo de trabajo desconocido: {job.tipo}")
+            # Los cambios hechos por la tarea se auditan a nombre de quien la encoló
+            with como_usuario(job.creado_por_id):
+                resultado = funcion(job, **job.parametros)
+        finally:
+            latido.detener()
+    except Exception:
+        _registrar_fallo(job, traceback.format_exc())
+        return job
+
+    job.estado = 'COMPLETADO'
+    job.progreso = 100
+    job.resultado = resultado
+    job.error = ''
+    job.terminado = timezone.now()
+    _guardar_final(job, ['estado', 'progreso', 'resultado', 'error', 'terminado'])
+    return job
+
+
+def _registrar_fallo(job, detalle):
+    job.error = detalle
+    if job.intentos < job.max_intentos:
+        # Reintento con espera exponencial
+        job.estado = 'PENDIENTE'
+        job.disponible_desde = timezone.now() + timedelta(
+            seconds=REINTENTO_BASE * 2 ** (job.intentos - 1)
+        )
+    else:
+        job.estado = 'FALLIDO'
+        job.terminado = timezone.now()
+    _guardar_final(job, ['estado', 'error', 'disponible_desde', 'terminado'])
+
+
+def _guardar_final(job, campos):
+    """
+    Guarda el estado final solo si el trabajo sigue asignado a este worker;
+    si se dio por abandonado y otro lo reclamó, el estado es de ese otro.
+    """
+    if not _asignado(job).update(**{campo: getattr(job, campo) for campo in campos}):
+        job.refresh_from_db()
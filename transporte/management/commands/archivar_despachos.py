@@ -0,0 +1,39 @@
+"""
+Mueve los despachos cerrados antiguos a la tabla de archivo.
+
+Uso:
+    python manage.py archivar_despachos --antes 2024-01-01 --lote 1000
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from transporte.archivo import archivables, archivar
+
+
+class Command(BaseCommand):
+    help = "Archiva los despachos ENTREGADO/CANCELADO (o eliminados) anteriores a una fecha."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--antes', required=True, help="Fecha de corte (YYYY-MM-DD), exclusiva.")
+        parser.add_argument('--lote', type=int, default=1000, help="Despachos por transacción.")
+        parser.add_argument('--simular', action='store_true',
+                            help="Solo informar cuántos despachos se archivarían.")
+
+    def handle(self, *args, **options):
+        try:
+            antes = parse_date(options['antes'])
+        except ValueError:
+            antes = None
+        if antes is None:
+            raise CommandError("--antes debe tener formato YYYY-MM-DD.")
+
+        if options['simular']:
+            self.stdout.write(f"{archivables(antes).count()} despachos se archivarían.")
+            return
+
+        movidos = archivar(
+            antes, lote=options['lote'],
+            progreso=lambda movidos, total: self.stdout.write(f"  {movidos}/{total}"),
+        )
+        self.stdout.write(self.style.SUCCESS(f"{movidos} despachos archivados."))
@@ -0,0 +1,31 @@
+"""
+Marca como atrasados los despachos EN_RUTA cuya llegada estimada ya pasó.
+Pensado para ejecutarse periódicamente (cron).
+
+Uso:
+    python manage.py detectar_atrasos --lote 1000
+"""
+
+from django.core.management.base import BaseCommand
+
+from transporte.atrasos import atrasados, marcar_atrasados
+
+
+class Command(BaseCommand):
+    help = "Marca los despachos EN_RUTA con llegada estimada vencida."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=1000, help="Despachos por transacción.")
+        parser.add_argument('--simular', action='store_true',
+                            help="Solo informar cuántos despachos se marcarían.")
+
+    def handle(self, *args, **options):
+        if options['simular']:
+            self.stdout.write(f"{atrasados().count()} despachos se marcarían como atrasados.")
+            return
+
+        marcados = marcar_atrasados(
+            lote=options['lote'],
+            progreso=lambda marcados, total: self.stdout.write(f"  {marcados}/{total}"),
+        )
+        self.stdout.write(self.style.SUCCESS(f"{marcados} despachos marcados como atrasados."))
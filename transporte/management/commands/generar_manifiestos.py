@@ -0,0 +1,40 @@
+"""
+Genera en un ZIP los manifiestos del día por vehículo y por aeronave.
+
+Uso:
+    python manage.py generar_manifiestos --fecha 2024-05-10 --salida manifiestos.zip --procesos 4
+
+Sin --fecha se usan los despachos de hoy.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from transporte.manifiestos import generar
+
+
+class Command(BaseCommand):
+    help = "Genera los manifiestos de despachos de una fecha (HTML imprimible, en un ZIP)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fecha', help="Fecha de los despachos (YYYY-MM-DD); por defecto, hoy.")
+        parser.add_argument('--salida', help="Archivo ZIP; por defecto manifiestos-<fecha>.zip.")
+        parser.add_argument('--procesos', type=int, default=None,
+                            help="Procesos para renderizar; por defecto, uno por CPU.")
+
+    def handle(self, *args, **options):
+        try:
+            fecha = parse_date(options['fecha']) if options['fecha'] else timezone.localdate()
+        except ValueError:
+            fecha = None
+        if fecha is None:
+            raise CommandError("--fecha debe tener formato YYYY-MM-DD.")
+
+        salida = options['salida'] or f"manifiestos-{fecha}.zip"
+        resumen = generar(fecha, salida, procesos=options['procesos'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{resumen['manifiestos']} manifiestos ({resumen['despachos']} despachos, "
+            f"{resumen['paginas']} páginas) en {salida}: {resumen['segundos']} s, "
+            f"{resumen['paginas_por_segundo']} páginas/s."
+        ))
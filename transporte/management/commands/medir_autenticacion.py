@@ -0,0 +1,75 @@
+"""
+Benchmark de requests autenticados con JWT.
+
+Compara `JWTAuthentication` (lee el usuario de la base en cada request)
+con `JWTSinConsultaAuthentication` (confía en los claims del token), sobre
+una vista mínima que exige autenticación.
+
+Uso:
+    python manage.py medir_autenticacion --requests 3000
+
+El usuario de prueba se crea dentro de una transacción que se revierte.
+"""
+
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from transporte.authentication import JWTSinConsultaAuthentication, TokenConClaimsSerializer
+
+
+class _Revertir(Exception):
+    """Fuerza el rollback del usuario de prueba."""
+
+
+def _vista(autenticacion):
+    class Vista(APIView):
+        authentication_classes = [autenticacion]
+        permission_classes = [IsAuthenticated]
+        throttle_classes = []
+
+        def get(self, request):
+            return Response({"usuario": request.user.pk})
+
+    return Vista.as_view()
+
+
+class Command(BaseCommand):
+    help = "Mide requests/segundo autenticados con JWT con y sin consulta del usuario."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        total = options['requests']
+        try:
+            with transaction.atomic():
+                usuario = get_user_model().objects.create_user('bench-jwt', password='x')
+                token = str(TokenConClaimsSerializer.get_token(usuario).access_token)
+                factory = APIRequestFactory()
+
+                for nombre, clase in (("JWTAuthentication", JWTAuthentication),
+                                      ("JWTSinConsultaAuthentication", JWTSinConsultaAuthentication)):
+                    vista = _vista(clase)
+                    request = factory.get('/bench/', HTTP_AUTHORIZATION=f"Bearer {token}")
+                    with CaptureQueriesContext(connection) as consultas:
+                        inicio = time.perf_counter()
+                        for _ in range(total):
+                            respuesta = vista(request)
+                        duracion = time.perf_counter() - inicio
+                    assert respuesta.status_code == 200, respuesta.data
+                    self.stdout.write(
+                        f"{nombre:<30} {total / duracion:>9,.0f} req/s "
+                        f"| {len(consultas) / total:.1f} consultas/request"
+                    )
+                raise _Revertir
+        except _Revertir:
+            pass
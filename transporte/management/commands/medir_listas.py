@@ -0,0 +1,100 @@
+"""
+Benchmark de serialización de las listas de la API.
+
+Compara filas/segundo para `/despachos/` y `/cargas/` entre:
+- antes: ModelSerializer + JSONRenderer de DRF (camino original)
+- después: FilaSerializer (`.values()`) + ORJSONRenderer
+
+Uso:
+    python manage.py medir_listas --filas 5000 --repeticiones 5
+
+Los datos sintéticos se crean dentro de una transacción que se revierte
+al terminar, por lo que la base no queda modificada.
+"""
+
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from transporte.models import Carga, Cliente, Despacho, Ruta, Vehiculo
+from transporte.renderers import ORJSONRenderer, orjson
+from transporte.serializers import (
+    CargaFilaSerializer, CargaSerializer, DespachoFilaSerializer, DespachoSerializer,
+)
+
+
+class _Revertir(Exception):
+    """Fuerza el rollback de los datos sintéticos."""
+
+
+class Command(BaseCommand):
+    help = "Mide filas/segundo de las listas /despachos/ y /cargas/ antes y después."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, default=2000,
+                            help="Despachos (y cargas) sintéticos a crear.")
+        parser.add_argument('--repeticiones', type=int, default=3,
+                            help="Repeticiones por medición (se toma la mejor).")
+
+    def handle(self, *args, **options):
+        filas = options['filas']
+        repeticiones = options['repeticiones']
+
+        if orjson is None:
+            self.stdout.write(self.style.WARNING(
+                "orjson no está instalado: el renderer usa json de la librería estándar."
+            ))
+
+        try:
+            with transaction.atomic():
+                self._crear_datos(filas)
+                casos = [
+                    ("/despachos/", Despacho, DespachoSerializer, DespachoFilaSerializer),
+                    ("/cargas/", Carga, CargaSerializer, CargaFilaSerializer),
+                ]
+                for url, modelo, serializer, fila_serializer in casos:
+                    total = modelo.objects.count()
+                    antes = self._medir(repeticiones, lambda: JSONRenderer().render(
+                        serializer(modelo.objects.all(), many=True).data
+                    ))
+                    despues = self._medir(repeticiones, lambda: ORJSONRenderer().render(
+                        fila_serializer.lista(modelo.objects.all())
+                    ))
+                    self.stdout.write(
+                        f"{url:<13} {total} filas | antes: {total / antes:>10,.0f} filas/s "
+                        f"| después: {total / despues:>10,.0f} filas/s "
+                        f"| x{antes / despues:.1f}"
+                    )
+                raise _Revertir
+        except _Revertir:
+            pass
+
+    def _medir(self, repeticiones, funcion):
+        """Retorna el mejor tiempo (segundos) de `repeticiones` ejecuciones."""
+        mejor = float('inf')
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            funcion()
+            mejor = min(mejor, time.perf_counter() - inicio)
+        return mejor
+
+    def _crear_datos(self, filas):
+        cliente = Cliente.objects.create(nombre="Benchmark", rut="BENCH-0", correo="bench@example.com")
+        ruta = Ruta.objects.create(origen="Santiago", destino="Iquique",
+                                   tipo_transporte="TERRESTRE", distancia_km=1800)
+        vehiculo = Vehiculo.objects.create(patente="BENCH0", marca="Volvo", modelo="FH",
+                                           capacidad_kg=20000)
+        cargas = Carga.objects.bulk_create(
+            Carga(descripcion=f"Carga {i}", peso_kg=100 + i % 900, tipo="General",
+                  valor=10000 + i, cliente=cliente)
+            for i in range(filas)
+        )
+        hoy = datetime.date.today()
+        Despacho.objects.bulk_create(
+            Despacho(codigo=f"BENCH-{i}", fecha=hoy - datetime.timedelta(days=i % 365),
+                     ruta=ruta, carga=carga, vehiculo=vehiculo)
+            for i, carga in enumerate(cargas)
+        )
@@ -0,0 +1,159 @@
+"""
+Perfil del arranque de un worker.
+
+Lanza un proceso Python nuevo con `-X importtime` que hace lo mismo que un
+worker de gunicorn al arrancar (settings, `django.setup()`, armado del
+resolver de URLs) y atiende los primeros requests. Informa:
+
+- tiempo de cada etapa (setup, URLs, primer y segundo request);
+- tiempo de importación acumulado de los paquetes vigilados
+  (`transporte.views`, requests, drf_yasg, simplejwt, django_filters,
+  numpy, ...), o "diferido" si el arranque no los importa;
+- los módulos de primer nivel más lentos.
+
+Uso:
+    python manage.py perfil_arranque --repeticiones 5 --url /salud/
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Paquetes vigilados (settings se informa como etapa)
+VIGILADOS = (
+    'transporte.views', 'transporte.signals', 'rest_framework', 'rest_framework_simplejwt',
+    'django_filters', 'drf_yasg', 'requests', 'numpy',
+)
+
+# Se ejecuta en el proceso nuevo; imprime los tiempos como JSON en stdout
+SONDA = """
+import json, os, sys, time
+t0 = time.perf_counter()
+import django
+from django.conf import settings
+settings.INSTALLED_APPS
+t1 = time.perf_counter()
+django.setup()
+t2 = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+t3 = time.perf_counter()
+cargados = [m for m in json.loads(os.environ['PERFIL_VIGILADOS']) if m in sys.modules]
+sys.stderr.write('PERFIL_FIN_ARRANQUE\\n')
+sys.stderr.flush()
+from django.test import Client
+cliente = Client()
+requests = []
+for url in json.loads(os.environ['PERFIL_URLS']):
+    inicio = time.perf_counter()
+    respuesta = cliente.get(url)
+    requests.append([url, respuesta.status_code, time.perf_counter() - inicio])
+print(json.dumps({
+    'settings': t1 - t0, 'setup': t2 - t1, 'urls': t3 - t2, 'requests': requests,
+    'cargados': cargados,
+}))
+"""
+
+
+def _parsear_importtime(salida):
+    """
+    Retorna [(modulo, acumulado_us, nivel)] de los imports del arranque
+    (salida de `-X importtime` hasta la marca de la sonda), en el orden en que se imprime (cada módulo después de sus hijos).
+    El tiempo se atribuye a quien importa el módulo por primera vez. Los
+    módulos cargados con `importlib.import_module` (settings, INSTALLED_APPS,
+    URLconf) no se miden: sus imports aparecen como raíces (nivel 0).
+    """
+    modulos = []
+    for linea in salida.splitlines():
+        if linea == 'PERFIL_FIN_ARRANQUE':
+            break  # Lo que sigue lo importan los requests, no el arranque
+        if not linea.startswith('import time:') or 'cumulative' in linea:
+            continue
+        _, acumulado, nombre = linea.split('|')
+        nivel = (len(nombre) - len(nombre.lstrip())) // 2
+        modulos.append((nombre.strip(), int(acumulado), nivel))
+    return modulos
+
+
+def _tiempo_paquete(modulos, paquete):
+    """
+    Importación acumulada (us) de un paquete: suma de sus entradas que no
+    cuelgan de otra entrada del mismo paquete. None si no aparece.
+    """
+    def es_del_paquete(nombre):
+        return nombre == paquete or nombre.startswith(paquete + '.')
+
+    total, encontrado, ancestros = 0, False, []
+    # Recorrido inverso: cada módulo aparece antes que sus hijos
+    for nombre, acumulado, nivel in reversed(modulos):
+        del ancestros[nivel:]
+        if es_del_paquete(nombre) and not any(map(es_del_paquete, ancestros)):
+            total += acumulado
+            encontrado = True
+        ancestros.append(nombre)
+    return total if encontrado else None
+
+
+class Command(BaseCommand):
+    help = "Mide el tiempo de arranque de un worker: imports, resolver de URLs y primeros requests."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=3,
+                            help="Procesos a lanzar; se informa la mediana.")
+        parser.add_argument('--url', action='append', dest='urls',
+                            help="URL del primer request (repetible). Por defecto /salud/.")
+        parser.add_argument('--top', type=int, default=10,
+                            help="Cantidad de módulos de primer nivel más lentos a listar.")
+
+    def _medir(self, urls):
+        # manage.py ya definió DJANGO_SETTINGS_MODULE: el proceso hijo lo hereda
+        entorno = dict(os.environ, PERFIL_URLS=json.dumps(urls),
+                       PERFIL_VIGILADOS=json.dumps(VIGILADOS))
+        proceso = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', SONDA],
+            cwd=settings.BASE_DIR, env=entorno, capture_output=True, text=True,
+        )
+        if proceso.returncode != 0:
+            raise CommandError(f"El proceso de medición falló:\n{proceso.stderr[-2000:]}")
+        return json.loads(proceso.stdout.strip().splitlines()[-1]), _parsear_importtime(proceso.stderr)
+
+    def handle(self, *args, **options):
+        urls = options['urls'] or ['/salud/']
+        # Cada URL dos veces: el primer request paga la carga perezosa
+        urls = [url for url in urls for _ in range(2)]
+        corridas = [self._medir(urls) for _ in range(max(1, options['repeticiones']))]
+
+        def mediana_ms(valores):
+            return statistics.median(valores) * 1000
+
+        self.stdout.write(self.style.MIGRATE_HEADING("Etapas (mediana)"))
+        for etapa in ('settings', 'setup', 'urls'):
+            self.stdout.write(f"  {etapa:<28}{mediana_ms([t[etapa] for t, _ in corridas]):9.1f} ms")
+        for i, (url, codigo, _) in enumerate(corridas[0][0]['requests']):
+            orden = "1er" if i % 2 == 0 else "2do"
+            tiempo = mediana_ms([t['requests'][i][2] for t, _ in corridas])
+            self.stdout.write(f"  {orden} GET {url:<20} [{codigo}]{tiempo:9.1f} ms")
+
+        self.stdout.write(self.style.MIGRATE_HEADING("Paquetes vigilados (importación acumulada)"))
+        for paquete in VIGILADOS:
+            if paquete not in corridas[0][0]['cargados']:
+                self.stdout.write(f"  {paquete:<28}{'diferido':>12}")
+                continue
+            tiempos = [_tiempo_paquete(m, paquete) for _, m in corridas]
+            if None in tiempos:
+                self.stdout.write(f"  {paquete:<28}{'sin medir':>12}")
+            else:
+                self.stdout.write(f"  {paquete:<28}{statistics.median(tiempos) / 1000:9.1f} ms")
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Top {options['top']} imports de primer nivel"))
+        raiz = sorted(
+            ((acumulado, nombre) for nombre, acumulado, nivel in corridas[0][1] if nivel == 0),
+            reverse=True,
+        )
+        for acumulado, nombre in raiz[:options['top']]:
+            self.stdout.write(f"  {nombre:<40}{acumulado / 1000:9.1f} ms")
@@ -0,0 +1,79 @@
+"""
+Prueba de concurrencia del asignador de códigos (`transporte.codigos`).
+
+Lanza varios procesos que piden códigos uno a uno contra la misma
+secuencia, como workers de gunicorn dando de alta despachos, y verifica
+que no haya números repetidos. Compara una reserva por código (bloque 1,
+equivalente a tomar el lock de la secuencia en cada alta) con reservas
+por bloque.
+
+Uso:
+    python manage.py probar_codigos --procesos 8 --codigos 2000 --bloque 100
+
+Se usa una secuencia de prueba propia, que se elimina al terminar.
+"""
+
+import multiprocessing
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from transporte.codigos import Asignador
+from transporte.models import SecuenciaCodigo
+
+SECUENCIA_PRUEBA = 'prueba-concurrencia'
+
+
+def _trabajador(bloque, codigos, cola):
+    asignador = Asignador(SECUENCIA_PRUEBA, bloque=bloque)
+    inicio = time.perf_counter()
+    numeros = [asignador.numeros()[0] for _ in range(codigos)]
+    cola.put((numeros, asignador.reservas, time.perf_counter() - inicio))
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = "Verifica que procesos concurrentes no obtengan códigos repetidos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--procesos', type=int, default=4)
+        parser.add_argument('--codigos', type=int, default=1000, help="Códigos por proceso.")
+        parser.add_argument('--bloque', type=int, default=100, help="Números por reserva.")
+
+    def handle(self, *args, **options):
+        procesos, codigos = options['procesos'], options['codigos']
+        for bloque in dict.fromkeys((1, options['bloque'])):
+            SecuenciaCodigo.objects.filter(nombre=SECUENCIA_PRUEBA).delete()
+            try:
+                numeros, reservas, duracion = self._correr(procesos, codigos, bloque)
+            finally:
+                SecuenciaCodigo.objects.filter(nombre=SECUENCIA_PRUEBA).delete()
+
+            repetidos = len(numeros) - len(set(numeros))
+            self.stdout.write(
+                f"bloque {bloque:>5} | {len(numeros)} códigos | {reservas} reservas "
+                f"| {len(numeros) / duracion:>9,.0f} códigos/s | repetidos: {repetidos}"
+            )
+            if repetidos or len(numeros) != procesos * codigos:
+                raise CommandError("Se entregaron códigos repetidos o faltantes.")
+        self.stdout.write(self.style.SUCCESS("Sin códigos repetidos."))
+
+    def _correr(self, procesos, codigos, bloque):
+        # Los procesos hijos no deben heredar conexiones abiertas
+        connections.close_all()
+        contexto = multiprocessing.get_context('fork')
+        cola = contexto.Queue()
+        hijos = [
+            contexto.Process(target=_trabajador, args=(bloque, codigos, cola))
+            for _ in range(procesos)
+        ]
+        inicio = time.perf_counter()
+        for hijo in hijos:
+            hijo.start()
+        resultados = [cola.get() for _ in hijos]
+        duracion = time.perf_counter() - inicio
+        for hijo in hijos:
+            hijo.join()
+        numeros = [n for parcial, _, _ in resultados for n in parcial]
+        return numeros, sum(r for _, r, _ in resultados), duracion
@@ -0,0 +1,95 @@
+"""
+Pool de procesos que ejecuta los trabajos en segundo plano (`Job`).
+
+Uso:
+    python manage.py run_workers --procesos 4
+    python manage.py run_workers --vaciar   # procesa la cola y termina
+
+Cada proceso reclama trabajos de a uno (ver `transporte.jobs.reclamar`),
+por lo que se pueden levantar varias instancias en distintas máquinas.
+"""
+
+import multiprocessing
+import os
+import signal
+import socket
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+
+def _bucle_worker(detener, intervalo, vaciar):
+    """Bucle de un proceso worker: reclamar, ejecutar, repetir."""
+    # Necesario si el sistema crea los procesos con "spawn" en vez de "fork"
+    django.setup()
+    from transporte import jobs
+
+    # Las conexiones heredadas del proceso padre no se pueden compartir
+    connections.close_all()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # El padre coordina el apagado
+    nombre = f"{socket.gethostname()}:{os.getpid()}"
+
+    while not detener.is_set():
+        close_old_connections()
+        job = jobs.reclamar(nombre)
+        if job is None:
+            if vaciar:
+                break
+            detener.wait(intervalo)
+            continue
+        jobs.ejecutar(job)
+
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = "Levanta un pool de procesos que ejecuta los trabajos en segundo plano."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--procesos', type=int, default=os.cpu_count() or 1,
+                            help="Cantidad de procesos worker.")
+        parser.add_argument('--intervalo', type=float, default=2.0,
+                            help="Segundos de espera cuando la cola está vacía.")
+        parser.add_argument('--vaciar', action='store_true',
+                            help="Terminar cuando no queden trabajos pendientes.")
+
+    def handle(self, *args, **options):
+        from transporte import jobs
+
+        recuperados = jobs.recuperar_abandonados()
+        if recuperados:
+            self.stdout.write(f"{recuperados} trabajos abandonados devueltos a la cola.")
+
+        # No heredar conexiones abiertas a los procesos hijos
+        connections.close_all()
+        detener = multiprocessing.Event()
+        procesos = [
+            multiprocessing.Process(
+                target=_bucle_worker,
+                args=(detener, options['intervalo'], options['vaciar']),
+                name=f"worker-{i}",
+            )
+            for i in range(options['procesos'])
+        ]
+
+        def apagar(signum, frame):
+            self.stdout.write("Deteniendo workers (terminan el trabajo en curso)...")
+            detener.set()
+
+        signal.signal(signal.SIGINT, apagar)
+        signal.signal(signal.SIGTERM, apagar)
+
+        for proceso in procesos:
+            proceso.start()
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(procesos)} workers iniciados. Tareas: {', '.join(jobs.tareas_registradas())}"
+        ))
+
+        # Recuperar periódicamente trabajos de workers caídos
+        while any(p.is_alive() for p in procesos):
+            for proceso in procesos:
+                proceso.join(timeout=jobs.LATIDO_TIMEOUT / 10)
+            if not detener.is_set() and not options['vaciar']:
+                jobs.recuperar_abandonados()
+                close_old_connections()
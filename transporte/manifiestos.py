@@ -0,0 +1,146 @@
+"""
+Manifiestos de despachos del día, uno por vehículo y por aeronave.
+
+Los datos se leen en el proceso principal (una consulta para los despachos
+y otra para las cargas adicionales de los consolidados) y se agrupan por
+activo; cada grupo se renderiza (plantilla
+`manifiestos/manifiesto.html`) en un pool de procesos y el HTML se escribe
+en un único ZIP a medida que llega, sin acumular los documentos en memoria.
+Los despachos sin vehículo ni aeronave van en `sin-asignar.html`.
+
+Los manifiestos son HTML listo para imprimir, con una fila por carga (la
+principal y las adicionales de cada despacho) y una hoja A4 cada
+`FILAS_POR_PAGINA` filas: el proyecto no depende de una librería PDF.
+"""
+
+import multiprocessing
+import time
+import zipfile
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+from django.template.loader import render_to_string
+from django.utils.text import slugify
+
+from .models import Despacho, DespachoCarga
+
+FILAS_POR_PAGINA = 25
+
+# Directorio donde la tarea `generar_manifiestos` deja los ZIP
+DIRECTORIO = getattr(settings, 'MANIFIESTOS_DIR', settings.BASE_DIR / 'manifiestos')
+
+CAMPOS = (
+    'id', 'codigo', 'estado', 'vehiculo_id', 'aeronave_id',
+    'vehiculo__patente', 'vehiculo__marca', 'vehiculo__modelo',
+    'aeronave__codigo', 'aeronave__modelo',
+    'conductor__nombre', 'conductor__apellido', 'piloto__nombre', 'piloto__apellido',
+    'ruta__origen', 'ruta__destino',
+    'carga__descripcion', 'carga__peso_kg', 'carga__cliente__nombre',
+)
+CAMPOS_CARGA = ('carga__descripcion', 'carga__peso_kg', 'carga__cliente__nombre')
+
+
+def _persona(nombre, apellido):
+    return f"{nombre} {apellido}" if nombre else ''
+
+
+def grupos(fecha):
+    """
+    Despachos de la fecha (sin cancelados) agrupados por activo, cada uno
+    con sus cargas adicionales en `adicionales`.
+    Retorna una lista de dicts con el contexto de cada manifiesto.
+    """
+    despachos = Despacho.objects.filter(fecha=fecha).exclude(estado='CANCELADO')
+    adicionales = defaultdict(list)
+    relaciones = DespachoCarga.objects.filter(
+        despacho__in=despachos.values('pk')
+    ).order_by('despacho_id', 'carga_id').values('despacho_id', *CAMPOS_CARGA)
+    for relacion in relaciones:
+        adicionales[relacion.pop('despacho_id')].append(relacion)
+
+    despachos = despachos.order_by(
+        'vehiculo_id', 'aeronave_id', 'ruta__origen', 'codigo'
+    ).values(*CAMPOS)
+    por_activo = {}
+    for d in despachos:
+        d['adicionales'] = adicionales.get(d['id'], [])
+        if d['vehiculo_id'] is not None:
+            clave = ('vehiculo', d['vehiculo_id'])
+            activo = f"{d['vehiculo__patente']} - {d['vehiculo__marca']} {d['vehiculo__modelo']}"
+            responsable = _persona(d['conductor__nombre'], d['conductor__apellido'])
+            archivo = f"vehiculo-{slugify(d['vehiculo__patente'])}.html"
+        elif d['aeronave_id'] is not None:
+            clave = ('aeronave', d['aeronave_id'])
+            activo = f"{d['aeronave__codigo']} - {d['aeronave__modelo']}"
+            responsable = _persona(d['piloto__nombre'], d['piloto__apellido'])
+            archivo = f"aeronave-{slugify(d['aeronave__codigo'])}.html"
+        else:
+            clave = ('sin_asignar', None)
+            activo, responsable, archivo = "Sin asignar", '', "sin-asignar.html"
+        grupo = por_activo.setdefault(clave, {
+            'archivo': archivo, 'tipo': clave[0].replace('_', ' '), 'activo': activo,
+            'responsable': responsable, 'fecha': fecha, 'despachos': [],
+        })
+        grupo['despachos'].append(d)
+    return list(por_activo.values())
+
+
+def renderizar(grupo):
+    """Retorna (nombre de archivo, HTML, páginas) del manifiesto de un grupo."""
+    despachos = grupo['despachos']
+    # Una fila por carga; las adicionales repiten los datos de su despacho
+    filas = [
+        fila for d in despachos
+        for fila in (d, *({**d, **carga, 'adicional': True} for carga in d['adicionales']))
+    ]
+    paginas = [filas[i:i + FILAS_POR_PAGINA] for i in range(0, len(filas), FILAS_POR_PAGINA)]
+    html = render_to_string('manifiestos/manifiesto.html', {
+        **grupo,
+        'paginas': paginas,
+        'total_despachos': len(despachos),
+        'total_cargas': len(filas),
+        'total_kg': sum(fila['carga__peso_kg'] or 0 for fila in filas),
+    })
+    return grupo['archivo'], html.encode(), len(paginas)
+
+
+def generar(fecha, destino, procesos=None, progreso=None):
+    """
+    Escribe en `destino` (ruta o archivo binario) un ZIP con los manifiestos
+    de la fecha. `progreso(hechos, total)` se llama por cada manifiesto.
+    Retorna un resumen con la cantidad de páginas y páginas por segundo.
+    """
+    inicio = time.perf_counter()
+    pendientes = grupos(fecha)
+    total = len(pendientes)
+    paginas = 0
+
+    # Los procesos hijos no deben heredar conexiones abiertas (no consultan la base)
+    connections.close_all()
+    contexto = multiprocessing.get_context('fork')
+    with ProcessPoolExecutor(max_workers=procesos, mp_context=contexto) as pool, \
+            zipfile.ZipFile(destino, 'w', compression=zipfile.ZIP_DEFLATED) as archivo_zip:
+        resultados = pool.map(renderizar, pendientes, chunksize=max(1, total // 32))
+        for hechos, (nombre, html, paginas_grupo) in enumerate(resultados, start=1):
+            archivo_zip.writestr(nombre, html)
+            paginas += paginas_grupo
+            if progreso is not None:
+                progreso(hechos, total)
+
+    segundos = time.perf_counter() - inicio
+    return {
+        "fecha": str(fecha),
+        "manifiestos": total,
+        "despachos": sum(len(g['despachos']) for g in pendientes),
+        "paginas": paginas,
+        "segundos": round(segundos, 3),
+        "paginas_por_segundo": round(paginas / segundos, 1) if segundos else None,
+    }
+
+
+def ruta_zip(fecha, job_id):
+    """Ruta del ZIP generado por la tarea en segundo plano."""
+    return DIRECTORIO / f"manifiestos-{fecha}-job{job_id}.zip"
+
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transporte', '0003_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DespachoArchivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('codigo', models.CharField(max_length=20, unique=True)),
+                ('fecha', models.DateField()),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('EN_RUTA', 'En Ruta'), ('ENTREGADO', 'Entregado'), ('CANCELADO', 'Cancelado')], max_length=15)),
+                ('eliminado_en', models.DateTimeField(blank=True, null=True)),
+                ('archivado_en', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='despacho',
+            name='eliminado_en',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='despacho',
+            name='carga',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='transporte.carga'),
+        ),
+        migrations.AlterField(
+            model_name='despacho',
+            name='ruta',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='transporte.ruta'),
+        ),
+        migrations.AddIndex(
+            model_name='despacho',
+            index=models.Index(fields=['estado', 'fecha'], name='despacho_estado_fecha_idx'),
+        ),
+        migrations.AddField(
+            model_name='despachoarchivado',
+            name='aeronave',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='transporte.aeronave'),
+        ),
+        migrations.AddField(
+            model_name='despachoarchivado',
+            name='carga',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='transporte.carga'),
+        ),
+        migrations.AddField(
+            model_name='despachoarchivado',
+            name='conductor',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='transporte.conductor'),
+        ),
+        migrations.AddField(
+            model_name='despachoarchivado',
+            name='piloto',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='transporte.piloto'),
+        ),
+        migrations.AddField(
+            model_name='despachoarchivado',
+            name='ruta',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='transporte.ruta'),
+        ),
+        migrations.AddField(
+            model_name='despachoarchivado',
+            name='vehiculo',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='transporte.vehiculo'),
+        ),
+        migrations.AddIndex(
+            model_name='despachoarchivado',
+            index=models.Index(fields=['fecha'], name='archivo_fecha_idx'),
+        ),
+    ]
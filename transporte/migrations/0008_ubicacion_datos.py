@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:25
+
+import re
+import unicodedata
+
+from django.db import migrations
+
+
+def _normalizar(nombre):
+    # Copia de models.normalizar_ubicacion al momento de esta migración
+    sin_tildes = unicodedata.normalize('NFKD', nombre or '').encode('ascii', 'ignore').decode()
+    return re.sub(r'[^a-z0-9]+', ' ', sin_tildes.lower()).strip()
+
+
+def crear_ubicaciones(apps, schema_editor):
+    """Una Ubicacion por cada texto distinto (tras normalizar) de origen/destino."""
+    Ruta = apps.get_model('transporte', 'Ruta')
+    Ubicacion = apps.get_model('transporte', 'Ubicacion')
+
+    rutas = list(Ruta.objects.order_by('pk').only('pk', 'origen', 'destino'))
+    ubicaciones = {}
+    for ruta in rutas:
+        for texto in (ruta.origen, ruta.destino):
+            # El primer texto visto para cada clave queda como nombre
+            ubicaciones.setdefault(_normalizar(texto), (texto or '').strip())
+    Ubicacion.objects.bulk_create(
+        Ubicacion(clave=clave, nombre=nombre) for clave, nombre in ubicaciones.items()
+    )
+
+    ids = dict(Ubicacion.objects.values_list('clave', 'pk'))
+    for ruta in rutas:
+        ruta.ubicacion_origen_id = ids[_normalizar(ruta.origen)]
+        ruta.ubicacion_destino_id = ids[_normalizar(ruta.destino)]
+    Ruta.objects.bulk_update(rutas, ['ubicacion_origen', 'ubicacion_destino'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transporte', '0007_ubicacion'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_ubicaciones, migrations.RunPython.noop),
+    ]
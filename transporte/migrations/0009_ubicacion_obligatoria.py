@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transporte', '0008_ubicacion_datos'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ruta',
+            name='ubicacion_destino',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='rutas_entrantes', to='transporte.ubicacion'),
+        ),
+        migrations.AlterField(
+            model_name='ruta',
+            name='ubicacion_origen',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='rutas_salientes', to='transporte.ubicacion'),
+        ),
+    ]
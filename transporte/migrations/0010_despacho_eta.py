@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transporte', '0009_ubicacion_obligatoria'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='despacho',
+            name='atrasado',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='despacho',
+            name='eta',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='despachoarchivado',
+            name='atrasado',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='despachoarchivado',
+            name='eta',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='despacho',
+            index=models.Index(fields=['estado', 'eta'], name='despacho_estado_eta_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:36
+
+from datetime import datetime, time, timedelta
+
+from django.db import migrations
+from django.utils import timezone
+
+# Copia de los valores por defecto de models.calcular_eta al momento de esta migración
+VELOCIDADES_PROMEDIO_KMH = {'TERRESTRE': 60, 'AEREO': 650}
+HORA_SALIDA = time(8)
+LOTE = 5000
+
+
+def calcular_etas(apps, schema_editor):
+    """Llegada estimada de los despachos existentes, por lotes de id."""
+    Despacho = apps.get_model('transporte', 'Despacho')
+    Ruta = apps.get_model('transporte', 'Ruta')
+    conexion = schema_editor.connection
+    tabla = conexion.ops.quote_name(Despacho._meta.db_table)
+
+    minutos = {
+        pk: timedelta(minutes=round(distancia * 60 / VELOCIDADES_PROMEDIO_KMH[tipo]))
+        for pk, distancia, tipo in Ruta.objects.values_list('pk', 'distancia_km', 'tipo_transporte')
+    }
+    salidas = {}
+    ultimo = 0
+    while True:
+        lote = list(
+            Despacho.objects.filter(pk__gt=ultimo).order_by('pk')
+            .values_list('pk', 'ruta_id', 'fecha')[:LOTE]
+        )
+        if not lote:
+            break
+        filas = []
+        for pk, ruta_id, fecha in lote:
+            if fecha not in salidas:
+                salidas[fecha] = timezone.make_aware(datetime.combine(fecha, HORA_SALIDA))
+            eta = conexion.ops.adapt_datetimefield_value(salidas[fecha] + minutos[ruta_id])
+            filas.append((eta, pk))
+        # Casi todas las etas son distintas: un UPDATE parametrizado por fila
+        with conexion.cursor() as cursor:
+            cursor.executemany(f"UPDATE {tabla} SET eta = %s WHERE id = %s", filas)
+        ultimo = lote[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transporte', '0010_despacho_eta'),
+    ]
+
+    operations = [
+        migrations.RunPython(calcular_etas, migrations.RunPython.noop),
+    ]
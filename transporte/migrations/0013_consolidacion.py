@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transporte', '0012_secuencia_codigo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='despachoarchivado',
+            name='cargas_adicionales',
+            field=models.ManyToManyField(blank=True, related_name='+', to='transporte.carga'),
+        ),
+        migrations.CreateModel(
+            name='DespachoCarga',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('carga', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='transporte.carga')),
+                ('despacho', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='transporte.despacho')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='despacho',
+            name='cargas_adicionales',
+            field=models.ManyToManyField(blank=True, related_name='despachos_consolidados', through='transporte.DespachoCarga', to='transporte.carga'),
+        ),
+        migrations.AddConstraint(
+            model_name='despachocarga',
+            constraint=models.UniqueConstraint(fields=('despacho', 'carga'), name='despacho_carga_unica'),
+        ),
+    ]
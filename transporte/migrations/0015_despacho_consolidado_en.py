@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transporte', '0014_revocacion_tokens'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='despacho',
+            name='consolidado_en',
+            field=models.ForeignKey(blank=True, db_constraint=False, editable=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='transporte.despacho'),
+        ),
+        migrations.AddField(
+            model_name='despachoarchivado',
+            name='consolidado_en',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -1,4 +1,11 @@
+import re
+import unicodedata
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.utils import timezone
 
 # ------------------------------------------------
 # CHOICES (Opciones para campos de selección)
@@ -109,29 +116,124 @@ class Carga(models.Model):
         return f"{self.descripcion} - {self.peso_kg} kg"
 
 
+def normalizar_ubicacion(nombre):
+    """
+    Clave de comparación de un lugar: sin tildes, en minúsculas y con los
+    separadores colapsados ("  Viña del Mar " y "vina-del-mar" coinciden).
+    """
+    sin_tildes = unicodedata.normalize('NFKD', nombre or '').encode('ascii', 'ignore').decode()
+    return re.sub(r'[^a-z0-9]+', ' ', sin_tildes.lower()).strip()
+
+
+class Ubicacion(models.Model):
+    """
+    Lugar de origen o destino de las rutas. Las rutas la referencian por id
+    para agrupar y unir por entero en lugar de comparar textos.
+    """
+    nombre = models.CharField(max_length=100)
+    clave = models.CharField(max_length=100, unique=True)  # Ver normalizar_ubicacion
+    latitud = models.FloatField(null=True, blank=True)
+    longitud = models.FloatField(null=True, blank=True)
+
+    def __str__(self):
+        """Retorna el nombre de la ubicación."""
+        return self.nombre
+
+    def save(self, *args, **kwargs):
+        self.clave = normalizar_ubicacion(self.nombre)
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def desde_nombre(cls, nombre):
+        """Retorna la ubicación con la misma clave que `nombre`, creándola si no existe."""
+        ubicacion, _ = cls.objects.get_or_create(
+            clave=normalizar_ubicacion(nombre), defaults={'nombre': (nombre or '').strip()},
+        )
+        return ubicacion
+
+
 class Ruta(models.Model):
     """
     Modelo que define una ruta de transporte.
+    `origen` y `destino` conservan el texto ingresado; al guardar se
+    enlazan con su `Ubicacion` normalizada.
     """
     origen = models.CharField(max_length=100)
     destino = models.CharField(max_length=100)
     tipo_transporte = models.CharField(max_length=15, choices=TIPO_TRANSPORTE)
     distancia_km = models.IntegerField(default=0)  # Distancia aproximada en kilómetros
+    ubicacion_origen = models.ForeignKey(Ubicacion, on_delete=models.PROTECT, editable=False,
+                                         related_name='rutas_salientes')
+    ubicacion_destino = models.ForeignKey(Ubicacion, on_delete=models.PROTECT, editable=False,
+                                          related_name='rutas_entrantes')
 
     def __str__(self):
         """Retorna el origen y destino de la ruta."""
         return f"{self.origen} → {self.destino}"
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        for campo in ('origen', 'destino'):
+            if update_fields is not None and campo not in update_fields:
+                continue
+            setattr(self, f'ubicacion_{campo}', Ubicacion.desde_nombre(getattr(self, campo)))
+            if update_fields is not None:
+                kwargs['update_fields'] = update_fields = {*update_fields, f'ubicacion_{campo}'}
+        super().save(*args, **kwargs)
+
+
+# Estados en los que un despacho ya no cambia y puede archivarse
+ESTADOS_CERRADOS = ('ENTREGADO', 'CANCELADO')
+
+# Velocidad promedio por tipo de transporte, para la llegada estimada.
+# Se puede ajustar con VELOCIDADES_PROMEDIO_KMH en settings.
+VELOCIDADES_PROMEDIO_KMH = {'TERRESTRE': 60, 'AEREO': 650}
+
+
+def calcular_eta(fecha, distancia_km, tipo_transporte):
+    """
+    Llegada estimada: salida a la hora `DESPACHO_HORA_SALIDA` (hora local)
+    del día del despacho más el tiempo de viaje a velocidad promedio.
+    """
+    velocidades = getattr(settings, 'VELOCIDADES_PROMEDIO_KMH', VELOCIDADES_PROMEDIO_KMH)
+    hora_salida = time(getattr(settings, 'DESPACHO_HORA_SALIDA', 8))
+    salida = timezone.make_aware(datetime.combine(fecha, hora_salida))
+    return salida + timedelta(minutes=round(distancia_km * 60 / velocidades[tipo_transporte]))
+
+
+class DespachoVivoManager(models.Manager):
+    """Manager por defecto: solo despachos no eliminados."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(eliminado_en__isnull=True)
+
 
 class Despacho(models.Model):
     """
     Modelo principal que representa un despacho o envío.
     Vincula carga, ruta, vehículo/aeronave y conductor/piloto.
+
+    `Despacho.objects` solo ve despachos vigentes; `Despacho.todos` incluye
+    los eliminados lógicamente. Los despachos cerrados antiguos se mueven a
+    `DespachoArchivado` con `manage.py archivar_despachos`.
+
+    `eta` se recalcula al guardar con otra fecha o ruta; `atrasado` lo marca
+    `manage.py detectar_atrasos` cuando un despacho EN_RUTA supera su eta.
+    Si se guarda sin `codigo`, se genera uno (ver `transporte.codigos`).
+
+    Un despacho consolidado lleva, además de su `carga` principal, otras
+    cargas en `cargas_adicionales` (ver `transporte.consolidacion`). Los que
+    quedan vacíos al consolidar se eliminan lógicamente y guardan en
+    `consolidado_en` el despacho que se llevó sus cargas, para seguirlos.
     """
     codigo = models.CharField(max_length=20, unique=True)  # Código único de seguimiento
     fecha = models.DateField()
-    ruta = models.ForeignKey(Ruta, on_delete=models.CASCADE)
-    carga = models.ForeignKey(Carga, on_delete=models.CASCADE)
+    # PROTECT: borrar una ruta o carga no debe borrar el historial de despachos
+    ruta = models.ForeignKey(Ruta, on_delete=models.PROTECT)
+    carga = models.ForeignKey(Carga, on_delete=models.PROTECT)
+    cargas_adicionales = models.ManyToManyField(
+        Carga, through='DespachoCarga', blank=True, related_name='despachos_consolidados',
+    )
     
     # Relaciones opcionales dependiendo del tipo de transporte
     vehiculo = models.ForeignKey(Vehiculo, on_delete=models.SET_NULL, null=True, blank=True)
@@ -140,7 +242,278 @@ class Despacho(models.Model):
     piloto = models.ForeignKey(Piloto, on_delete=models.SET_NULL, null=True, blank=True)
     
     estado = models.CharField(max_length=15, choices=ESTADO_DESPACHO, default='PENDIENTE')
+    eta = models.DateTimeField(null=True, editable=False)  # Llegada estimada (calcular_eta)
+    atrasado = models.BooleanField(default=False, editable=False)  # Ver `manage.py detectar_atrasos`
+    eliminado_en = models.DateTimeField(null=True, blank=True)  # Eliminación lógica
+    # Sin restricción en la base: el destino puede archivarse antes (mismo id en el archivo)
+    consolidado_en = models.ForeignKey(
+        'self', on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True,
+        editable=False, related_name='+',
+    )
+
+    objects = DespachoVivoManager()
+    todos = models.Manager()
+
+    class Meta:
+        indexes = [
+            # Selección de despachos cerrados a archivar
+            models.Index(fields=['estado', 'fecha'], name='despacho_estado_fecha_idx'),
+            # Detección de atrasos: EN_RUTA con llegada estimada vencida
+            models.Index(fields=['estado', 'eta'], name='despacho_estado_eta_idx'),
+        ]
 
     def __str__(self):
         """Retorna el código del despacho."""
         return self.codigo
+
+    def save(self, *args, **kwargs):
+        if not self.codigo:
+            from .codigos import codigo_despacho  # codigos importa este módulo
+            self.codigo = codigo_despacho()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'fecha', 'ruta', 'ruta_id'} & set(update_fields):
+            self.eta = calcular_eta(self.fecha, self.ruta.distancia_km, self.ruta.tipo_transporte)
+            if self.eta > timezone.now():
+                self.atrasado = False
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'eta', 'atrasado'}
+        super().save(*args, **kwargs)
+
+    def eliminar(self, consolidado_en=None):
+        """
+        Eliminación lógica: el despacho deja de verse pero se conserva.
+        `consolidado_en` es el despacho que se llevó sus cargas, si lo hay.
+        """
+        self.eliminado_en = timezone.now()
+        self.consolidado_en = consolidado_en
+        self.save(update_fields=['eliminado_en', 'consolidado_en'])
+
+
+class DespachoCarga(models.Model):
+    """
+    Carga adicional de un despacho consolidado.
+    PROTECT: una carga consolidada no se puede borrar mientras viaje en un despacho.
+    """
+    despacho = models.ForeignKey(Despacho, on_delete=models.CASCADE)
+    carga = models.ForeignKey(Carga, on_delete=models.PROTECT)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['despacho', 'carga'], name='despacho_carga_unica'),
+        ]
+
+    def __str__(self):
+        """Retorna el despacho y la carga."""
+        return f"{self.despacho_id} - {self.carga_id}"
+
+
+class DespachoArchivado(models.Model):
+    """
+    Despacho cerrado movido fuera de la tabla principal (mismo id).
+    Las relaciones quedan en NULL si se borra la ruta, carga o activo,
+    para que el historial sobreviva.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    codigo = models.CharField(max_length=20, unique=True)
+    fecha = models.DateField()
+    ruta = models.ForeignKey(Ruta, on_delete=models.SET_NULL, null=True, related_name='+')
+    carga = models.ForeignKey(Carga, on_delete=models.SET_NULL, null=True, related_name='+')
+    cargas_adicionales = models.ManyToManyField(Carga, blank=True, related_name='+')
+    vehiculo = models.ForeignKey(Vehiculo, on_delete=models.SET_NULL, null=True, related_name='+')
+    aeronave = models.ForeignKey(Aeronave, on_delete=models.SET_NULL, null=True, related_name='+')
+    conductor = models.ForeignKey(Conductor, on_delete=models.SET_NULL, null=True, related_name='+')
+    piloto = models.ForeignKey(Piloto, on_delete=models.SET_NULL, null=True, related_name='+')
+    estado = models.CharField(max_length=15, choices=ESTADO_DESPACHO)
+    eta = models.DateTimeField(null=True, editable=False)
+    atrasado = models.BooleanField(default=False, editable=False)
+    eliminado_en = models.DateTimeField(null=True, blank=True)
+    consolidado_en = models.BigIntegerField(null=True, blank=True)  # Id del despacho destino
+    archivado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['fecha'], name='archivo_fecha_idx'),
+        ]
+
+    def __str__(self):
+        """Retorna el código del despacho archivado."""
+        return self.codigo
+
+
+# ------------------------------------------------
+# TRABAJOS EN SEGUNDO PLANO
+# ------------------------------------------------
+
+# Opciones para el estado de un trabajo (Job)
+ESTADO_JOB = [
+    ('PENDIENTE', 'Pendiente'),
+    ('EN_PROCESO', 'En Proceso'),
+    ('COMPLETADO', 'Completado'),
+    ('FALLIDO', 'Fallido'),
+]
+
+
+class Job(models.Model):
+    """
+    Trabajo pesado (importaciones, reportes, cambios masivos) que se ejecuta
+    fuera del request, en los procesos de `manage.py run_workers`.
+    """
+    tipo = models.CharField(max_length=50)  # Nombre de la tarea registrada en transporte.jobs
+    parametros = models.JSONField(default=dict, blank=True)
+    estado = models.CharField(max_length=15, choices=ESTADO_JOB, default='PENDIENTE')
+
+    progreso = models.PositiveSmallIntegerField(default=0)  # Porcentaje 0-100
+    mensaje = models.CharField(max_length=200, blank=True)
+    resultado = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    intentos = models.PositiveSmallIntegerField(default=0)
+    max_intentos = models.PositiveSmallIntegerField(default=3)
+    disponible_desde = models.DateTimeField(default=timezone.now)  # Reintentos con espera
+
+    worker = models.CharField(max_length=100, blank=True)  # host:pid que lo ejecuta
+    latido = models.DateTimeField(null=True, blank=True)  # Última señal de vida del worker
+    creado = models.DateTimeField(auto_now_add=True)
+    iniciado = models.DateTimeField(null=True, blank=True)
+    terminado = models.DateTimeField(null=True, blank=True)
+    creado_por = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL,
+                                   null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Cola: pendientes ordenados por disponibilidad
+            models.Index(fields=['estado', 'disponible_desde'], name='job_cola_idx'),
+        ]
+
+    def __str__(self):
+        """Retorna el tipo y estado del trabajo."""
+        return f"{self.tipo} #{self.pk} ({self.estado})"
+
+    def reportar_progreso(self, actual, total, mensaje=''):
+        """
+        Actualiza el avance del trabajo (y el latido del worker) sin
+        sobrescribir el resto de los campos.
+        """
+        self.progreso = min(100, int(actual * 100 / total)) if total else 100
+        self.mensaje = mensaje[:200]
+        self.latido = timezone.now()
+        Job.objects.filter(pk=self.pk, estado='EN_PROCESO', worker=self.worker).update(
+            progreso=self.progreso, mensaje=self.mensaje, latido=self.latido
+        )
+
+
+# ------------------------------------------------
+# AUDITORÍA
+# ------------------------------------------------
+
+ACCION_AUDITORIA = [
+    ('CREAR', 'Crear'),
+    ('MODIFICAR', 'Modificar'),
+    ('ELIMINAR', 'Eliminar'),
+]
+
+
+class RegistroAuditoria(models.Model):
+    """
+    Cambio de un registro de `transporte` (solo se agregan filas).
+    `cambios` guarda únicamente los campos modificados: {campo: [antes, después]}.
+    Se escriben por lotes desde `transporte.auditoria`.
+    """
+    modelo = models.CharField(max_length=50)  # Nombre del modelo en minúsculas
+    objeto_id = models.BigIntegerField()
+    accion = models.CharField(max_length=10, choices=ACCION_AUDITORIA)
+    cambios = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    usuario_id = models.IntegerField(null=True, blank=True)  # Sin FK: no bloquea ni consulta usuarios
+    fecha = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['modelo', 'objeto_id', 'fecha'], name='auditoria_objeto_idx'),
+        ]
+
+    def __str__(self):
+        """Retorna la acción y el registro afectado."""
+        return f"{self.accion} {self.modelo} #{self.objeto_id}"
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError("Los registros de auditoría no se modifican.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Los registros de auditoría no se eliminan.")
+
+
+# ------------------------------------------------
+# IDEMPOTENCIA
+# ------------------------------------------------
+
+class ClaveIdempotencia(models.Model):
+    """
+    Respuesta guardada de un POST con header `Idempotency-Key`, para
+    repetirla ante reintentos del cliente (ver `transporte.idempotencia`).
+    """
+    propietario = models.CharField(max_length=64)  # "u<id>" o "ip<dirección>"
+    clave = models.CharField(max_length=255)
+    huella = models.CharField(max_length=64)  # sha256 de método, ruta y cuerpo
+    completa = models.BooleanField(default=False)  # False mientras el primer request se procesa
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    respuesta = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    creado = models.DateTimeField(auto_now_add=True)
+    expira = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['propietario', 'clave'], name='idempotencia_clave_unica'),
+        ]
+
+    def __str__(self):
+        """Retorna la clave y su propietario."""
+        return f"{self.propietario}:{self.clave}"
+
+
+# ------------------------------------------------
+# SECUENCIAS DE CÓDIGOS
+# ------------------------------------------------
+
+class SecuenciaCodigo(models.Model):
+    """
+    Contador persistente para generar códigos (p. ej. de despacho).
+    Cada proceso reserva bloques de números (ver `transporte.codigos`).
+    """
+    nombre = models.CharField(max_length=50, unique=True)
+    siguiente = models.BigIntegerField(default=1)  # Primer número aún no reservado
+
+    def __str__(self):
+        """Retorna el nombre de la secuencia y su próximo número."""
+        return f"{self.nombre}: {self.siguiente}"
+
+
+# ------------------------------------------------
+# REVOCACIÓN DE TOKENS
+# ------------------------------------------------
+
+class GeneracionTokens(models.Model):
+    """
+    Generación de los JWT de un usuario. Cada token lleva la generación
+    vigente al emitirse; revocar incrementa el contador y rechaza los
+    tokens de generaciones anteriores (ver `transporte.authentication`).
+    """
+    usuario = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                                   primary_key=True, related_name='+')
+    generacion = models.PositiveIntegerField(default=0)
+    modificado = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        """Retorna el usuario y su generación."""
+        return f"{self.usuario_id}: {self.generacion}"
+
+
+class TokenRevocado(models.Model):
+    """Token puntual revocado (cierre de sesión) hasta que expire."""
+    jti = models.CharField(max_length=255, unique=True)
+    expira = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        """Retorna el jti del token."""
+        return self.jti
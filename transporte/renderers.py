@@ -0,0 +1,48 @@
+"""
+Renderer y parser JSON de alto rendimiento para la API.
+
+Usan `orjson` si está instalado y, si no, delegan en los de DRF
+(módulo `json` de la librería estándar), con la misma salida.
+"""
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dependencia opcional
+    orjson = None
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    Renderer JSON basado en orjson.
+    Los tipos que orjson no conoce (Decimal, datetime, lazy strings...) se
+    delegan al encoder de DRF para mantener el mismo formato de salida.
+    """
+    _encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+
+        opciones = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            opciones |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=self._encoder.default, option=opciones)
+
+
+class ORJSONParser(JSONParser):
+    """Parser JSON basado en orjson (cuerpos UTF-8)."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
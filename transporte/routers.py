@@ -0,0 +1,154 @@
+"""
+Ruteo de base de datos para la app `transporte`.
+
+Envía las lecturas "pesadas" (list/retrieve de los ViewSets, exportaciones,
+estadísticas) a una réplica de solo lectura y todas las escrituras a la
+primaria. Tras una escritura, las lecturas del mismo usuario quedan fijadas
+a la primaria durante `REPLICA_PIN_SECONDS` (read-your-writes).
+
+Si el alias de réplica no está configurado en `DATABASES`, todo va a
+`default` y el router no tiene efecto.
+"""
+
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+APP_LABEL = 'transporte'
+PRIMARIA = 'default'
+
+# Estado por hilo: cada worker de gunicorn atiende un request por hilo.
+_estado = threading.local()
+
+
+def alias_replica():
+    """Retorna el alias de la réplica, o None si no está configurada."""
+    alias = getattr(settings, 'REPLICA_DB_ALIAS', 'replica')
+    return alias if alias in settings.DATABASES else None
+
+
+def _reiniciar_estado():
+    _estado.replica = False
+    _estado.escribio = False
+
+
+def replica_activa():
+    """Indica si las lecturas del hilo actual deben ir a la réplica."""
+    return getattr(_estado, 'replica', False)
+
+
+@contextmanager
+def usar_replica():
+    """
+    Context manager para ejecutar lecturas contra la réplica
+    (exportaciones, estadísticas, reportes).
+    """
+    anterior = replica_activa()
+    _estado.replica = True
+    try:
+        yield
+    finally:
+        _estado.replica = anterior
+
+
+# ==========================================
+# READ-YOUR-WRITES
+# ==========================================
+
+def _clave_pin(request):
+    """Identifica al usuario (JWT o sesión) o, si es anónimo, a su IP."""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f"replica:pin:u{user.pk}"
+    return f"replica:pin:ip{request.META.get('REMOTE_ADDR', '')}"
+
+
+def fijar_primaria(request):
+    """Fija las lecturas del usuario a la primaria por unos segundos."""
+    cache.set(_clave_pin(request), True, getattr(settings, 'REPLICA_PIN_SECONDS', 5))
+
+
+def fijado_a_primaria(request):
+    """Indica si el usuario escribió recientemente y debe leer de la primaria."""
+    return cache.get(_clave_pin(request), False)
+
+
+# ==========================================
+# ROUTER
+# ==========================================
+
+class ReplicaRouter:
+    """
+    Router de Django: lecturas de `transporte` a la réplica cuando el
+    contexto lo permite; escrituras siempre a la primaria.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label != APP_LABEL:
+            return None
+        # Los objetos relacionados se leen de la misma base que su origen.
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        if replica_activa():
+            return alias_replica()
+        return None
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label == APP_LABEL:
+            _estado.escribio = True
+        return PRIMARIA
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primaria y réplica contienen los mismos datos.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+
+# ==========================================
+# INTEGRACIÓN CON VISTAS
+# ==========================================
+
+class ReplicaMiddleware:
+    """
+    Reinicia el estado del router en cada request y, si el request escribió
+    en `transporte`, fija al usuario a la primaria para sus próximas lecturas.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _reiniciar_estado()
+        try:
+            response = self.get_response(request)
+            if getattr(_estado, 'escribio', False) and alias_replica():
+                fijar_primaria(request)
+            return response
+        finally:
+            _reiniciar_estado()
+
+
+class LecturaReplicaMixin:
+    """
+    Mixin para ViewSets: las acciones de `acciones_replica` leen de la
+    réplica salvo que el usuario haya escrito recientemente (o en este
+    mismo request, p. ej. dentro de un POST /batch/).
+    """
+    acciones_replica = ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        # La autenticación (JWT) ocurre aquí, antes de decidir la base.
+        super().initial(request, *args, **kwargs)
+        if (self.action in self.acciones_replica
+                and not getattr(_estado, 'escribio', False)
+                and not fijado_a_primaria(request)):
+            _estado.replica = True
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        _estado.replica = False
+        return super().finalize_response(request, response, *args, **kwargs)
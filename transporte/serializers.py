@@ -1,5 +1,15 @@
+from datetime import timezone
+
+from django.db import transaction
 from rest_framework import serializers
-from .models import Vehiculo, Aeronave, Conductor, Piloto, Cliente, Carga, Ruta, Despacho
+from rest_framework.validators import UniqueValidator
+from .atrasos import ESTADOS_ABIERTOS
+from .codigos import PREFIJO as PREFIJO_CODIGO, codigo_despacho
+from .consolidacion import validar_capacidad
+from .models import (
+    Vehiculo, Aeronave, Conductor, Piloto, Cliente, Carga, Ruta, Despacho,
+    DespachoArchivado, Job, Ubicacion, normalizar_ubicacion,
+)
 
 
 class VehiculoSerializer(serializers.ModelSerializer):
@@ -60,6 +70,25 @@ class CargaSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class UbicacionSerializer(serializers.ModelSerializer):
+    """
+    Serializador para el modelo Ubicacion.
+    La clave se calcula a partir del nombre y debe ser única.
+    """
+    class Meta:
+        model = Ubicacion
+        fields = '__all__'
+        read_only_fields = ['clave']
+
+    def validate_nombre(self, value):
+        repetida = Ubicacion.objects.filter(clave=normalizar_ubicacion(value))
+        if self.instance is not None:
+            repetida = repetida.exclude(pk=self.instance.pk)
+        if repetida.exists():
+            raise serializers.ValidationError("Ya existe una ubicación equivalente.")
+        return value
+
+
 class RutaSerializer(serializers.ModelSerializer):
     """
     Serializador para el modelo Ruta.
@@ -74,6 +103,8 @@ class DespachoSerializer(serializers.ModelSerializer):
     Serializador para el modelo Despacho.
     Incluye información anidada de las relaciones (ruta, carga, vehículo, etc.)
     para facilitar la visualización en el frontend.
+    El peso de la carga y las cargas adicionales no puede superar la
+    capacidad del vehículo o la aeronave.
     """
     # Campos anidados de solo lectura para mostrar detalles completos en la respuesta API
     ruta_info = RutaSerializer(source='ruta', read_only=True)
@@ -86,4 +117,306 @@ class DespachoSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Despacho
-        fields = '__all__'
+        exclude = ['eliminado_en', 'consolidado_en']
+        # El código sigue siendo único contra eliminados y archivados; si
+        # no se indica, se genera al guardar
+        extra_kwargs = {
+            'codigo': {'required': False, 'allow_null': True, 'validators': [
+                UniqueValidator(queryset=Despacho.todos.all()),
+                UniqueValidator(
+                    queryset=DespachoArchivado.objects.all(),
+                    message="Ya existe un despacho archivado con este código.",
+                ),
+            ]},
+            # En UTC, igual que la salida de DespachoFilaSerializer
+            'eta': {'default_timezone': timezone.utc},
+            # Con modelo intermedio DRF lo deja de solo lectura; se escribe con set()
+            'cargas_adicionales': {
+                'read_only': False, 'required': False, 'queryset': Carga.objects.all(),
+            },
+        }
+
+    def validate_codigo(self, value):
+        # Vacío: uno nuevo recibe un código generado; uno existente conserva el suyo
+        if not value:
+            return self.instance.codigo if self.instance is not None else None
+        # El prefijo de los códigos generados es del servidor: uno escrito a
+        # mano chocaría después con la secuencia
+        if PREFIJO_CODIGO and value and value.startswith(PREFIJO_CODIGO) and (
+            self.instance is None or value != self.instance.codigo
+        ):
+            raise serializers.ValidationError(
+                f"Los códigos con prefijo '{PREFIJO_CODIGO}' se generan automáticamente; "
+                "deje el código vacío."
+            )
+        return value
+
+    def validate_cargas_adicionales(self, value):
+        if not value:
+            return value
+        otros = Despacho.objects.filter(estado__in=ESTADOS_ABIERTOS)
+        if self.instance is not None:
+            otros = otros.exclude(pk=self.instance.pk)
+        ids = [carga.pk for carga in value]
+        ocupadas = set(otros.filter(carga__in=ids).values_list('carga_id', flat=True))
+        ocupadas.update(otros.filter(cargas_adicionales__in=ids).values_list('cargas_adicionales', flat=True))
+        if ocupadas:
+            raise serializers.ValidationError(
+                f"Las cargas {sorted(ocupadas)} ya van en otro despacho pendiente o en ruta."
+            )
+        return value
+
+    def validate(self, attrs):
+        # Solo se valida el peso si cambia la carga o el activo
+        if not {'carga', 'cargas_adicionales', 'vehiculo', 'aeronave'} & set(attrs):
+            return attrs
+
+        def actual(campo):
+            return attrs[campo] if campo in attrs else getattr(self.instance, campo, None)
+
+        carga = actual('carga')
+        if 'cargas_adicionales' in attrs:
+            adicionales = attrs['cargas_adicionales']
+        elif self.instance is not None:
+            adicionales = list(self.instance.cargas_adicionales.all())
+        else:
+            adicionales = []
+        if carga is not None and carga in adicionales:
+            raise serializers.ValidationError(
+                {"cargas_adicionales": "La carga principal no puede ser también adicional."}
+            )
+        peso = sum(c.peso_kg for c in adicionales) + (carga.peso_kg if carga is not None else 0)
+        error = validar_capacidad(peso, actual('vehiculo'), actual('aeronave'))
+        if error:
+            raise serializers.ValidationError(error)
+        return attrs
+
+
+class EnvioCargaSerializer(CargaSerializer):
+    """Datos de la carga de un envío (el cliente se indica aparte)."""
+    class Meta(CargaSerializer.Meta):
+        fields = None
+        exclude = ['cliente']
+
+
+class EnvioDespachoSerializer(DespachoSerializer):
+    """Datos del despacho de un envío (la carga se crea en el mismo request)."""
+    class Meta(DespachoSerializer.Meta):
+        exclude = DespachoSerializer.Meta.exclude + ['carga', 'cargas_adicionales']
+
+
+class EnvioSerializer(serializers.Serializer):
+    """
+    Alta de un envío: carga y despacho validados juntos y creados en una
+    sola transacción. El cliente se indica por id (`cliente`) o por RUT
+    (`cliente_rut`). Si el despacho no trae `codigo`, se genera uno.
+    """
+    cliente = serializers.PrimaryKeyRelatedField(queryset=Cliente.objects.all(), required=False)
+    cliente_rut = serializers.SlugRelatedField(
+        slug_field='rut', queryset=Cliente.objects.all(), required=False, write_only=True,
+    )
+    carga = EnvioCargaSerializer()
+    despacho = EnvioDespachoSerializer()
+
+    def validate(self, attrs):
+        por_id, por_rut = attrs.pop('cliente', None), attrs.pop('cliente_rut', None)
+        if por_id is None and por_rut is None:
+            raise serializers.ValidationError({"cliente": "Indique 'cliente' (id) o 'cliente_rut'."})
+        if por_id is not None and por_rut is not None and por_id != por_rut:
+            raise serializers.ValidationError({"cliente_rut": "No corresponde al cliente indicado."})
+        attrs['cliente'] = por_id or por_rut
+        despacho = attrs['despacho']
+        error = validar_capacidad(
+            attrs['carga']['peso_kg'], despacho.get('vehiculo'), despacho.get('aeronave'),
+        )
+        if error:
+            raise serializers.ValidationError({"despacho": error})
+        return attrs
+
+    def create(self, validated_data):
+        datos_despacho = dict(validated_data['despacho'])
+        # Fuera de la transacción, para que el asignador pueda reservar un bloque
+        codigo = datos_despacho.pop('codigo', None) or codigo_despacho()
+        with transaction.atomic():
+            carga = Carga.objects.create(cliente=validated_data['cliente'], **validated_data['carga'])
+            return Despacho.objects.create(carga=carga, codigo=codigo, **datos_despacho)
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """
+    Serializador para el modelo Job.
+    Solo `tipo` y `parametros` se indican al encolar; el resto lo informa
+    el worker.
+    """
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'tipo', 'parametros', 'estado', 'progreso', 'mensaje',
+            'resultado', 'error', 'intentos', 'max_intentos', 'creado',
+            'iniciado', 'terminado',
+        ]
+        read_only_fields = [
+            'estado', 'progreso', 'mensaje', 'resultado', 'error', 'intentos',
+            'creado', 'iniciado', 'terminado',
+        ]
+
+    def validate_tipo(self, value):
+        """Verifica que el tipo corresponda a una tarea registrada."""
+        from .jobs import tareas_registradas
+        if value not in tareas_registradas():
+            raise serializers.ValidationError(f"Tipo de trabajo desconocido: {value}")
+        return value
+
+    def validate_parametros(self, value):
+        """Los parámetros se pasan como keywords a la tarea."""
+        if not isinstance(value, dict):
+            raise serializers.ValidationError("Debe ser un objeto JSON.")
+        return value
+
+
+# ------------------------------------------------
+# SERIALIZADORES RÁPIDOS (solo lectura, acciones `list`)
+# ------------------------------------------------
+
+class FilaSerializer:
+    """
+    Serializador de solo lectura que arma los dicts directamente desde filas
+    `.values()`, sin instanciar modelos ni recorrer los campos de DRF.
+    Debe producir la misma salida que el ModelSerializer equivalente.
+
+    - `campos`: nombres de salida, en el mismo orden que el ModelSerializer.
+      Un campo puede ser una tupla (nombre_salida, ruta_orm).
+    - `anidados`: dicts `{nombre_salida: (relacion, FilaSerializer)}`; se
+      insertan en la posición del campo con el mismo nombre en `campos`.
+    - `listas`: `{nombre_salida: campo_many_to_many}`; la lista de ids
+      relacionados (ordenados) se lee con una consulta extra a la tabla
+      intermedia.
+    """
+    campos = ()
+    anidados = {}
+    listas = {}
+
+    @classmethod
+    def _plan(cls, prefijo=''):
+        """
+        Lista de (clave_salida, columna | sub-plan) para armar cada fila.
+        Un sub-plan es (columna_pk, plan) y vale None si la FK es nula.
+        """
+        plan = []
+        for campo in cls.campos:
+            salida, ruta = campo if isinstance(campo, tuple) else (campo, campo)
+            if salida in cls.anidados:
+                relacion, sub = cls.anidados[salida]
+                sub_prefijo = f"{prefijo}{relacion}__"
+                plan.append((salida, (sub_prefijo + 'id', sub._plan(sub_prefijo))))
+            elif salida in cls.listas:
+                plan.append((salida, None))
+            else:
+                plan.append((salida, prefijo + ruta))
+        return plan
+
+    @classmethod
+    def columnas(cls, plan=None):
+        """Columnas que se deben pedir a `.values()`."""
+        columnas = []
+        for _, fuente in plan if plan is not None else cls._plan():
+            if isinstance(fuente, tuple):
+                columnas.extend(cls.columnas(fuente[1]))
+            elif fuente is not None:
+                columnas.append(fuente)
+        return columnas
+
+    @classmethod
+    def _armar(cls, fila, plan):
+        resultado = {}
+        for salida, fuente in plan:
+            if isinstance(fuente, tuple):
+                columna_pk, sub_plan = fuente
+                resultado[salida] = None if fila[columna_pk] is None else cls._armar(fila, sub_plan)
+            elif fuente is None:
+                resultado[salida] = []
+            else:
+                resultado[salida] = fila[fuente]
+        return resultado
+
+    @classmethod
+    def lista(cls, queryset):
+        """Serializa un queryset completo con una sola consulta (más una por lista)."""
+        plan = cls._plan()
+        armar = cls._armar
+        filas = [armar(fila, plan) for fila in queryset.values(*cls.columnas(plan))]
+        for salida, relacion in cls.listas.items():
+            if filas:
+                cls._llenar_lista(queryset, filas, salida, relacion)
+        return filas
+
+    @staticmethod
+    def _llenar_lista(queryset, filas, salida, relacion):
+        campo = queryset.model._meta.get_field(relacion)
+        origen = campo.m2m_field_name() + '_id'
+        destino = campo.m2m_reverse_field_name() + '_id'
+        por_id = {fila['id']: fila[salida] for fila in filas}
+        # Subconsulta en lugar de una lista de ids: sin límite de parámetros
+        pares = campo.remote_field.through._base_manager.using(queryset.db).filter(
+            **{origen + '__in': queryset.values('pk')}
+        ).order_by(destino).values_list(origen, destino)
+        for pk, relacionado in pares:
+            if pk in por_id:
+                por_id[pk].append(relacionado)
+
+
+class VehiculoFilaSerializer(FilaSerializer):
+    campos = ('id', 'patente', 'marca', 'modelo', 'capacidad_kg', 'tipo_transporte')
+
+
+class AeronaveFilaSerializer(FilaSerializer):
+    campos = ('id', 'codigo', 'modelo', 'capacidad_kg')
+
+
+class ConductorFilaSerializer(FilaSerializer):
+    campos = ('id', 'nombre', 'apellido', 'licencia', 'vigente')
+
+
+class PilotoFilaSerializer(FilaSerializer):
+    campos = ('id', 'nombre', 'apellido', 'certificacion', 'vigente')
+
+
+class ClienteFilaSerializer(FilaSerializer):
+    campos = ('id', 'nombre', 'rut', 'correo', 'telefono', 'activo')
+
+
+class CargaFilaSerializer(FilaSerializer):
+    campos = (
+        'id', ('cliente_nombre', 'cliente__nombre'), 'descripcion', 'peso_kg',
+        'tipo', 'valor', ('cliente', 'cliente_id'),
+    )
+
+
+class UbicacionFilaSerializer(FilaSerializer):
+    campos = ('id', 'nombre', 'clave', 'latitud', 'longitud')
+
+
+class RutaFilaSerializer(FilaSerializer):
+    campos = (
+        'id', 'origen', 'destino', 'tipo_transporte', 'distancia_km',
+        ('ubicacion_origen', 'ubicacion_origen_id'), ('ubicacion_destino', 'ubicacion_destino_id'),
+    )
+
+
+class DespachoFilaSerializer(FilaSerializer):
+    campos = (
+        'id', 'ruta_info', 'carga_info', 'vehiculo_info', 'aeronave_info',
+        'conductor_info', 'piloto_info', 'codigo', 'fecha', 'estado', 'eta', 'atrasado',
+        ('ruta', 'ruta_id'), ('carga', 'carga_id'), ('vehiculo', 'vehiculo_id'),
+        ('aeronave', 'aeronave_id'), ('conductor', 'conductor_id'), ('piloto', 'piloto_id'),
+        'cargas_adicionales',
+    )
+    listas = {'cargas_adicionales': 'cargas_adicionales'}
+    anidados = {
+        'ruta_info': ('ruta', RutaFilaSerializer),
+        'carga_info': ('carga', CargaFilaSerializer),
+        'vehiculo_info': ('vehiculo', VehiculoFilaSerializer),
+        'aeronave_info': ('aeronave', AeronaveFilaSerializer),
+        'conductor_info': ('conductor', ConductorFilaSerializer),
+        'piloto_info': ('piloto', PilotoFilaSerializer),
+    }
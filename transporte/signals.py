@@ -0,0 +1,131 @@
+"""
+Señales de la app `transporte`.
+Se conectan en `TransporteConfig.ready()`.
+"""
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import atrasos, auditoria, geo
+from .authentication import revocar_usuario
+from .models import Ruta, Ubicacion
+from .versiones import incrementar_version
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidar_version_tabla(sender, **kwargs):
+    """Incrementa la versión de la tabla al guardar o eliminar un registro."""
+    if sender._meta.app_label == 'transporte':
+        incrementar_version(sender)
+
+
+@receiver(m2m_changed)
+def invalidar_version_relacion(sender, instance, action, reverse, model, **kwargs):
+    """
+    Un cambio en un many-to-many modifica la tabla del lado que declara el
+    campo: se incrementa su versión.
+    """
+    modelo = model if reverse else type(instance)
+    if modelo._meta.app_label == 'transporte' and action in ('post_add', 'post_remove', 'post_clear'):
+        incrementar_version(modelo)
+
+
+# ==========================================
+# REVOCACIÓN DE TOKENS
+# ==========================================
+# Los JWT llevan is_staff, is_superuser y permisos, y la autenticación sin
+# consulta no vuelve a leer al usuario: cualquier cambio de esos datos
+# revoca sus tokens.
+
+CAMPOS_TOKEN = ('is_active', 'password', 'is_staff', 'is_superuser')
+
+
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def revocar_tokens_usuario(sender, instance, **kwargs):
+    """
+    Revoca los JWT de un usuario desactivado o con contraseña, is_staff o
+    is_superuser cambiados.
+    """
+    update_fields = kwargs.get('update_fields')
+    if instance.pk is None or (update_fields is not None and not set(CAMPOS_TOKEN) & set(update_fields)):
+        return
+    anterior = sender._base_manager.filter(pk=instance.pk).values(*CAMPOS_TOKEN).first()
+    if anterior is None:
+        return
+    if any(anterior[campo] != getattr(instance, campo) for campo in CAMPOS_TOKEN):
+        revocar_usuario(instance.pk)
+
+
+def _usuarios_de_grupos(grupos):
+    Usuario = apps.get_model(settings.AUTH_USER_MODEL)
+    return Usuario._base_manager.filter(groups__in=grupos).values_list('pk', flat=True).distinct()
+
+
+def _revocar(usuarios):
+    for usuario in set(usuarios):
+        revocar_usuario(usuario)
+
+
+@receiver(m2m_changed)
+def revocar_tokens_permisos(sender, instance, action, reverse, model, pk_set, **kwargs):
+    """
+    Revoca los JWT de los usuarios cuyos grupos o permisos cambian, directos
+    (`user.groups`, `user.user_permissions`) o a través de un grupo
+    (`group.permissions`).
+    """
+    Usuario = apps.get_model(settings.AUTH_USER_MODEL)
+    Group = apps.get_model('auth', 'Group')
+    if sender in (Usuario.groups.through, Usuario.user_permissions.through):
+        relacion = 'groups' if sender is Usuario.groups.through else 'user_permissions'
+        por_grupo = False
+    elif sender is Group.permissions.through:
+        relacion = 'permissions'
+        por_grupo = True
+    else:
+        return
+
+    if not reverse:
+        # `instance` es el usuario (o el grupo) que cambia
+        if action not in ('post_add', 'post_remove', 'post_clear'):
+            return
+        afectados = [instance.pk]
+    elif action in ('post_add', 'post_remove'):
+        afectados = pk_set
+    elif action == 'pre_clear':
+        # Después del clear ya no se sabe a quiénes afectaba
+        modelo = Group if por_grupo else Usuario
+        afectados = modelo._base_manager.filter(**{relacion: instance.pk}).values_list('pk', flat=True)
+    else:
+        return
+    _revocar(_usuarios_de_grupos(afectados) if por_grupo else afectados)
+
+
+@receiver(pre_delete, sender='auth.Group')
+def revocar_tokens_grupo(sender, instance, **kwargs):
+    """Borrar un grupo quita sus permisos a los miembros."""
+    _revocar(_usuarios_de_grupos([instance.pk]))
+
+
+@receiver(post_save, sender=Ubicacion)
+@receiver(post_delete, sender=Ubicacion)
+def actualizar_indice_espacial(sender, instance, signal, **kwargs):
+    """Mantiene al día el índice espacial del proceso (ver `geo.py`)."""
+    pk = instance.pk  # Tras eliminar, Django deja el pk en None
+    lat, lon = (None, None) if signal is post_delete else (instance.latitud, instance.longitud)
+    transaction.on_commit(lambda: geo.indice.actualizar(pk, lat, lon))
+
+
+@receiver(post_save, sender=Ruta)
+def recalcular_eta_despachos(sender, instance, created, update_fields=None, **kwargs):
+    """Propaga a los despachos abiertos un cambio de distancia o tipo de la ruta."""
+    if created or (update_fields is not None and not {'distancia_km', 'tipo_transporte'} & update_fields):
+        return
+    atrasos.recalcular_eta(instance)
+
+
+# Auditoría de cambios de todos los modelos de la app
+auditoria.conectar(apps.get_app_config('transporte').get_models())
@@ -0,0 +1,90 @@
+"""
+Tareas en segundo plano de la app `transporte`.
+Se registran al importar el módulo (ver `TransporteConfig.ready()`) y las
+ejecutan los workers de `manage.py run_workers`.
+"""
+
+from django.db import transaction
+from django.utils.dateparse import parse_date
+
+from . import auditoria
+from .archivo import archivar
+from .atrasos import marcar_atrasados
+from .jobs import tarea
+from .manifiestos import generar, ruta_zip
+from .models import Despacho, ESTADO_DESPACHO
+from .versiones import incrementar_version
+
+
+@tarea('cambiar_estado_despachos')
+def cambiar_estado_despachos(job, ids, estado, lote=500):
+    """
+    Cambio masivo de estado de despachos, en lotes con su propia transacción
+    para no bloquear la tabla durante todo el proceso.
+    """
+    if estado not in dict(ESTADO_DESPACHO):
+        raise ValueError(f"Estado inválido: {estado}")
+
+    total = len(ids)
+    actualizados = 0
+    for inicio in range(0, total, lote):
+        with transaction.atomic():
+            despachos = Despacho.objects.filter(pk__in=ids[inicio:inicio + lote])
+            # `update()` no dispara señales: auditar a mano los que cambian
+            anteriores = list(despachos.exclude(estado=estado).values_list('pk', 'estado'))
+            actualizados += despachos.update(estado=estado)
+            for pk, anterior in anteriores:
+                auditoria.registrar(Despacho, pk, 'MODIFICAR', {'estado': [anterior, estado]})
+        job.reportar_progreso(min(inicio + lote, total), total,
+                              f"{actualizados} despachos actualizados")
+
+    # `update()` no dispara señales: invalidar las cachés manualmente
+    incrementar_version(Despacho)
+    return {"actualizados": actualizados}
+
+
+@tarea('archivar_despachos')
+def archivar_despachos(job, antes, lote=1000):
+    """Versión en segundo plano de `manage.py archivar_despachos`."""
+    fecha = parse_date(antes)
+    if fecha is None:
+        raise ValueError(f"Fecha inválida: {antes}")
+    movidos = archivar(
+        fecha, lote=lote,
+        progreso=lambda movidos, total: job.reportar_progreso(
+            movidos, total, f"{movidos} despachos archivados"
+        ),
+    )
+    return {"archivados": movidos}
+
+
+@tarea('detectar_atrasos')
+def detectar_atrasos(job, lote=1000):
+    """Versión en segundo plano de `manage.py detectar_atrasos`."""
+    marcados = marcar_atrasados(
+        lote=lote,
+        progreso=lambda marcados, total: job.reportar_progreso(
+            marcados, total, f"{marcados} despachos marcados como atrasados"
+        ),
+    )
+    return {"atrasados": marcados}
+
+
+@tarea('generar_manifiestos')
+def generar_manifiestos(job, fecha, procesos=None):
+    """
+    Versión en segundo plano de `manage.py generar_manifiestos`. El ZIP se
+    descarga con GET /manifiestos/{job_id}/.
+    """
+    dia = parse_date(fecha)
+    if dia is None:
+        raise ValueError(f"Fecha inválida: {fecha}")
+    destino = ruta_zip(dia, job.pk)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    resumen = generar(
+        dia, destino, procesos=procesos,
+        progreso=lambda hechos, total: job.reportar_progreso(
+            hechos, total, f"{hechos} de {total} manifiestos"
+        ),
+    )
+    return resumen
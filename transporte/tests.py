@@ -1,3 +1,1172 @@
-from django.test import TestCase
+import copy
+import datetime
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.db import IntegrityError, OperationalError, connection, connections, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+
+from logistica import openapi
+
+from . import (
+    analitica, atrasos, auditoria, batch, codigos, consolidacion, flota, geo, idempotencia, jobs, manifiestos,
+    routers, serializers, versiones,
+)
+from .authentication import JWTSinConsultaAuthentication, TokenConClaimsSerializer, revocaciones
+from .models import (
+    Aeronave, Carga, ClaveIdempotencia, Cliente, Conductor, Despacho, Job, Piloto, RegistroAuditoria, Ruta,
+    SecuenciaCodigo, Ubicacion, Vehiculo, normalizar_ubicacion,
+)
+from .renderers import ORJSONRenderer
+from .throttling import VentanaDeslizanteThrottle
+
+
+def crear_datos():
+    """Cliente, carga y ruta mínimos para armar despachos."""
+    cliente = Cliente.objects.create(nombre="Cliente Uno", rut="11111111-1", correo="uno@example.com")
+    carga = Carga.objects.create(descripcion="Cajas", peso_kg=100, tipo="general", valor=1000, cliente=cliente)
+    ruta = Ruta.objects.create(origen="Santiago", destino="Valparaíso", tipo_transporte="TERRESTRE", distancia_km=120)
+    return cliente, carga, ruta
+
+
+class BorradoProtegidoTests(TestCase):
+    """Borrar un registro referenciado por despachos responde 409, no 500."""
+
+    def setUp(self):
+        self.api = APIClient()
+        self.cliente, self.carga, self.ruta = crear_datos()
+        self.despacho = Despacho.objects.create(
+            fecha=datetime.date(2025, 1, 10), ruta=self.ruta, carga=self.carga,
+        )
+
+    def test_cliente_con_despachos(self):
+        resp = self.api.delete(f"/clientes/{self.cliente.pk}/")
+        self.assertEqual(resp.status_code, 409)
+        self.assertTrue(Cliente.objects.filter(pk=self.cliente.pk).exists())
+
+    def test_despacho_eliminado_logicamente_sigue_protegiendo(self):
+        self.despacho.eliminar()
+        for url in (f"/clientes/{self.cliente.pk}/", f"/cargas/{self.carga.pk}/", f"/rutas/{self.ruta.pk}/"):
+            with self.subTest(url=url):
+                self.assertEqual(self.api.delete(url).status_code, 409)
+
+    def test_eliminado_con_incluir_archivo(self):
+        self.despacho.eliminar()
+        url = f"/despachos/{self.despacho.pk}/"
+        self.assertEqual(self.api.get(url).status_code, 404)
+        self.assertEqual(self.api.get(url, {"incluir_archivo": 1}).json()["codigo"], self.despacho.codigo)
+        self.assertEqual(self.api.get("/despachos/").json(), [])
+        listado = self.api.get("/despachos/", {"incluir_archivo": 1}).json()
+        self.assertEqual([d["id"] for d in listado], [self.despacho.pk])
+
+    def test_cliente_sin_despachos(self):
+        otro = Cliente.objects.create(nombre="Cliente Dos", rut="22222222-2", correo="dos@example.com")
+        self.assertEqual(self.api.delete(f"/clientes/{otro.pk}/").status_code, 204)
+
+
+class PronosticoTests(TestCase):
+
+    def setUp(self):
+        self.api = APIClient()
+        _, self.carga, self.ruta = crear_datos()
+
+    def test_ruta(self):
+        resp = self.api.get("/analitica/pronostico/", {"ruta": self.ruta.pk, "dias": 7})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([r["ruta"] for r in resp.json()["rutas"]], [self.ruta.pk])
+        self.assertEqual(len(resp.json()["rutas"][0]["dias"]), 7)
+
+    def test_ruta_inexistente(self):
+        resp = self.api.get("/analitica/pronostico/", {"ruta": self.ruta.pk + 1})
+        self.assertEqual(resp.status_code, 404)
+
+
+class SaludTests(TestCase):
+
+    def test_ok(self):
+        self.assertEqual(APIClient().get("/salud/").json()["estado"], "ok")
+
+    def test_error_sin_detalle_interno(self):
+        error = OperationalError('could not connect to server: host "db-interno"')
+        with mock.patch.object(connection, 'cursor', side_effect=error), \
+                self.assertLogs('transporte.views', 'ERROR'):
+            resp = APIClient().get("/salud/")
+        self.assertEqual(resp.status_code, 503)
+        self.assertNotIn("db-interno", resp.content.decode())
+
+
+@jobs.tarea('prueba_dormir')
+def _dormir(job, segundos=0):
+    time.sleep(segundos)
+    return {"durmio": segundos}
+
+
+class JobsTests(TestCase):
+
+    def reclamar(self, worker="w1", **campos):
+        jobs.encolar('prueba_dormir', **campos)
+        return jobs.reclamar(worker)
+
+    def test_ejecutar(self):
+        job = jobs.ejecutar(self.reclamar())
+        job.refresh_from_db()
+        self.assertEqual((job.estado, job.resultado), ('COMPLETADO', {"durmio": 0}))
+
+    def test_recuperar_respeta_max_intentos(self):
+        vencido = timezone.now() - datetime.timedelta(seconds=jobs.LATIDO_TIMEOUT + 1)
+        reintentable = self.reclamar()
+        agotado = self.reclamar()
+        Job.objects.filter(pk=agotado.pk).update(intentos=3)
+        Job.objects.update(latido=vencido)
+
+        self.assertEqual(jobs.recuperar_abandonados(), 1)
+        self.assertEqual(Job.objects.get(pk=reintentable.pk).estado, 'PENDIENTE')
+        self.assertEqual(Job.objects.get(pk=agotado.pk).estado, 'FALLIDO')
+
+    def test_worker_recuperado_no_sobrescribe(self):
+        job = self.reclamar("w1")
+        # Se dio por abandonado y lo tomó otro worker
+        Job.objects.filter(pk=job.pk).update(estado='PENDIENTE', worker='')
+        jobs.reclamar("w2")
+
+        jobs.ejecutar(job)
+        job.refresh_from_db()
+        self.assertEqual((job.estado, job.worker), ('EN_PROCESO', 'w2'))
+
+
+class LatidoJobsTests(TransactionTestCase):
+
+    def test_latido_durante_la_tarea(self):
+        jobs.encolar('prueba_dormir', segundos=0.5)
+        job = jobs.reclamar("w1")
+        inicio = job.latido
+        with mock.patch.object(jobs, 'LATIDO_INTERVALO', 0.1):
+            jobs.ejecutar(job)
+        job.refresh_from_db()
+        self.assertEqual(job.estado, 'COMPLETADO')
+        self.assertGreater(job.latido, inicio)
+
+
+class ThrottlingTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.cliente = Cliente.objects.create(nombre="Cliente", rut="1-9", correo="c@example.com")
+
+    def test_rechazado_no_cuenta_en_otros_limites(self):
+        tasas = {'anonimo': '3/min', 'listas': '2/min'}
+        api = APIClient()
+        with mock.patch.dict(VentanaDeslizanteThrottle.THROTTLE_RATES, tasas), \
+                mock.patch.object(VentanaDeslizanteThrottle, 'timer', staticmethod(lambda: 6000.0)):
+            self.assertEqual([api.get("/clientes/").status_code for _ in range(3)], [200, 200, 429])
+            # El rechazo de 'listas' no consumió el cupo 'anonimo'
+            self.assertEqual(api.get(f"/clientes/{self.cliente.pk}/").status_code, 200)
+            self.assertEqual(api.get(f"/clientes/{self.cliente.pk}/").status_code, 429)
+
+
+class VistasHtmlTests(TestCase):
+    """Las vistas HTML usan el ORM directamente: no pasan por el límite de la API."""
+
+    def setUp(self):
+        cache.clear()
+        usuario = get_user_model().objects.create_user("operador", password="clave-segura-123")
+        self.client.force_login(usuario)
+        self.cliente, self.carga, self.ruta = crear_datos()
+
+    def test_home(self):
+        Despacho.objects.create(fecha=datetime.date(2025, 1, 10), ruta=self.ruta, carga=self.carga)
+        resp = self.client.get("/site/")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.context["despachos_count"], 1)
+        self.assertEqual(resp.context["despachos_labels"], ["PENDIENTE"])
+
+    def test_crud_clientes(self):
+        datos = {"nombre": "Nuevo", "rut": "33333333-3", "correo": "n@example.com", "estado": "1"}
+        self.assertRedirects(self.client.post("/site/clientes/crear/", datos), "/site/clientes/",
+                             fetch_redirect_response=False)
+        nuevo = Cliente.objects.get(rut="33333333-3")
+
+        datos["nombre"] = "Renombrado"
+        self.client.post(f"/site/clientes/{nuevo.pk}/editar/", datos)
+        nuevo.refresh_from_db()
+        self.assertEqual(nuevo.nombre, "Renombrado")
+
+        self.client.post(f"/site/clientes/{nuevo.pk}/eliminar/")
+        self.assertFalse(Cliente.objects.filter(pk=nuevo.pk).exists())
+
+    def test_eliminar_protegido(self):
+        Despacho.objects.create(fecha=datetime.date(2025, 1, 10), ruta=self.ruta, carga=self.carga)
+        resp = self.client.post(f"/site/clientes/{self.cliente.pk}/eliminar/")
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(Cliente.objects.filter(pk=self.cliente.pk).exists())
+
+    def test_despachos_editar(self):
+        despacho = Despacho.objects.create(fecha=datetime.date(2025, 1, 10), ruta=self.ruta, carga=self.carga)
+        resp = self.client.get(f"/site/despachos/{despacho.pk}/editar/")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.context["despacho"]["carga"], self.carga.pk)
+        self.assertEqual([c["id"] for c in resp.context["cargas"]], [self.carga.pk])
+
+    def test_despachos_crear_sin_codigo(self):
+        datos = {"codigo": "", "fecha": "2025-01-10", "ruta": self.ruta.pk, "carga": self.carga.pk,
+                 "estado": "PENDIENTE"}
+        resp = self.client.post("/site/despachos/crear/", datos)
+        self.assertRedirects(resp, "/site/despachos/", fetch_redirect_response=False)
+        despacho = Despacho.objects.get()
+        self.assertRegex(despacho.codigo, r"^DSP-\d{8}$")
+
+        self.client.post(f"/site/despachos/{despacho.pk}/editar/", {**datos, "estado": "EN_RUTA"})
+        codigo = despacho.codigo
+        despacho.refresh_from_db()
+        self.assertEqual((despacho.codigo, despacho.estado), (codigo, "EN_RUTA"))
+
+
+class RevocacionTokensTests(TestCase):
+
+    def setUp(self):
+        # La copia local sobrevive al rollback de la prueba anterior
+        revocaciones.invalidar()
+        self.usuario = get_user_model().objects.create_user("operador", password="clave-segura-123")
+
+    def tokens(self):
+        resp = APIClient().post("/api/token/", {"username": "operador", "password": "clave-segura-123"})
+        self.assertEqual(resp.status_code, 200)
+        return resp.json()
+
+    def api(self, access):
+        return APIClient(HTTP_AUTHORIZATION=f"Bearer {access}")
+
+    def assertVigente(self, access, vigente=True):
+        self.assertEqual(self.api(access).get("/jobs/").status_code, 200 if vigente else 401)
+
+    def test_cambio_de_contrasena(self):
+        anterior = self.tokens()
+        self.usuario.set_password("otra-clave-segura-456")
+        self.usuario.save()
+        self.assertVigente(anterior["access"], False)
+        # Emitido en el mismo segundo que el cambio: sigue valiendo
+        resp = APIClient().post("/api/token/", {"username": "operador", "password": "otra-clave-segura-456"})
+        self.assertVigente(resp.json()["access"])
+
+    def test_cambio_de_permisos(self):
+        cambios = [
+            lambda: setattr(self.usuario, 'is_staff', True) or self.usuario.save(),
+            lambda: self.usuario.user_permissions.add(Permission.objects.get(codename='view_carga')),
+            lambda: Group.objects.create(name="operaciones").user_set.add(self.usuario),
+            lambda: Group.objects.get(name="operaciones").permissions.add(
+                Permission.objects.get(codename='view_ruta')),
+            lambda: Permission.objects.get(codename='view_ruta').group_set.clear(),
+            lambda: self.usuario.groups.clear(),
+        ]
+        for i, cambio in enumerate(cambios):
+            with self.subTest(cambio=i):
+                access = self.tokens()["access"]
+                cambio()
+                self.assertVigente(access, False)
+
+    def test_guardado_sin_cambios_no_revoca(self):
+        access = self.tokens()["access"]
+        self.usuario.first_name = "Ana"
+        self.usuario.save()
+        self.assertVigente(access)
+
+    def test_logout(self):
+        tokens = self.tokens()
+        otra_sesion = self.tokens()
+        resp = self.api(tokens["access"]).post("/api/token/logout/", {"refresh": tokens["refresh"]})
+        self.assertEqual(resp.status_code, 204)
+        self.assertVigente(tokens["access"], False)
+        resp = APIClient().post("/api/token/refresh/", {"refresh": tokens["refresh"]})
+        self.assertEqual(resp.status_code, 401)
+        self.assertVigente(otra_sesion["access"])
+
+        self.api(otra_sesion["access"]).post("/api/token/logout/", {"todos": True}, format="json")
+        resp = APIClient().post("/api/token/refresh/", {"refresh": otra_sesion["refresh"]})
+        self.assertEqual(resp.status_code, 401)
+
+    def test_sin_consulta(self):
+        access = AccessToken(str(TokenConClaimsSerializer.get_token(self.usuario).access_token))
+        autenticacion = JWTSinConsultaAuthentication()
+        self.assertEqual(str(autenticacion.get_user(access).pk), str(self.usuario.pk))
+        self.usuario.is_active = False
+        self.usuario.save()
+        with self.assertRaises(AuthenticationFailed):
+            autenticacion.get_user(access)
+
+
+class CodigosDespachoTests(TestCase):
+
+    def setUp(self):
+        self.api = APIClient()
+        _, self.carga, self.ruta = crear_datos()
+
+    def crear(self, **datos):
+        datos = {"fecha": "2025-01-10", "ruta": self.ruta.pk, "carga": self.carga.pk, **datos}
+        return self.api.post("/despachos/", datos, format="json")
+
+    def test_codigo_generado(self):
+        resp = self.crear()
+        self.assertEqual(resp.status_code, 201)
+        self.assertRegex(resp.json()["codigo"], r"^DSP-\d{8}$")
+
+    def test_codigo_con_prefijo_reservado(self):
+        self.assertEqual(self.crear(codigo="DSP-00000001").status_code, 400)
+        self.assertEqual(self.crear(codigo="MANUAL-1").status_code, 201)
+
+    def test_editar_conserva_codigo_generado(self):
+        despacho = self.crear().json()
+        datos = {k: despacho[k] for k in ("codigo", "fecha", "ruta", "carga", "estado")}
+        resp = self.api.put(f"/despachos/{despacho['id']}/", {**datos, "estado": "EN_RUTA"}, format="json")
+        self.assertEqual(resp.status_code, 200)
+
+
+class CodigosConcurrenciaTests(TransactionTestCase):
+    """Hilos con su propia conexión dando de alta despachos a la vez."""
+
+    HILOS = 4
+    POR_HILO = 15
+
+    def test_codigos_unicos(self):
+        _, carga, ruta = crear_datos()
+        errores = []
+        barrera = threading.Barrier(self.HILOS)
+
+        def dar_de_alta():
+            try:
+                barrera.wait()
+                for _ in range(self.POR_HILO):
+                    with transaction.atomic():
+                        Despacho.objects.create(fecha=datetime.date(2025, 1, 10), ruta=ruta, carga=carga)
+            except Exception as exc:  # Se reporta en el hilo principal
+                errores.append(exc)
+            finally:
+                connection.close()
+
+        # Bloques chicos para forzar varias reservas por hilo
+        with mock.patch.object(codigos.asignador_despachos, 'bloque', 4):
+            hilos = [threading.Thread(target=dar_de_alta) for _ in range(self.HILOS)]
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+
+        self.assertEqual(errores, [])
+        generados = list(Despacho.objects.values_list('codigo', flat=True))
+        self.assertEqual(len(generados), self.HILOS * self.POR_HILO)
+        self.assertEqual(len(set(generados)), len(generados))
+
+    def test_asignadores_independientes(self):
+        # Como procesos distintos: cada uno con su propio bloque en memoria
+        asignadores = [codigos.Asignador('prueba', bloque=3) for _ in range(3)]
+        numeros = [n for _ in range(4) for a in asignadores for n in a.numeros(2)]
+        self.assertEqual(len(set(numeros)), len(numeros))
+
+    def test_reservar_aparte(self):
+        self.assertEqual(codigos.reservar_aparte('aparte', 10), 1)
+        self.assertEqual(codigos.reservar_aparte('aparte', 5), 11)
+        self.assertEqual(SecuenciaCodigo.objects.get(nombre='aparte').siguiente, 16)
+
+
+class IdempotenciaTests(TestCase):
+
+    def setUp(self):
+        self.api = APIClient()
+        self.datos = {"nombre": "Cliente", "rut": "44444444-4", "correo": "c@example.com"}
+
+    def post(self, datos, clave="clave-1"):
+        return self.api.post("/clientes/", datos, format="json", HTTP_IDEMPOTENCY_KEY=clave)
+
+    def test_reintento_repite_la_respuesta(self):
+        primera = self.post(self.datos)
+        segunda = self.post(self.datos)
+        self.assertEqual((primera.status_code, segunda.status_code), (201, 201))
+        self.assertEqual(segunda["Idempotent-Replayed"], "true")
+        self.assertEqual(segunda.json(), primera.json())
+        self.assertEqual(Cliente.objects.count(), 1)
+
+    def test_misma_clave_otro_cuerpo(self):
+        self.post(self.datos)
+        resp = self.post({**self.datos, "nombre": "Otro"})
+        self.assertEqual(resp.status_code, 422)
+        self.assertEqual(Cliente.objects.count(), 1)
+
+    def test_en_curso(self):
+        ClaveIdempotencia.objects.create(
+            propietario="ip127.0.0.1", clave="clave-1", huella="h",
+            expira=timezone.now() + datetime.timedelta(hours=1),
+        )
+        with mock.patch.object(idempotencia, '_huella', return_value="h"), \
+                mock.patch.object(idempotencia, 'ESPERA', 0):
+            resp = self.post(self.datos)
+        self.assertEqual(resp.status_code, 409)
+        self.assertFalse(Cliente.objects.exists())
+
+    def test_error_de_validacion_no_se_guarda(self):
+        self.assertEqual(self.post({**self.datos, "correo": "no-es-correo"}).status_code, 400)
+        self.assertEqual(self.post(self.datos).status_code, 201)
+
+
+class ConsolidacionTests(TestCase):
+    """
+    Camión de 500 kg con una carga de 100 y dos despachos sin activo
+    (300 y 350 kg) en la misma ruta y fecha: la de 350 sube al camión, la de
+    300 queda en su despacho y el de 350 se vacía.
+    """
+    fecha = datetime.date(2025, 3, 3)
+
+    def setUp(self):
+        self.api = APIClient()
+        self.cliente, carga, self.ruta = crear_datos()
+        self.otro = Cliente.objects.create(nombre="Cliente Dos", rut="22222222-2", correo="dos@example.com")
+        self.camion = Vehiculo.objects.create(patente="AB1234", marca="Volvo", modelo="FH", capacidad_kg=500)
+        self.d1 = self.despacho(carga, vehiculo=self.camion)
+        self.d2 = self.despacho(self.carga(300, self.cliente))
+        self.d3 = self.despacho(self.carga(350, self.otro))
+
+    def carga(self, peso, cliente):
+        return Carga.objects.create(descripcion=f"{peso} kg", peso_kg=peso, tipo="general", valor=peso * 10, cliente=cliente)
+
+    def despacho(self, carga, **kwargs):
+        return Despacho.objects.create(fecha=self.fecha, ruta=self.ruta, carga=carga, **kwargs)
+
+    def consolidar(self):
+        self.api.force_authenticate(get_user_model().objects.create_user("op", password="x"))
+        return self.api.post("/despachos/consolidar/", {"fecha": str(self.fecha)}, format="json")
+
+    def test_validar_capacidad(self):
+        self.assertIsNone(consolidacion.validar_capacidad(500, self.camion, None))
+        self.assertIn("supera la capacidad", consolidacion.validar_capacidad(501, self.camion, None))
+        self.assertIsNone(consolidacion.validar_capacidad(10 ** 6, None, None))
+
+    def test_planificar(self):
+        asignadas = consolidacion.planificar([self.d1, self.d2, self.d3], {})
+        self.assertEqual(
+            {d.pk: sorted(c.peso_kg for c in cargas) for d, cargas in asignadas.items()},
+            {self.d1.pk: [100, 350], self.d2.pk: [300]},
+        )
+
+    def test_consolidar_requiere_autenticacion(self):
+        resp = self.api.post("/despachos/consolidar/", {}, format="json")
+        self.assertEqual(resp.status_code, 401)
+        self.assertEqual(Despacho.objects.count(), 3)
+
+    def test_consolidar(self):
+        resp = self.consolidar()
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual((resp.json()["despachos_antes"], resp.json()["despachos_despues"]), (3, 2))
+        self.assertEqual([c.peso_kg for c in self.d1.cargas_adicionales.all()], [350])
+        self.assertFalse(Despacho.objects.filter(pk=self.d3.pk).exists())
+        self.assertEqual(Despacho.todos.get(pk=self.d3.pk).consolidado_en_id, self.d1.pk)
+
+    def test_consolidado_sigue_visible(self):
+        self.consolidar()
+        resp = self.api.get(f"/despachos/{self.d3.pk}/")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual((resp.json()["id"], resp.json()["consolidado_desde"]), (self.d1.pk, self.d3.pk))
+        self.d2.eliminar()
+        self.assertEqual(self.api.get(f"/despachos/{self.d2.pk}/").status_code, 404)
+
+    def test_serializer_rechaza_exceso(self):
+        d = self.despacho(self.carga(150, self.cliente), vehiculo=self.camion)
+        suelta = self.carga(400, self.cliente)
+        resp = self.api.patch(f"/despachos/{d.pk}/", {"cargas_adicionales": [suelta.pk]}, format="json")
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("supera la capacidad", str(resp.json()))
+
+    def test_metricas_incluyen_adicionales(self):
+        self.consolidar()
+        desde = hasta = self.fecha
+        sql = analitica.metricas_rutas_sql(desde, hasta)
+        self.assertEqual(sql, analitica.metricas_rutas_numpy(analitica.cargar_arreglos(desde, hasta)))
+        self.assertEqual((sql[0]["despachos"], sql[0]["peso_kg"], sql[0]["ingresos"]), (2, 750, 7500))
+        self.assertEqual(sql[0]["factor_carga_promedio"], 0.9)
+        ubicaciones = analitica.despachos_por_ubicacion(desde, hasta)
+        self.assertEqual((ubicaciones[0]["despachos"], ubicaciones[0]["peso_kg"]), (2, 750))
+
+    def test_resumen_cliente_incluye_adicionales(self):
+        self.consolidar()
+        resumen = self.api.get(f"/clientes/{self.otro.pk}/resumen/").json()
+        self.assertEqual(resumen["total_despachos"], 1)
+        self.assertEqual(resumen["ultimos_despachos"][0]["id"], self.d1.pk)
+
+    def test_manifiesto_incluye_adicionales(self):
+        self.consolidar()
+        grupo = next(g for g in manifiestos.grupos(self.fecha) if g['tipo'] == 'vehiculo')
+        _, html, _ = manifiestos.renderizar(grupo)
+        self.assertIn("1 despachos, 2 cargas, 450 kg", html.decode())
+
+
+class EnviosTests(TestCase):
+
+    def setUp(self):
+        self.api = APIClient()
+        self.cliente, self.carga, self.ruta = crear_datos()
+
+    def enviar(self, carga=None, **despacho):
+        return self.api.post("/envios/", {
+            "cliente": self.cliente.pk,
+            "carga": {"descripcion": "Pallets", "peso_kg": 200, "tipo": "general", "valor": 500, **(carga or {})},
+            "despacho": {"fecha": "2025-01-10", "ruta": self.ruta.pk, **despacho},
+        }, format="json")
+
+    def test_crea_carga_y_despacho(self):
+        resp = self.api.post("/envios/", {
+            "cliente_rut": self.cliente.rut,
+            "carga": {"descripcion": "Pallets", "peso_kg": 200, "tipo": "general", "valor": 500},
+            "despacho": {"fecha": "2025-01-10", "ruta": self.ruta.pk},
+        }, format="json")
+        self.assertEqual(resp.status_code, 201)
+        despacho = Despacho.objects.get(pk=resp.json()["id"])
+        self.assertRegex(despacho.codigo, r"^DSP-\d{8}$")
+        self.assertEqual((despacho.carga.cliente, despacho.carga.peso_kg), (self.cliente, 200))
+        self.assertEqual(resp.json()["carga_info"]["descripcion"], "Pallets")
+
+    def test_excede_capacidad_no_crea_nada(self):
+        camion = Vehiculo.objects.create(patente="AB1234", marca="Volvo", modelo="FH", capacidad_kg=150)
+        resp = self.enviar(vehiculo=camion.pk)
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("despacho", resp.json())
+        self.assertEqual((Carga.objects.count(), Despacho.objects.count()), (1, 0))
+
+    def test_error_al_crear_el_despacho_revierte_la_carga(self):
+        with mock.patch.object(Despacho, 'save', side_effect=IntegrityError("codigo duplicado")), \
+                self.assertRaises(IntegrityError):
+            self.enviar()
+        self.assertEqual(Carga.objects.count(), 1)
+
+    def test_campos_excluidos(self):
+        otro = Cliente.objects.create(nombre="Cliente Dos", rut="22222222-2", correo="dos@example.com")
+        resp = self.api.post("/envios/", {
+            "cliente": self.cliente.pk,
+            "carga": {"descripcion": "Pallets", "peso_kg": 200, "tipo": "general", "valor": 500, "cliente": otro.pk},
+            "despacho": {"fecha": "2025-01-10", "ruta": self.ruta.pk, "carga": self.carga.pk,
+                         "cargas_adicionales": [self.carga.pk], "eliminado_en": "2025-01-01T00:00:00Z"},
+        }, format="json")
+        self.assertEqual(resp.status_code, 201)
+        despacho = Despacho.objects.get(pk=resp.json()["id"])
+        self.assertNotEqual(despacho.carga, self.carga)
+        self.assertEqual(despacho.carga.cliente, self.cliente)
+        self.assertEqual((list(despacho.cargas_adicionales.all()), despacho.eliminado_en), ([], None))
+
+    def test_no_acepta_consolidado_en(self):
+        otro = Despacho.objects.create(fecha=datetime.date(2025, 1, 10), ruta=self.ruta, carga=self.carga)
+        resp = self.enviar(consolidado_en=otro.pk)
+        self.assertEqual(resp.status_code, 201)
+        self.assertIsNone(Despacho.objects.get(pk=resp.json()["id"]).consolidado_en_id)
+
+
+class OpenApiTests(TestCase):
+
+    def test_esquema_por_version_con_host_del_request(self):
+        openapi._esquemas.clear()
+        for host in ("a.example.com", "b.example.com"):
+            resp = self.client.get("/openapi/?format=openapi", HTTP_HOST=host)
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual(resp.json()["host"], host)
+        self.assertEqual(len(openapi._esquemas), 1)
+
+
+class IndiceEspacialTests(TestCase):
+    """Ruta Santiago - Valparaíso (~100 km) con coordenadas en sus ubicaciones."""
+    SANTIAGO = (-33.45, -70.66)
+    VALPARAISO = (-33.05, -71.62)
+
+    def setUp(self):
+        self.api = APIClient()
+        _, _, self.ruta = crear_datos()
+        self.ubicar("Santiago", *self.SANTIAGO)
+        self.ubicar("Valparaíso", *self.VALPARAISO)
+        geo.indice._version = None  # Recarga en la primera consulta
+
+    def ubicar(self, nombre, lat, lon):
+        ubicacion = Ubicacion.desde_nombre(nombre)
+        ubicacion.latitud, ubicacion.longitud = lat, lon
+        with self.captureOnCommitCallbacks(execute=True):
+            ubicacion.save()
+
+    def cercanas(self, lat, lon, **params):
+        return self.api.get("/rutas/cercanas/", {"lat": lat, "lon": lon, **params})
+
+    def test_en_radio_incluye_el_borde(self):
+        valparaiso = Ubicacion.desde_nombre("Valparaíso").pk
+        distancia = geo.distancia_km(*self.SANTIAGO, *self.VALPARAISO)
+        self.assertIn(valparaiso, dict(geo.indice.en_radio(*self.SANTIAGO, distancia)))
+        self.assertNotIn(valparaiso, dict(geo.indice.en_radio(*self.SANTIAGO, distancia - 0.01)))
+
+    def test_extremo(self):
+        origen = self.cercanas(*self.VALPARAISO, radio_km=10).json()
+        destino = self.cercanas(*self.VALPARAISO, radio_km=10, extremo="destino").json()
+        self.assertEqual(origen, [])
+        self.assertEqual([(r["id"], r["distancia_punto_km"]) for r in destino], [(self.ruta.pk, 0.0)])
+
+    def test_radio(self):
+        self.assertEqual(self.cercanas(*self.SANTIAGO, radio_km=0).status_code, 400)
+        self.assertEqual(self.cercanas(*self.SANTIAGO, radio_km=20001).status_code, 400)
+        # Sin radio_km: 50 km
+        self.assertEqual([r["id"] for r in self.cercanas(*self.SANTIAGO).json()], [self.ruta.pk])
+
+    def test_cambio_de_ruta_y_ubicacion(self):
+        rancagua = (-34.17, -70.74)
+        self.ruta.origen = "Rancagua"
+        self.ruta.save()
+        self.assertEqual(self.cercanas(*self.SANTIAGO, radio_km=10).json(), [])
+        self.assertEqual(self.cercanas(*rancagua, radio_km=10).json(), [])
+        self.ubicar("Rancagua", *rancagua)
+        self.assertEqual([r["id"] for r in self.cercanas(*rancagua, radio_km=10).json()], [self.ruta.pk])
+
+
+class UbicacionesTests(TestCase):
+
+    def test_normalizar_ubicacion(self):
+        for nombre in ("Viña del Mar", "  viña-del-mar ", "VINA DEL MAR", "Viña, del  Mar."):
+            with self.subTest(nombre=nombre):
+                self.assertEqual(normalizar_ubicacion(nombre), "vina del mar")
+        self.assertEqual(normalizar_ubicacion(None), "")
+
+    def test_ruta_reutiliza_la_ubicacion(self):
+        a = Ruta.objects.create(origen="Viña del Mar", destino="Santiago", tipo_transporte="TERRESTRE", distancia_km=120)
+        b = Ruta.objects.create(origen="SANTIAGO", destino="vina-del-mar", tipo_transporte="TERRESTRE", distancia_km=120)
+        self.assertEqual((a.ubicacion_origen_id, a.ubicacion_destino_id), (b.ubicacion_destino_id, b.ubicacion_origen_id))
+        self.assertEqual(Ubicacion.objects.get(pk=a.ubicacion_origen_id).nombre, "Viña del Mar")
+
+
+class MigracionTestCase(TransactionTestCase):
+    """Vuelve la base a `antes`, y al terminar a la última migración."""
+    antes = despues = None
+
+    def migrar(self, destino):
+        executor = MigrationExecutor(connection)
+        executor.migrate(destino)
+        return executor.loader.project_state(destino).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+
+class UbicacionesMigracionTests(MigracionTestCase):
+    """Datos de 0008: una ubicación por texto normalizado, con el primer nombre visto."""
+    antes = [('transporte', '0007_ubicacion')]
+    despues = [('transporte', '0008_ubicacion_datos')]
+
+    def test_agrupa_por_nombre_normalizado(self):
+        Ruta = self.migrar(self.antes).get_model('transporte', 'Ruta')
+        for origen, destino in (("Viña del Mar", "Santiago"), ("  vina-del-mar ", "SANTIAGO"),
+                                ("Santiago.", "Viña del mar")):
+            Ruta.objects.create(origen=origen, destino=destino, tipo_transporte="TERRESTRE", distancia_km=120)
+
+        apps = self.migrar(self.despues)
+        Ruta, Ubicacion = apps.get_model('transporte', 'Ruta'), apps.get_model('transporte', 'Ubicacion')
+        nombres = dict(Ubicacion.objects.values_list('clave', 'nombre'))
+        self.assertEqual(nombres, {"vina del mar": "Viña del Mar", "santiago": "Santiago"})
+        ids = {clave: pk for pk, clave in Ubicacion.objects.values_list('pk', 'clave')}
+        for origen, destino in Ruta.objects.order_by('pk').values_list('ubicacion_origen', 'ubicacion_destino')[:2]:
+            self.assertEqual((origen, destino), (ids["vina del mar"], ids["santiago"]))
+        self.assertEqual(
+            list(Ruta.objects.order_by('-pk').values_list('ubicacion_origen', 'ubicacion_destino')[:1]),
+            [(ids["santiago"], ids["vina del mar"])],
+        )
+
+
+class EtaTests(TestCase):
+    """Salida a las 8:00 hora local; 60 km/h por tierra y 650 km/h por aire."""
+    fecha = datetime.date(2025, 1, 10)
+
+    def setUp(self):
+        self.api = APIClient()
+        _, self.carga, self.ruta = crear_datos()
+
+    def hora_local(self, hora, minuto=0):
+        return timezone.make_aware(datetime.datetime.combine(self.fecha, datetime.time(hora, minuto)))
+
+    def despacho(self, ruta=None, **kwargs):
+        return Despacho.objects.create(fecha=self.fecha, ruta=ruta or self.ruta, carga=self.carga, **kwargs)
+
+    def test_terrestre_y_aereo(self):
+        aerea = Ruta.objects.create(origen="Santiago", destino="Lima", tipo_transporte="AEREO", distancia_km=2470)
+        self.assertEqual(self.despacho().eta, self.hora_local(10))
+        self.assertEqual(self.despacho(aerea).eta, self.hora_local(11, 48))
+
+    @override_settings(DESPACHO_HORA_SALIDA=6)
+    def test_hora_de_salida(self):
+        self.assertEqual(self.despacho().eta, self.hora_local(8))
+
+    def test_cambio_de_distancia(self):
+        abierto, entregado = self.despacho(), self.despacho(estado='ENTREGADO')
+        self.ruta.distancia_km = 180
+        self.ruta.save()
+        abierto.refresh_from_db()
+        entregado.refresh_from_db()
+        self.assertEqual((abierto.eta, entregado.eta), (self.hora_local(11), self.hora_local(10)))
+
+    def test_atrasados_en_el_limite(self):
+        en_ruta = self.despacho(estado='EN_RUTA')
+        self.despacho()  # PENDIENTE con la misma eta: no se marca
+        eta = en_ruta.eta
+        self.assertFalse(atrasos.atrasados(eta).exists())
+        self.assertEqual(list(atrasos.atrasados(eta + datetime.timedelta(microseconds=1))), [en_ruta])
+
+        self.assertEqual(atrasos.marcar_atrasados(eta + datetime.timedelta(seconds=1)), 1)
+        self.assertEqual(atrasos.marcar_atrasados(eta + datetime.timedelta(seconds=1)), 0)
+        self.assertEqual([d["id"] for d in self.api.get("/despachos/atrasados/").json()], [en_ruta.pk])
+
+
+class EtaMigracionTests(MigracionTestCase):
+    """Datos de 0011: eta de los despachos existentes."""
+    antes = [('transporte', '0010_despacho_eta')]
+    despues = [('transporte', '0011_despacho_eta_datos')]
+
+    def test_calcula_eta(self):
+        apps = self.migrar(self.antes)
+        Ubicacion, Ruta = apps.get_model('transporte', 'Ubicacion'), apps.get_model('transporte', 'Ruta')
+        Cliente, Carga = apps.get_model('transporte', 'Cliente'), apps.get_model('transporte', 'Carga')
+        Despacho = apps.get_model('transporte', 'Despacho')
+        a = Ubicacion.objects.create(nombre="Santiago", clave="santiago")
+        b = Ubicacion.objects.create(nombre="Lima", clave="lima")
+        cliente = Cliente.objects.create(nombre="Cliente Uno", rut="11111111-1", correo="uno@example.com")
+        carga = Carga.objects.create(descripcion="Cajas", peso_kg=100, tipo="general", valor=1000, cliente=cliente)
+        fecha = datetime.date(2025, 1, 10)
+        for codigo, tipo, distancia in (("T-1", "TERRESTRE", 120), ("A-1", "AEREO", 2470)):
+            ruta = Ruta.objects.create(origen="Santiago", destino="Lima", tipo_transporte=tipo, distancia_km=distancia,
+                                       ubicacion_origen=a, ubicacion_destino=b)
+            Despacho.objects.create(codigo=codigo, fecha=fecha, ruta=ruta, carga=carga, estado='PENDIENTE')
+
+        Despacho = self.migrar(self.despues).get_model('transporte', 'Despacho')
+        salida = timezone.make_aware(datetime.datetime.combine(fecha, datetime.time(8)))
+        self.assertEqual(dict(Despacho.objects.values_list('codigo', 'eta')), {
+            "T-1": salida + datetime.timedelta(minutes=120),
+            "A-1": salida + datetime.timedelta(minutes=228),
+        })
+
+
+class BatchTests(TestCase):
+
+    def setUp(self):
+        self.api = APIClient()
+        self.usuario = get_user_model().objects.create_user("op", password="x")
+
+    def lote(self, *solicitudes, **datos):
+        resp = self.api.post("/batch/", {"solicitudes": list(solicitudes), **datos}, format="json")
+        self.assertEqual(resp.status_code, 200)
+        return resp.data["respuestas"]
+
+    def test_status_por_solicitud(self):
+        respuestas = self.lote(
+            {"id": "crear", "metodo": "POST", "url": "/clientes/",
+             "cuerpo": {"nombre": "Cliente Uno", "rut": "1-9", "correo": "uno@example.com"}},
+            {"id": "invalido", "metodo": "POST", "url": "/clientes/", "cuerpo": {"nombre": "Sin rut"}},
+            {"id": "falta", "url": "/clientes/999999/"},
+            {"id": "externa", "url": "/auditoria/"},
+        )
+        self.assertEqual([(r["id"], r["status"]) for r in respuestas],
+                         [("crear", 201), ("invalido", 400), ("falta", 404), ("externa", 400)])
+        self.assertTrue(Cliente.objects.filter(rut="1-9").exists())
+
+    def test_atomico_revierte(self):
+        respuestas = self.lote(
+            {"metodo": "POST", "url": "/clientes/",
+             "cuerpo": {"nombre": "Cliente Uno", "rut": "1-9", "correo": "uno@example.com"}},
+            {"metodo": "POST", "url": "/clientes/", "cuerpo": {}},
+            {"id": "omitida", "url": "/clientes/"},
+            atomico=True,
+        )
+        self.assertEqual([r["status"] for r in respuestas], [201, 400, 424])
+        self.assertEqual(respuestas[2]["id"], "omitida")
+        self.assertFalse(Cliente.objects.exists())
+
+    def test_anonimo_no_hereda_permisos(self):
+        respuestas = self.lote({"url": "/jobs/"}, {"metodo": "POST", "url": "/despachos/consolidar/", "cuerpo": {}})
+        self.assertEqual([r["status"] for r in respuestas], [403, 403])
+
+    def test_usa_el_usuario_del_request(self):
+        otro = get_user_model().objects.create_user("otro", password="x")
+        propio = Job.objects.create(tipo='prueba_dormir', creado_por=self.usuario)
+        Job.objects.create(tipo='prueba_dormir', creado_por=otro)
+        self.api.force_authenticate(self.usuario)
+        [respuesta] = self.lote({"url": "/jobs/"})
+        self.assertEqual(respuesta["status"], 200)
+        filas = respuesta["cuerpo"]["results"] if isinstance(respuesta["cuerpo"], dict) else respuesta["cuerpo"]
+        self.assertEqual([fila["id"] for fila in filas], [propio.pk])
+
+    def test_limite_y_entrada_invalida(self):
+        excedido = [{"url": "/rutas/"}] * (batch.MAXIMO + 1)
+        for datos in ({"solicitudes": excedido}, {"solicitudes": []}, {"solicitudes": "/rutas/"}, {}):
+            self.assertEqual(self.api.post("/batch/", datos, format="json").status_code, 400)
+
+        respuestas = self.lote("/rutas/", {"metodo": "TRACE", "url": "/rutas/"}, {"url": "rutas/"},
+                               {"url": "/no-existe/"})
+        self.assertEqual([r["status"] for r in respuestas], [400, 400, 400, 400])
+
+
+class AuditoriaTests(TestCase):
+
+    def setUp(self):
+        auditoria._buffer.clear()
+        self.api = APIClient()
+        self.usuario = get_user_model().objects.create_user("op", password="x")
+        self.api.force_authenticate(self.usuario)
+
+    def llamar(self, metodo, url, datos=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = getattr(self.api, metodo)(url, datos, format="json")
+        auditoria.escribir()
+        return resp
+
+    def registros(self, objeto):
+        return list(RegistroAuditoria.objects.filter(
+            modelo=objeto._meta.model_name, objeto_id=objeto.pk,
+        ).order_by('pk').values_list('accion', 'cambios', 'usuario_id'))
+
+    def test_crear_modificar(self):
+        resp = self.llamar("post", "/clientes/", {"nombre": "Cliente Uno", "rut": "1-9", "correo": "uno@example.com"})
+        cliente = Cliente.objects.get(pk=resp.json()["id"])
+        self.llamar("patch", f"/clientes/{cliente.pk}/", {"nombre": "Cliente Renombrado"})
+        self.assertEqual(self.registros(cliente), [
+            ('CREAR', {"nombre": [None, "Cliente Uno"], "rut": [None, "1-9"], "correo": [None, "uno@example.com"],
+                       "telefono": [None, ""], "activo": [None, True]}, self.usuario.pk),
+            ('MODIFICAR', {"nombre": ["Cliente Uno", "Cliente Renombrado"]}, self.usuario.pk),
+        ])
+
+    def test_guardar_sin_cambios_no_registra(self):
+        cliente = Cliente.objects.create(nombre="Cliente Uno", rut="1-9", correo="uno@example.com")
+        self.llamar("patch", f"/clientes/{cliente.pk}/", {"nombre": "Cliente Uno"})
+        self.assertEqual(self.registros(cliente), [])
+
+    def test_eliminacion_logica(self):
+        _, carga, ruta = crear_datos()
+        despacho = Despacho.objects.create(fecha=datetime.date(2025, 1, 10), ruta=ruta, carga=carga)
+        self.assertEqual(self.llamar("delete", f"/despachos/{despacho.pk}/").status_code, 204)
+        accion, cambios, usuario_id = self.registros(despacho)[-1]
+        self.assertEqual((accion, list(cambios), cambios["eliminado_en"][0], usuario_id),
+                         ('MODIFICAR', ['eliminado_en'], None, self.usuario.pk))
+
+    def test_buffer(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Cliente.objects.create(nombre="Cliente Uno", rut="1-9", correo="uno@example.com")
+        self.assertFalse(RegistroAuditoria.objects.exists())
+        self.assertEqual(len(auditoria._buffer), 1)
+        auditoria.escribir()
+        self.assertEqual((RegistroAuditoria.objects.count(), auditoria._buffer), (1, []))
+
+    def test_buffer_lleno_se_escribe(self):
+        with mock.patch.object(auditoria, 'LOTE', 2), self.captureOnCommitCallbacks(execute=True):
+            Cliente.objects.create(nombre="Cliente Uno", rut="1-9", correo="uno@example.com")
+            Cliente.objects.create(nombre="Cliente Dos", rut="2-7", correo="dos@example.com")
+        self.assertEqual((RegistroAuditoria.objects.count(), auditoria._buffer), (2, []))
+
+    def test_rollback_no_registra(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                Cliente.objects.create(nombre="Cliente Uno", rut="1-9", correo="uno@example.com")
+                transaction.set_rollback(True)
+        auditoria.escribir()
+        self.assertFalse(RegistroAuditoria.objects.exists())
+
+
+class AuditoriaMiddlewareTests(TransactionTestCase):
+
+    def test_escribe_al_terminar_el_request(self):
+        auditoria._buffer.clear()
+        resp = APIClient().post("/clientes/", {"nombre": "Cliente Uno", "rut": "1-9", "correo": "uno@example.com"},
+                                format="json")
+        self.assertEqual(auditoria._buffer, [])
+        self.assertEqual(list(RegistroAuditoria.objects.values_list('modelo', 'objeto_id', 'accion')),
+                         [('cliente', resp.json()["id"], 'CREAR')])
+
+
+class FilaSerializerTests(TestCase):
+    """Cada FilaSerializer produce el mismo JSON que su ModelSerializer."""
+
+    PARES = (
+        (Vehiculo, serializers.VehiculoSerializer, serializers.VehiculoFilaSerializer),
+        (Aeronave, serializers.AeronaveSerializer, serializers.AeronaveFilaSerializer),
+        (Conductor, serializers.ConductorSerializer, serializers.ConductorFilaSerializer),
+        (Piloto, serializers.PilotoSerializer, serializers.PilotoFilaSerializer),
+        (Cliente, serializers.ClienteSerializer, serializers.ClienteFilaSerializer),
+        (Carga, serializers.CargaSerializer, serializers.CargaFilaSerializer),
+        (Ubicacion, serializers.UbicacionSerializer, serializers.UbicacionFilaSerializer),
+        (Ruta, serializers.RutaSerializer, serializers.RutaFilaSerializer),
+        (Despacho, serializers.DespachoSerializer, serializers.DespachoFilaSerializer),
+    )
+
+    def setUp(self):
+        cliente, carga, ruta = crear_datos()
+        extras = [
+            Carga.objects.create(descripcion=f"Extra {i}", peso_kg=10 + i, tipo="fragil", valor=500, cliente=cliente)
+            for i in range(2)
+        ]
+        aerea = Ruta.objects.create(origen="Santiago", destino="Lima", tipo_transporte="AEREO", distancia_km=2470)
+        Ubicacion.objects.filter(nombre="Santiago").update(latitud=-33.45, longitud=-70.67)
+        terrestre = Despacho.objects.create(
+            fecha=datetime.date(2025, 1, 10), ruta=ruta, carga=carga, estado='EN_RUTA',
+            vehiculo=Vehiculo.objects.create(patente="AB1234", marca="Volvo", modelo="FH", capacidad_kg=5000),
+            conductor=Conductor.objects.create(nombre="Ana", apellido="Rojas", licencia="L-1"),
+        )
+        terrestre.cargas_adicionales.set(extras)
+        Despacho.objects.create(
+            fecha=datetime.date(2025, 1, 11), ruta=aerea, carga=extras[0],
+            aeronave=Aeronave.objects.create(codigo="CC-ABC", modelo="A320", capacidad_kg=20000),
+            piloto=Piloto.objects.create(nombre="Luis", apellido="Soto", certificacion="ATP", vigente=False),
+        )
+
+    def test_misma_salida(self):
+        renderer = ORJSONRenderer()
+        for modelo, model_serializer, fila_serializer in self.PARES:
+            with self.subTest(modelo=modelo.__name__):
+                queryset = modelo.objects.order_by('pk')
+                self.assertTrue(queryset.exists())
+                self.assertEqual(
+                    renderer.render(fila_serializer.lista(queryset)),
+                    renderer.render(model_serializer(queryset, many=True).data),
+                )
+
+    def test_queryset_vacio(self):
+        self.assertEqual(serializers.DespachoFilaSerializer.lista(Despacho.objects.none()), [])
+
+
+class VersionesTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.cliente, self.carga, self.ruta = crear_datos()
+        self.despacho = Despacho.objects.create(fecha=datetime.date(2025, 1, 10), ruta=self.ruta, carga=self.carga)
+
+    def test_escrituras_incrementan_la_version(self):
+        extra = Carga.objects.create(descripcion="Extra", peso_kg=10, tipo="general", valor=100, cliente=self.cliente)
+        escrituras = (
+            (Ruta, lambda: Ruta.objects.get(pk=self.ruta.pk).save()),
+            (Despacho, lambda: self.despacho.cargas_adicionales.add(extra)),
+            (Despacho, lambda: extra.despachos_consolidados.clear()),
+            (Despacho, lambda: self.despacho.eliminar()),
+            (Cliente, lambda: Cliente.objects.create(nombre="Otro", rut="2-7", correo="o@example.com").delete()),
+        )
+        for modelo, escribir in escrituras:
+            with self.subTest(modelo=modelo.__name__):
+                antes = versiones.version_tabla(modelo)
+                escribir()
+                self.assertGreater(versiones.version_tabla(modelo), antes)
+
+    def test_version_tras_vaciar_la_cache(self):
+        antes = versiones.version_tabla(Ruta)
+        cache.clear()
+        self.assertGreaterEqual(versiones.version_tabla(Ruta), antes)
+        versiones.incrementar_version(Despacho)
+        self.assertIsNotNone(cache.get(versiones._clave(Despacho)))
+
+    def test_fragmento_html_se_renueva(self):
+        self.client.force_login(get_user_model().objects.create_user("operador", password="x"))
+        self.assertContains(self.client.get("/site/despachos/"), "Valparaíso")
+
+        # update() no emite señales: se sigue sirviendo el fragmento cacheado
+        Ruta.objects.filter(pk=self.ruta.pk).update(destino="Antofagasta")
+        self.assertNotContains(self.client.get("/site/despachos/"), "Antofagasta")
+
+        # Guardar una tabla de la que depende la lista invalida el fragmento
+        ruta = Ruta.objects.get(pk=self.ruta.pk)
+        ruta.destino = "Concepción"
+        ruta.save()
+        self.assertContains(self.client.get("/site/despachos/"), "Concepción")
+
+    def test_pronostico_se_renueva(self):
+        hoy = datetime.date(2025, 1, 20)
+        antes = analitica.pronostico(hoy)
+        Despacho.objects.create(fecha=datetime.date(2025, 1, 15), ruta=self.ruta, carga=self.carga, estado='ENTREGADO')
+        self.assertIsNot(analitica.pronostico(hoy), antes)
+        self.assertEqual(analitica.pronostico(hoy), analitica.pronostico(hoy))
+
+
+class ReplicaTests(TransactionTestCase):
+    """
+    Ruteo a la réplica con un alias de prueba espejo de `default`
+    (`'TEST': {'MIRROR': 'default'}`, como en settings): ve los mismos datos
+    y cada consulta queda registrada en la conexión que la ejecutó.
+    """
+    # '__all__' se resuelve en setUpClass, ya con el alias agregado
+    databases = '__all__'
+    agregada = False
+
+    @classmethod
+    def setUpClass(cls):
+        # `connections.settings` es el mismo dict que settings.DATABASES
+        if 'replica' not in connections.settings:
+            replica = copy.deepcopy(connections['default'].settings_dict)
+            replica['TEST'] = {**replica['TEST'], 'MIRROR': 'default'}
+            connections.settings['replica'] = replica
+            cls.agregada = True
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        if cls.agregada:
+            connections['replica'].close()
+            del connections['replica']
+            del connections.settings['replica']
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+        self.cliente, self.carga, self.ruta = crear_datos()
+        self.despacho = Despacho.objects.create(fecha=datetime.date(2025, 1, 10), ruta=self.ruta, carga=self.carga)
+        # Sin auditoría pendiente: escribirla durante un GET lo fijaría a la primaria
+        auditoria.escribir()
+
+    def consultas(self, hacer):
+        """Retorna (respuesta, consultas en la réplica, consultas de `transporte` en la primaria)."""
+        with CaptureQueriesContext(connections['replica']) as replica, \
+                CaptureQueriesContext(connections['default']) as primaria:
+            resp = hacer()
+        transporte = [q for q in primaria.captured_queries if 'transporte_' in q['sql']]
+        return resp, len(replica), len(transporte)
+
+    def test_router(self):
+        router = routers.ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Despacho))
+        with routers.usar_replica():
+            self.assertEqual(router.db_for_read(Despacho), 'replica')
+            self.assertIsNone(router.db_for_read(get_user_model()))
+            # Los relacionados se leen de la base del objeto de origen
+            self.assertEqual(router.db_for_read(Ruta, instance=self.despacho), 'default')
+        self.assertEqual(router.db_for_write(Despacho), 'default')
+
+    def test_acciones_replica(self):
+        for url in ("/rutas/", f"/despachos/{self.despacho.pk}/", f"/clientes/{self.cliente.pk}/resumen/",
+                    "/despachos/atrasados/"):
+            with self.subTest(url=url):
+                resp, en_replica, en_primaria = self.consultas(lambda: self.api.get(url))
+                self.assertEqual(resp.status_code, 200)
+                self.assertGreater(en_replica, 0)
+                self.assertEqual(en_primaria, 0)
+
+    def test_escritura_fija_a_la_primaria(self):
+        self.api.post("/rutas/", {"origen": "Santiago", "destino": "Lima", "tipo_transporte": "AEREO",
+                                  "distancia_km": 2470}, format="json")
+        _, en_replica, en_primaria = self.consultas(lambda: self.api.get("/rutas/"))
+        self.assertEqual(en_replica, 0)
+        self.assertGreater(en_primaria, 0)
+
+        # Otro cliente (otra IP) sigue leyendo de la réplica
+        _, en_replica, _ = self.consultas(lambda: self.api.get("/rutas/", REMOTE_ADDR="10.0.0.2"))
+        self.assertGreater(en_replica, 0)
+
+    def test_escritura_en_el_mismo_request(self):
+        def lote():
+            return self.api.post("/batch/", {"solicitudes": [
+                {"metodo": "PATCH", "url": f"/rutas/{self.ruta.pk}/", "cuerpo": {"destino": "Lima"}},
+                {"url": f"/rutas/{self.ruta.pk}/"},
+            ]}, format="json", REMOTE_ADDR="10.0.0.3")
+        resp, en_replica, _ = self.consultas(lote)
+        self.assertEqual([r["status"] for r in resp.json()["respuestas"]], [200, 200])
+        self.assertEqual(resp.json()["respuestas"][1]["cuerpo"]["destino"], "Lima")
+        self.assertEqual(en_replica, 0)
+
+    def test_estado_por_hilo(self):
+        routers._reiniciar_estado()
+        hilo = threading.Thread(target=routers.ReplicaRouter().db_for_write, args=(Despacho,))
+        hilo.start()
+        hilo.join()
+        self.assertFalse(routers._estado.escribio)
+
+
+class AnaliticaRutasTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+        cliente, carga, self.ruta = crear_datos()
+
+        def nueva_carga(peso, valor):
+            return Carga.objects.create(descripcion="Cajas", peso_kg=peso, tipo="general", valor=valor, cliente=cliente)
+
+        vehiculo = Vehiculo.objects.create(patente="AB1234", marca="Volvo", modelo="FH", capacidad_kg=200)
+        fecha = datetime.date(2025, 1, 10)
+        con_activo = Despacho.objects.create(fecha=fecha, ruta=self.ruta, carga=carga, vehiculo=vehiculo)
+        con_activo.cargas_adicionales.set([nueva_carga(50, 500)])
+        Despacho.objects.create(fecha=fecha, ruta=self.ruta, carga=nueva_carga(200, 2000))
+        # Fuera de la ventana o cancelados no cuentan
+        Despacho.objects.create(fecha=fecha, ruta=self.ruta, carga=nueva_carga(999, 9999), estado='CANCELADO')
+        Despacho.objects.create(fecha=datetime.date(2024, 1, 10), ruta=self.ruta, carga=nueva_carga(999, 9999))
+
+    def metricas(self, **params):
+        resp = self.api.get("/analitica/rutas/", {"desde": "2025-01-01", "hasta": "2025-01-31", **params})
+        self.assertEqual(resp.status_code, 200)
+        return resp.json()
+
+    def test_metricas(self):
+        datos = self.metricas()
+        self.assertEqual(datos["total_despachos"], 2)
+        self.assertEqual(datos["rutas"], [{
+            "ruta": self.ruta.pk, "origen": "Santiago", "destino": "Valparaíso", "tipo_transporte": "TERRESTRE",
+            "distancia_km": 120, "despachos": 2, "peso_kg": 350, "kg_km": 42000, "ingresos": 3500,
+            # 3500 / (2 x 120 km); el factor solo promedia el despacho con vehículo: 150 / 200
+            "ingreso_por_km": 14.5833, "factor_carga_promedio": 0.75,
+        }])
+
+    def test_numpy_coincide_con_sql(self):
+        self.assertEqual(self.metricas(motor="numpy"), self.metricas())
+
+    def test_escenario_de_costos(self):
+        [ruta] = self.metricas(costo_km=2, costo_kg_km=0.01)["rutas"]
+        # 2 x 240 km + 0.01 x 42000 kg-km
+        self.assertEqual((ruta["costo"], ruta["margen"]), (900.0, 2600.0))
+        self.assertNotIn("costo", self.metricas()["rutas"][0])
+
+    def test_parametros_invalidos(self):
+        for params in ({"costo_km": "x"}, {"desde": "2025-02-01", "hasta": "2025-01-01"}, {"desde": "ayer"}):
+            with self.subTest(params=params):
+                self.assertEqual(self.api.get("/analitica/rutas/", params).status_code, 400)
+
+
+class CalendarioFlotaTests(TestCase):
+
+    def setUp(self):
+        self.api = APIClient()
+        cliente, carga, ruta = crear_datos()
+        self.ocupado = Vehiculo.objects.create(patente="AB1234", marca="Volvo", modelo="FH", capacidad_kg=5000)
+        self.libre = Vehiculo.objects.create(patente="CD5678", marca="Scania", modelo="R", capacidad_kg=5000)
+        self.conductor = Conductor.objects.create(nombre="Ana", apellido="Rojas", licencia="L-1")
+        for dia, estado in ((1, 'ENTREGADO'), (10, 'PENDIENTE'), (5, 'CANCELADO'), (11, 'PENDIENTE')):
+            Despacho.objects.create(fecha=datetime.date(2025, 1, dia), ruta=ruta, carga=carga, estado=estado,
+                                    vehiculo=self.ocupado, conductor=self.conductor if dia == 10 else None)
+
+    def calendario(self, **params):
+        resp = self.api.get("/flota/calendario/", {"desde": "2025-01-01", "hasta": "2025-01-10", **params})
+        self.assertEqual(resp.status_code, 200)
+        return resp.json()
+
+    def test_bitsets(self):
+        datos = self.calendario()
+        self.assertEqual((datos["dias"], set(datos["activos"])), (10, set(flota.TIPOS_ACTIVO)))
+        # Días 0 y 9 de la ventana: bit 0 del primer byte y bit 1 del segundo
+        self.assertEqual(
+            [(a["id"], a["dias_ocupados"], a["ocupado"]) for a in datos["activos"]["vehiculo"]],
+            [(self.ocupado.pk, 2, "AQI="), (self.libre.pk, 0, "AAA=")],
+        )
+        self.assertEqual([(a["id"], a["ocupado"]) for a in datos["activos"]["conductor"]],
+                         [(self.conductor.pk, "AAI=")])
+
+    def test_tipo_y_fechas(self):
+        datos = self.calendario(tipo="vehiculo", formato="fechas")
+        self.assertEqual(list(datos["activos"]), ["vehiculo"])
+        self.assertEqual(datos["activos"]["vehiculo"][0]["fechas_ocupadas"], ["2025-01-01", "2025-01-10"])
+
+    def test_una_consulta_de_despachos(self):
+        # Una consulta por tipo de activo más una sola sobre despachos
+        with self.assertNumQueries(len(flota.TIPOS_ACTIVO) + 1):
+            flota.calendario(datetime.date(2025, 1, 1), datetime.date(2025, 3, 31), list(flota.TIPOS_ACTIVO))
+
+    def test_parametros_invalidos(self):
+        for params in ({"tipo": "camion"}, {"hasta": "2026-01-10"}, {"hasta": "2024-12-31"}, {"desde": "ayer"}):
+            with self.subTest(params=params):
+                resp = self.api.get("/flota/calendario/", {"desde": "2025-01-01", "hasta": "2025-01-10", **params})
+                self.assertEqual(resp.status_code, 400)
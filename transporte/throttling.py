@@ -0,0 +1,132 @@
+"""
+Throttling de la API con contador de ventana deslizante.
+
+A diferencia de los throttles de DRF (que guardan el historial completo de
+timestamps con get/set, no atómico), aquí cada clave usa dos contadores de
+ventana fija (actual y anterior) incrementados con `cache.incr`, que es
+atómico en Redis. Así el límite se respeta entre todos los workers de
+gunicorn siempre que compartan la caché (ver CACHES en settings).
+
+El conteo estimado es:  anterior * (1 - fracción_transcurrida) + actual
+
+Los usuarios autenticados (JWT o sesión) se identifican por su id y los
+anónimos por IP.
+
+DRF consulta todos los throttles de la vista aunque uno ya haya rechazado
+el request. Un request rechazado no cuenta en ningún límite: el throttle
+que lo rechaza descuenta también lo que sumaron los anteriores, y los
+siguientes no lo cuentan.
+"""
+
+import math
+
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class VentanaDeslizanteThrottle(SimpleRateThrottle):
+    """Base: límite por usuario/IP con contador de ventana deslizante."""
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+
+    def get_cache_key(self, request, view):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            ident = f"u{user.pk}"
+        else:
+            ident = f"ip{self.get_ident(request)}"
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+    def allow_request(self, request, view):
+        if self.rate is None or getattr(request, '_throttle_rechazado', False):
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        ahora = self.timer()
+        ventana = int(ahora // self.duration)
+        clave_actual = f"{self.key}:{ventana}"
+
+        # La clave vive dos ventanas: la actual y cuando pase a ser la anterior
+        self.cache.add(clave_actual, 0, self.duration * 2)
+        try:
+            actual = self.cache.incr(clave_actual)
+        except ValueError:
+            # Expiró entre add() e incr()
+            self.cache.set(clave_actual, 1, self.duration * 2)
+            actual = 1
+        anterior = self.cache.get(f"{self.key}:{ventana - 1}", 0)
+
+        transcurrido = (ahora % self.duration) / self.duration
+        if anterior * (1 - transcurrido) + actual <= self.num_requests:
+            request._throttle_contados = [*getattr(request, '_throttle_contados', ()), clave_actual]
+            return True
+
+        # Rechazado: no cuenta para la ventana ni en los throttles que ya lo contaron
+        for clave in [clave_actual, *getattr(request, '_throttle_contados', ())]:
+            try:
+                self.cache.decr(clave)
+            except ValueError:
+                pass  # Expiró: ya no cuenta
+        request._throttle_contados = []
+        request._throttle_rechazado = True
+        self._espera = self._calcular_espera(anterior, actual - 1, transcurrido)
+        return False
+
+    def _calcular_espera(self, anterior, actual, transcurrido):
+        """Segundos hasta que el conteo estimado admita un request más."""
+        if actual + 1 <= self.num_requests:
+            # Basta con que decaiga el peso de la ventana anterior
+            fraccion = 1 - (self.num_requests - actual - 1) / anterior
+            return max(0.0, (fraccion - transcurrido) * self.duration)
+        # Hay que esperar a la próxima ventana, donde `actual` pasa a ser la anterior
+        fraccion = max(0.0, 1 - (self.num_requests - 1) / actual) if actual else 0.0
+        return (1 - transcurrido + fraccion) * self.duration
+
+    def wait(self):
+        return math.ceil(getattr(self, '_espera', 0)) or 1
+
+
+class UsuarioThrottle(VentanaDeslizanteThrottle):
+    """Límite global por usuario autenticado."""
+    scope = 'usuario'
+
+    def allow_request(self, request, view):
+        if not request.user or not request.user.is_authenticated:
+            return True
+        return super().allow_request(request, view)
+
+
+class AnonimoThrottle(VentanaDeslizanteThrottle):
+    """Límite global por IP para requests anónimos."""
+    scope = 'anonimo'
+
+    def allow_request(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return True
+        return super().allow_request(request, view)
+
+
+class EndpointThrottle(VentanaDeslizanteThrottle):
+    """
+    Límite por endpoint. El scope se toma de `throttle_scopes[accion]` de
+    la vista, luego de `throttle_scope`, y si no de `SCOPES_POR_ACCION`.
+    Sin scope (o sin tasa configurada) no se limita.
+    """
+    SCOPES_POR_ACCION = {'list': 'listas'}
+
+    def __init__(self):
+        # El scope depende de la vista: se resuelve en allow_request
+        pass
+
+    def allow_request(self, request, view):
+        accion = getattr(view, 'action', None)
+        self.scope = (
+            getattr(view, 'throttle_scopes', {}).get(accion)
+            or getattr(view, 'throttle_scope', None)
+            or self.SCOPES_POR_ACCION.get(accion)
+        )
+        if not self.scope or self.scope not in self.THROTTLE_RATES:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
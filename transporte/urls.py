@@ -9,7 +9,7 @@ from rest_framework.routers import DefaultRouter
 from . import views
 from .views import (
     AeronaveViewSet, CargaViewSet, ClienteViewSet, ConductorViewSet,
-    DespachoViewSet, PilotoViewSet, RutaViewSet, VehiculoViewSet,
+    DespachoViewSet, JobViewSet, PilotoViewSet, RutaViewSet, UbicacionViewSet, VehiculoViewSet,
 )
 
 router = DefaultRouter()
@@ -19,11 +19,40 @@ router.register(r'conductores', ConductorViewSet)
 router.register(r'pilotos', PilotoViewSet)
 router.register(r'clientes', ClienteViewSet)
 router.register(r'cargas', CargaViewSet)
+router.register(r'ubicaciones', UbicacionViewSet)
 router.register(r'rutas', RutaViewSet)
 router.register(r'despachos', DespachoViewSet)
+router.register(r'jobs', JobViewSet, basename='job')
 
 # Vistas HTML (sitio) — rutas nombradas para usar en templates
 extra_patterns = [
+    # Salud del servicio (health check)
+    path('salud/', views.salud, name='salud'),
+
+    # Analítica
+    path('analitica/rutas/', views.AnaliticaRutasView.as_view(), name='analitica_rutas'),
+    path('analitica/ubicaciones/', views.AnaliticaUbicacionesView.as_view(),
+         name='analitica_ubicaciones'),
+    path('analitica/pronostico/', views.AnaliticaPronosticoView.as_view(),
+         name='analitica_pronostico'),
+
+    # Flota
+    path('flota/calendario/', views.CalendarioFlotaView.as_view(), name='flota_calendario'),
+
+    # Auditoría
+    path('auditoria/', views.AuditoriaView.as_view(), name='auditoria'),
+
+    # Alta de carga + despacho en un solo request
+    path('envios/', views.EnvioView.as_view(), name='envios'),
+
+    # Manifiestos del día (trabajo en segundo plano + descarga del ZIP)
+    path('manifiestos/', views.ManifiestosView.as_view(), name='manifiestos'),
+    path('manifiestos/<int:job_id>/', views.ManifiestosDescargaView.as_view(),
+         name='manifiestos_descarga'),
+
+    # Varias llamadas a la API en un solo request
+    path('batch/', views.BatchView.as_view(), name='batch'),
+
     # Vehículos
     path('site/vehiculos/crear/', views.vehiculos_crear, name='vehiculos_crear'),
     path('site/vehiculos/<int:pk>/editar/', views.vehiculos_editar, name='vehiculos_editar'),
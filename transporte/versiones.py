@@ -0,0 +1,41 @@
+"""
+Versiones por tabla para invalidar cachés.
+
+Cada modelo de `transporte` tiene un contador en la caché que se incrementa
+en cada guardado o eliminación (ver `signals.py`). Las claves de caché que
+incluyen la versión quedan obsoletas solas, sin borrar nada explícitamente.
+"""
+
+import time
+
+from django.core.cache import cache
+
+
+def _clave(modelo):
+    return f"version:{modelo._meta.label_lower}"
+
+
+def version_tabla(modelo):
+    """Retorna la versión actual de la tabla del modelo."""
+    clave = _clave(modelo)
+    version = cache.get(clave)
+    if version is None:
+        # Partir desde el reloj evita reutilizar versiones antiguas si la
+        # caché se vació pero quedaron fragmentos de una versión anterior.
+        cache.add(clave, time.time_ns(), None)
+        version = cache.get(clave)
+    return version
+
+
+def version_tablas(*modelos):
+    """Versión combinada de varias tablas (p. ej. despachos + rutas + cargas)."""
+    return ".".join(str(version_tabla(m)) for m in modelos)
+
+
+def incrementar_version(modelo):
+    """Invalida todo lo cacheado con la versión actual de la tabla."""
+    try:
+        cache.incr(_clave(modelo))
+    except ValueError:
+        # La clave no existe (caché vacía o expulsada)
+        version_tabla(modelo)
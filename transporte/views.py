@@ -3,111 +3,834 @@ Vistas y ViewSets para la app transporte.
 Incluye:
 - API REST (ViewSets)
 - Vistas HTML (list, crear, editar, eliminar)
-- Integración CRUD vía API usando requests
+- CRUD HTML con los serializadores del API
 """
 
-import requests
-from django.shortcuts import render, redirect
+import logging
+import time
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Count, ProtectedError, Q, Sum
+from django.db.models.functions import Coalesce
+from django.http import FileResponse
+from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-
-from rest_framework import viewsets
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.functional import SimpleLazyObject
+
+from rest_framework import mixins, status, viewsets
+from rest_framework.exceptions import APIException
+from rest_framework.decorators import action, api_view, permission_classes, throttle_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
 from rest_framework.filters import SearchFilter, OrderingFilter
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
-
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .auditoria import EXCLUIDOS as NO_AUDITADOS
+from .authentication import revocar_token, revocar_usuario
+from .batch import MAXIMO as BATCH_MAXIMO, ejecutar_lote
+from .consolidacion import consolidar, destino as destino_consolidacion
+from .geo import indice as indice_espacial
+from .idempotencia import IdempotenciaMixin, idempotente
+from .jobs import encolar
+from .manifiestos import ruta_zip
 from .models import (
     Vehiculo, Aeronave, Conductor, Piloto, Cliente,
-    Carga, Ruta, Despacho
+    Carga, Ruta, Despacho, DespachoArchivado, DespachoCarga, Job, RegistroAuditoria, Ubicacion,
+    ESTADO_DESPACHO
 )
 
+from .routers import LecturaReplicaMixin, usar_replica
 from .serializers import (
     VehiculoSerializer, AeronaveSerializer, ConductorSerializer, PilotoSerializer,
-    ClienteSerializer, CargaSerializer, RutaSerializer, DespachoSerializer
+    ClienteSerializer, CargaSerializer, RutaSerializer, DespachoSerializer,
+    VehiculoFilaSerializer, AeronaveFilaSerializer, ConductorFilaSerializer,
+    PilotoFilaSerializer, ClienteFilaSerializer, CargaFilaSerializer,
+    RutaFilaSerializer, DespachoFilaSerializer, JobSerializer, EnvioSerializer,
+    UbicacionSerializer, UbicacionFilaSerializer,
 )
+from .versiones import version_tablas
 
-# ==========================================
-# CONFIG API LOCAL
-# ==========================================
-
-API_BASE = "http://127.0.0.1:8000/"
+logger = logging.getLogger(__name__)
 
 
 # ==========================================
 # VIEWSETS DEL API (no tocar)
 # ==========================================
 
-class VehiculoViewSet(viewsets.ModelViewSet):
+class ListaRapidaMixin:
+    """
+    Mixin para ViewSets: la acción `list` arma la respuesta con un
+    `FilaSerializer` (dicts desde `.values()`, una sola consulta) en lugar
+    del ModelSerializer. El resto de las acciones no cambia.
+    """
+    fila_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        # Con paginación se conserva el camino estándar de DRF
+        if self.fila_serializer_class is None or self.paginator is not None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(self.fila_serializer_class.lista(queryset))
+
+
+class RegistroProtegido(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "El registro está referenciado por otros registros y no se puede eliminar."
+    default_code = 'protegido'
+
+
+class ProtegidoMixin:
+    """Convierte el ProtectedError de un borrado en un 409 en lugar de un 500."""
+
+    def perform_destroy(self, instance):
+        try:
+            instance.delete()
+        except ProtectedError:
+            raise RegistroProtegido()
+
+
+def _incluir_archivo(request):
+    return request.query_params.get('incluir_archivo') in ('1', 'true')
+
+
+class VehiculoViewSet(IdempotenciaMixin, LecturaReplicaMixin, ListaRapidaMixin,
+                      viewsets.ModelViewSet):
     """
     API ViewSet para manejar operaciones CRUD de Vehículos.
     Permite filtrar por tipo de transporte, patente y marca.
     """
     queryset = Vehiculo.objects.all()
     serializer_class = VehiculoSerializer
+    fila_serializer_class = VehiculoFilaSerializer
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_fields = ['tipo_transporte', 'patente', 'marca']
     search_fields = ['patente', 'marca', 'modelo']
     ordering_fields = ['patente', 'marca']
 
 
-class AeronaveViewSet(viewsets.ModelViewSet):
+class AeronaveViewSet(IdempotenciaMixin, LecturaReplicaMixin, ListaRapidaMixin,
+                      viewsets.ModelViewSet):
     """
     API ViewSet para manejar operaciones CRUD de Aeronaves.
     """
     queryset = Aeronave.objects.all()
     serializer_class = AeronaveSerializer
+    fila_serializer_class = AeronaveFilaSerializer
 
 
-class ConductorViewSet(viewsets.ModelViewSet):
+class ConductorViewSet(IdempotenciaMixin, LecturaReplicaMixin, ListaRapidaMixin,
+                       viewsets.ModelViewSet):
     """
     API ViewSet para manejar operaciones CRUD de Conductores.
     """
     queryset = Conductor.objects.all()
     serializer_class = ConductorSerializer
+    fila_serializer_class = ConductorFilaSerializer
 
 
-class PilotoViewSet(viewsets.ModelViewSet):
+class PilotoViewSet(IdempotenciaMixin, LecturaReplicaMixin, ListaRapidaMixin,
+                    viewsets.ModelViewSet):
     """
     API ViewSet para manejar operaciones CRUD de Pilotos.
     """
     queryset = Piloto.objects.all()
     serializer_class = PilotoSerializer
+    fila_serializer_class = PilotoFilaSerializer
 
 
-class ClienteViewSet(viewsets.ModelViewSet):
+class ClienteViewSet(ProtegidoMixin, IdempotenciaMixin, LecturaReplicaMixin, ListaRapidaMixin,
+                     viewsets.ModelViewSet):
     """
     API ViewSet para manejar operaciones CRUD de Clientes.
     Permite búsqueda por nombre y RUT.
     """
     queryset = Cliente.objects.all()
     serializer_class = ClienteSerializer
+    fila_serializer_class = ClienteFilaSerializer
     filter_backends = [DjangoFilterBackend, SearchFilter]
     filterset_fields = ['rut']
     search_fields = ['nombre', 'rut']
-
-
-class CargaViewSet(viewsets.ModelViewSet):
+    acciones_replica = ('list', 'retrieve', 'resumen')
+
+    @action(detail=True, methods=['get'])
+    def resumen(self, request, pk=None):
+        """
+        Portafolio del cliente: totales de cargas, despachos por estado y
+        últimos despachos (?limite=N, por defecto 10). Cuentan los despachos
+        que llevan alguna carga del cliente, principal o adicional.
+        Usa un número fijo de consultas sin importar el historial del cliente.
+        """
+        try:
+            limite = min(max(int(request.query_params.get('limite', 10)), 1), 100)
+        except ValueError:
+            return Response({"detail": "limite debe ser un entero."}, status=400)
+
+        # 1) Cliente + totales de sus cargas en una sola consulta agregada
+        cliente = get_object_or_404(
+            Cliente.objects.annotate(
+                total_cargas=Count('cargas'),
+                peso_total_kg=Coalesce(Sum('cargas__peso_kg'), 0),
+                valor_total=Coalesce(Sum('cargas__valor'), 0),
+            ),
+            pk=pk,
+        )
+
+        # Subconsulta para las adicionales: un JOIN repetiría despachos
+        despachos = Despacho.objects.filter(
+            Q(carga__cliente=cliente)
+            | Q(pk__in=DespachoCarga.objects.filter(carga__cliente=cliente).values('despacho_id'))
+        )
+
+        # 2) Despachos agrupados por estado
+        por_estado = dict(
+            despachos.order_by().values_list('estado').annotate(total=Count('id'))
+        )
+
+        # 3) Últimos despachos con sus relaciones en el mismo JOIN
+        ultimos = despachos.select_related(
+            'ruta', 'carga__cliente', 'vehiculo', 'aeronave', 'conductor', 'piloto'
+        ).order_by('-fecha', '-id')[:limite]
+
+        return Response({
+            "cliente": ClienteSerializer(cliente).data,
+            "total_cargas": cliente.total_cargas,
+            "peso_total_kg": cliente.peso_total_kg,
+            "valor_total": cliente.valor_total,
+            "total_despachos": sum(por_estado.values()),
+            "despachos_por_estado": {
+                estado: por_estado.get(estado, 0) for estado, _ in ESTADO_DESPACHO
+            },
+            "ultimos_despachos": DespachoSerializer(ultimos, many=True).data,
+        })
+
+
+class CargaViewSet(ProtegidoMixin, IdempotenciaMixin, LecturaReplicaMixin, ListaRapidaMixin,
+                   viewsets.ModelViewSet):
     """
     API ViewSet para manejar operaciones CRUD de Cargas.
     """
     queryset = Carga.objects.all()
     serializer_class = CargaSerializer
+    fila_serializer_class = CargaFilaSerializer
 
 
-class RutaViewSet(viewsets.ModelViewSet):
+class UbicacionViewSet(ProtegidoMixin, IdempotenciaMixin, LecturaReplicaMixin, ListaRapidaMixin,
+                       viewsets.ModelViewSet):
+    """
+    API ViewSet para manejar operaciones CRUD de Ubicaciones.
+    Las rutas crean sus ubicaciones al guardarse; aquí se corrigen nombres
+    y coordenadas.
+    """
+    queryset = Ubicacion.objects.all()
+    serializer_class = UbicacionSerializer
+    fila_serializer_class = UbicacionFilaSerializer
+    filter_backends = [SearchFilter, OrderingFilter]
+    search_fields = ['nombre', 'clave']
+    ordering_fields = ['nombre']
+    acciones_replica = ('list', 'retrieve', 'cercanas')
+
+    @action(detail=False, methods=['get'])
+    def cercanas(self, request):
+        """
+        GET /ubicaciones/cercanas/?lat=&lon=&k=5
+        Las `k` ubicaciones con coordenadas más cercanas al punto.
+        """
+        try:
+            lat, lon = _coordenadas(request)
+            k = int(request.query_params.get('k') or 5)
+        except ValueError:
+            return Response({"detail": "'k' debe ser entero."}, status=400)
+        except ValidationError as exc:
+            return Response({"detail": exc.messages[0]}, status=400)
+        if not 1 <= k <= 100:
+            return Response({"detail": "'k' debe estar entre 1 y 100."}, status=400)
+
+        distancias = dict(indice_espacial.mas_cercanas(lat, lon, k))
+        return Response(_con_distancia(
+            UbicacionFilaSerializer.lista(Ubicacion.objects.filter(pk__in=distancias)), distancias
+        ))
+
+
+class RutaViewSet(ProtegidoMixin, IdempotenciaMixin, LecturaReplicaMixin, ListaRapidaMixin,
+                  viewsets.ModelViewSet):
     """
     API ViewSet para manejar operaciones CRUD de Rutas.
     """
     queryset = Ruta.objects.all()
     serializer_class = RutaSerializer
-
-
-class DespachoViewSet(viewsets.ModelViewSet):
+    fila_serializer_class = RutaFilaSerializer
+    acciones_replica = ('list', 'retrieve', 'cercanas')
+
+    @action(detail=False, methods=['get'])
+    def cercanas(self, request):
+        """
+        GET /rutas/cercanas/?lat=&lon=&radio_km=50&extremo=origen|destino
+        Rutas cuyo origen (o destino) está a `radio_km` o menos del punto.
+        """
+        extremo = request.query_params.get('extremo', 'origen')
+        if extremo not in ('origen', 'destino'):
+            return Response({"detail": "extremo debe ser 'origen' o 'destino'."}, status=400)
+        try:
+            lat, lon = _coordenadas(request)
+            radio_km = _parametro_float(request, 'radio_km', 50.0)
+        except ValidationError as exc:
+            return Response({"detail": exc.messages[0]}, status=400)
+        if not 0 < radio_km <= 20000:
+            return Response({"detail": "'radio_km' debe estar entre 0 y 20000."}, status=400)
+
+        distancias = dict(indice_espacial.en_radio(lat, lon, radio_km))
+        rutas = Ruta.objects.filter(**{f'ubicacion_{extremo}__in': list(distancias)})
+        return Response(_con_distancia(
+            RutaFilaSerializer.lista(rutas), distancias, campo=f'ubicacion_{extremo}'
+        ))
+
+
+class DespachoViewSet(IdempotenciaMixin, LecturaReplicaMixin, ListaRapidaMixin,
+                      viewsets.ModelViewSet):
     """
     API ViewSet para manejar operaciones CRUD de Despachos.
+    DELETE es una eliminación lógica. Con `?incluir_archivo=1`, el listado
+    y el detalle incluyen también los despachos eliminados lógicamente y los
+    archivados (solo lectura).
+    El detalle de un despacho que se consolidó en otro responde con el
+    despacho que lleva sus cargas y `consolidado_desde` (el id pedido).
     """
     queryset = Despacho.objects.all()
     serializer_class = DespachoSerializer
+    # El detalle de un despacho es la consulta de seguimiento: límite más holgado
+    throttle_scopes = {'retrieve': 'seguimiento'}
+    fila_serializer_class = DespachoFilaSerializer
+    acciones_replica = ('list', 'retrieve', 'atrasados')
+
+    def list(self, request, *args, **kwargs):
+        respuesta = super().list(request, *args, **kwargs)
+        if _incluir_archivo(request) and isinstance(respuesta.data, list):
+            respuesta.data.extend(DespachoFilaSerializer.lista(
+                Despacho.todos.filter(eliminado_en__isnull=False).order_by('pk')
+            ))
+            respuesta.data.extend(DespachoFilaSerializer.lista(DespachoArchivado.objects.order_by('pk')))
+        return respuesta
+
+    def retrieve(self, request, *args, **kwargs):
+        clave = self.lookup_url_kwarg or self.lookup_field
+        pk = self.kwargs[clave]
+        if not str(pk).isdigit() or self.get_queryset().filter(pk=pk).exists():
+            return super().retrieve(request, *args, **kwargs)
+        if _incluir_archivo(request):
+            for historial in (Despacho.todos.filter(eliminado_en__isnull=False), DespachoArchivado.objects):
+                encontrado = DespachoFilaSerializer.lista(historial.filter(pk=pk))
+                if encontrado:
+                    return Response(encontrado[0])
+        destino = destino_consolidacion(int(pk))
+        if destino is None:
+            return super().retrieve(request, *args, **kwargs)
+        self.kwargs[clave] = str(destino)
+        respuesta = self.retrieve(request, *args, **kwargs)
+        respuesta.data['consolidado_desde'] = int(pk)
+        return respuesta
+
+    def perform_destroy(self, instance):
+        instance.eliminar()
+
+    @action(detail=False, methods=['get'])
+    def atrasados(self, request):
+        """
+        GET /despachos/atrasados/
+        Despachos EN_RUTA marcados como atrasados, del más atrasado al menos.
+        """
+        despachos = self.get_queryset().filter(estado='EN_RUTA', atrasado=True).order_by('estado', 'eta')
+        return Response(DespachoFilaSerializer.lista(despachos))
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
+    def consolidar(self, request):
+        """
+        POST /despachos/consolidar/ {"fecha": "2024-05-10", "ruta": 3, "simular": true}
+        Reúne las cargas de los despachos PENDIENTE de una misma ruta y fecha
+        en la menor cantidad de despachos que respete la capacidad de los
+        activos; los que quedan vacíos se eliminan (su detalle muestra el
+        despacho que se llevó sus cargas). `fecha` y `ruta` son
+        filtros opcionales; con `simular` solo se informa el plan.
+        """
+        fecha = request.data.get('fecha')
+        if fecha is not None:
+            try:
+                fecha = parse_date(str(fecha))
+            except ValueError:
+                fecha = None
+            if fecha is None:
+                return Response({"detail": "'fecha' no es una fecha válida (YYYY-MM-DD)."}, status=400)
+        ruta = request.data.get('ruta')
+        if ruta is not None:
+            try:
+                ruta = int(ruta)
+            except (TypeError, ValueError):
+                return Response({"detail": "'ruta' debe ser un id entero."}, status=400)
+        simular = request.data.get('simular') in (True, 'true', '1', 1)
+        return Response(consolidar(fecha=fecha, ruta=ruta, simular=simular))
+
+
+class JobViewSet(IdempotenciaMixin, mixins.CreateModelMixin, mixins.RetrieveModelMixin,
+                 mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    API para encolar trabajos en segundo plano y consultar su estado.
+    POST /jobs/ encola (responde 202); GET /jobs/{id}/ informa el progreso.
+    Cada usuario ve solo sus trabajos.
+    """
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return Job.objects.filter(creado_por_id=self.request.user.pk).order_by('-creado')
+
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        response.status_code = 202
+        return response
+
+    def perform_create(self, serializer):
+        # pk en vez del objeto: con JWT_STATELESS el usuario no es un modelo
+        serializer.save(creado_por_id=self.request.user.pk)
+
+
+# ==========================================
+# ANALÍTICA
+# ==========================================
+
+def _parametro_fecha(request, nombre):
+    valor = request.query_params.get(nombre)
+    if valor in (None, ''):
+        return None
+    try:
+        fecha = parse_date(valor)
+    except ValueError:
+        fecha = None
+    # parse_date retorna None si el formato no es YYYY-MM-DD
+    if fecha is None:
+        raise ValidationError(f"'{nombre}' no es una fecha válida.")
+    return fecha
+
+
+def _ventana_fechas(request, dias_defecto=365):
+    """
+    Lee `desde`/`hasta` (YYYY-MM-DD) de la query string.
+    Por defecto, los últimos `dias_defecto` días hasta hoy.
+    """
+    hasta = _parametro_fecha(request, 'hasta') or timezone.localdate()
+    desde = _parametro_fecha(request, 'desde') or hasta - timedelta(days=dias_defecto)
+    if desde > hasta:
+        raise ValidationError("'desde' debe ser anterior o igual a 'hasta'.")
+    return desde, hasta
+
+
+def _parametro_float(request, nombre, defecto=None):
+    valor = request.query_params.get(nombre)
+    if valor in (None, ''):
+        return defecto
+    try:
+        return float(valor)
+    except ValueError:
+        raise ValidationError(f"'{nombre}' debe ser numérico.")
+
+
+def _coordenadas(request):
+    try:
+        lat = float(request.query_params['lat'])
+        lon = float(request.query_params['lon'])
+    except (KeyError, ValueError):
+        raise ValidationError("'lat' y 'lon' son obligatorios y numéricos.")
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValidationError("'lat' debe estar entre -90 y 90 y 'lon' entre -180 y 180.")
+    return lat, lon
+
+
+def _con_distancia(filas, distancias, campo='id'):
+    """Agrega `distancia_punto_km` a cada fila y las ordena de la más cercana."""
+    for fila in filas:
+        fila['distancia_punto_km'] = round(distancias[fila[campo]], 3)
+    filas.sort(key=lambda fila: fila['distancia_punto_km'])
+    return filas
+
+
+class AnaliticaRutasView(APIView):
+    """
+    GET /analitica/rutas/?desde=&hasta=&costo_km=&costo_kg_km=
+
+    Por ruta: despachos, kg movidos, kg-km, ingresos, ingreso por km y
+    factor de carga promedio. Con `costo_km` o `costo_kg_km` recalcula el
+    escenario (costo y margen) con el camino vectorizado de NumPy.
+    """
+    throttle_scope = 'analitica'
+
+    def get(self, request):
+        # NumPy se importa en el primer uso, no al arrancar el worker
+        from .analitica import cargar_arreglos, metricas_rutas_numpy, metricas_rutas_sql
+
+        try:
+            desde, hasta = _ventana_fechas(request)
+            costo_km = _parametro_float(request, 'costo_km', 0.0)
+            costo_kg_km = _parametro_float(request, 'costo_kg_km', 0.0)
+        except ValidationError as exc:
+            return Response({"detail": exc.messages[0]}, status=400)
+
+        with usar_replica():
+            if costo_km or costo_kg_km or request.query_params.get('motor') == 'numpy':
+                rutas = metricas_rutas_numpy(
+                    cargar_arreglos(desde, hasta), costo_km=costo_km, costo_kg_km=costo_kg_km
+                )
+            else:
+                rutas = metricas_rutas_sql(desde, hasta)
+
+        rutas.sort(key=lambda r: r["ingresos"], reverse=True)
+        return Response({
+            "desde": desde,
+            "hasta": hasta,
+            "total_despachos": sum(r["despachos"] for r in rutas),
+            "rutas": rutas,
+        })
+
+
+class AnaliticaUbicacionesView(APIView):
+    """
+    GET /analitica/ubicaciones/?agrupar=origen|destino|par&desde=&hasta=
+
+    Despachos, kg e ingresos agrupados por ubicación de origen, de destino
+    o por par origen-destino (claves enteras de `Ubicacion`).
+    """
+    throttle_scope = 'analitica'
+
+    def get(self, request):
+        from .analitica import AGRUPACIONES_UBICACION, despachos_por_ubicacion
+
+        agrupar = request.query_params.get('agrupar', 'origen')
+        if agrupar not in AGRUPACIONES_UBICACION:
+            return Response(
+                {"detail": f"agrupar debe ser uno de: {', '.join(AGRUPACIONES_UBICACION)}."},
+                status=400,
+            )
+        try:
+            desde, hasta = _ventana_fechas(request)
+        except ValidationError as exc:
+            return Response({"detail": exc.messages[0]}, status=400)
+
+        with usar_replica():
+            grupos = despachos_por_ubicacion(desde, hasta, agrupar)
+        return Response({"desde": desde, "hasta": hasta, "agrupar": agrupar, "grupos": grupos})
+
+
+class AnaliticaPronosticoView(APIView):
+    """
+    GET /analitica/pronostico/?ruta=&dias=28
+
+    Despachos y kg esperados por día y por ruta para los próximos `dias`
+    (1 a 90), con estacionalidad semanal y tendencia ajustadas sobre la
+    historia reciente. El ajuste de todas las rutas se guarda en caché
+    hasta que cambian los despachos.
+    """
+    throttle_scope = 'analitica'
+
+    def get(self, request):
+        from .analitica import MAXIMO_DIAS, pronostico_rutas
+
+        try:
+            dias = int(request.query_params.get('dias') or 28)
+            ruta = request.query_params.get('ruta')
+            ruta = int(ruta) if ruta else None
+        except ValueError:
+            return Response({"detail": "'dias' y 'ruta' deben ser enteros."}, status=400)
+        if not 1 <= dias <= MAXIMO_DIAS:
+            return Response({"detail": f"'dias' debe estar entre 1 y {MAXIMO_DIAS}."}, status=400)
+
+        # La ruta se busca en la misma base que el pronóstico
+        with usar_replica():
+            resultado = pronostico_rutas(dias, ruta=ruta)
+        if resultado is None:
+            return Response({"detail": "Ruta no encontrada."}, status=404)
+        return Response(resultado)
+
+
+class CalendarioFlotaView(APIView):
+    """
+    GET /flota/calendario/?desde=&hasta=&tipo=&formato=
+
+    Días ocupados por cada vehículo, aeronave, conductor y piloto como
+    bitset en base64 (ver `transporte.flota`). `tipo` limita a un tipo de
+    activo; `formato=fechas` agrega la lista explícita de días ocupados.
+    Por defecto, los próximos 90 días desde hoy.
+    """
+
+    def get(self, request):
+        # NumPy se importa en el primer uso, no al arrancar el worker
+        from .flota import MAX_DIAS as MAX_DIAS_CALENDARIO, TIPOS_ACTIVO, calendario
+
+        try:
+            desde = _parametro_fecha(request, 'desde') or timezone.localdate()
+            hasta = _parametro_fecha(request, 'hasta') or desde + timedelta(days=89)
+        except ValidationError as exc:
+            return Response({"detail": exc.messages[0]}, status=400)
+        dias = (hasta - desde).days + 1
+        if not 1 <= dias <= MAX_DIAS_CALENDARIO:
+            return Response(
+                {"detail": f"La ventana debe tener entre 1 y {MAX_DIAS_CALENDARIO} días."},
+                status=400,
+            )
+
+        tipo = request.query_params.get('tipo')
+        if tipo and tipo not in TIPOS_ACTIVO:
+            return Response(
+                {"detail": f"tipo debe ser uno de: {', '.join(TIPOS_ACTIVO)}."}, status=400
+            )
+        tipos = [tipo] if tipo else list(TIPOS_ACTIVO)
+
+        with usar_replica():
+            activos = calendario(
+                desde, hasta, tipos, fechas=request.query_params.get('formato') == 'fechas'
+            )
+        return Response({
+            "desde": desde,
+            "hasta": hasta,
+            "dias": dias,
+            "codificacion": "base64; bit i (LSB primero en cada byte) = día desde + i",
+            "activos": activos,
+        })
+
+
+# ==========================================
+# AUDITORÍA
+# ==========================================
+
+MODELOS_AUDITADOS = {
+    modelo._meta.model_name
+    for modelo in (Vehiculo, Aeronave, Conductor, Piloto, Cliente, Carga, Ruta, Despacho,
+                   Ubicacion)
+    if modelo not in NO_AUDITADOS
+}
+
+
+class AuditoriaView(APIView):
+    """
+    GET /auditoria/?modelo=despacho&id=15&limite=100
+
+    Historial de cambios de un registro (o de todo un modelo si no se indica
+    `id`), del más reciente al más antiguo. Solo para staff.
+    """
+    permission_classes = [IsAdminUser]
+    throttle_scope = 'listas'
+
+    def get(self, request):
+        modelo = request.query_params.get('modelo', '').lower()
+        if modelo not in MODELOS_AUDITADOS:
+            return Response(
+                {"detail": f"'modelo' debe ser uno de: {', '.join(sorted(MODELOS_AUDITADOS))}."},
+                status=400,
+            )
+        try:
+            objeto_id = request.query_params.get('id')
+            objeto_id = int(objeto_id) if objeto_id else None
+            limite = min(int(request.query_params.get('limite') or 100), 1000)
+        except ValueError:
+            return Response({"detail": "'id' y 'limite' deben ser enteros."}, status=400)
+
+        registros = RegistroAuditoria.objects.filter(modelo=modelo)
+        if objeto_id is not None:
+            registros = registros.filter(objeto_id=objeto_id)
+        registros = registros.order_by('-fecha', '-id').values(
+            'id', 'modelo', 'objeto_id', 'accion', 'cambios', 'usuario_id', 'fecha'
+        )[:limite]
+        return Response(list(registros))
+
+
+# ==========================================
+# ENVÍOS
+# ==========================================
+
+class EnvioView(APIView):
+    """
+    POST /envios/
+    {"cliente_rut": "76.123.456-7",
+     "carga": {"descripcion", "peso_kg", "tipo", "valor"},
+     "despacho": {"fecha", "ruta", "vehiculo", ...}}
+
+    Crea la carga y su despacho en una sola transacción y responde 201 con
+    el despacho (incluido su `codigo` de seguimiento). Admite `Idempotency-Key`.
+    """
+
+    def post(self, request):
+        return idempotente(request, lambda: self._crear(request))
+
+    def _crear(self, request):
+        serializer = EnvioSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        despacho = serializer.save()
+        return Response(DespachoSerializer(despacho).data, status=201)
+
+
+# ==========================================
+# MANIFIESTOS
+# ==========================================
+
+class ManifiestosView(APIView):
+    """
+    POST /manifiestos/ {"fecha": "2024-05-10"}
+
+    Encola la generación de los manifiestos del día (un HTML imprimible por
+    vehículo y por aeronave, en un ZIP) y responde 202 con el trabajo.
+    El avance se consulta en /jobs/{id}/ y el ZIP en /manifiestos/{id}/.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        fecha = parse_date(str(request.data.get('fecha') or ''))
+        if fecha is None:
+            return Response({"detail": "'fecha' es obligatoria (YYYY-MM-DD)."}, status=400)
+        job = encolar('generar_manifiestos', usuario=request.user, fecha=str(fecha))
+        return Response(JobSerializer(job).data, status=202)
+
+
+class ManifiestosDescargaView(APIView):
+    """GET /manifiestos/{job_id}/: ZIP de manifiestos de un trabajo completado."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        job = get_object_or_404(
+            Job, pk=job_id, tipo='generar_manifiestos', creado_por_id=request.user.pk,
+        )
+        if job.estado != 'COMPLETADO':
+            return Response(
+                {"detail": "Los manifiestos aún no están listos.",
+                 "estado": job.estado, "progreso": job.progreso},
+                status=409,
+            )
+        ruta = ruta_zip(job.parametros['fecha'], job.pk)
+        if not ruta.exists():
+            return Response({"detail": "El archivo ya no está disponible."}, status=410)
+        return FileResponse(open(ruta, 'rb'), as_attachment=True, filename=ruta.name)
+
+
+# ==========================================
+# BATCH
+# ==========================================
+
+class BatchView(APIView):
+    """
+    POST /batch/
+    {"atomico": false, "solicitudes": [{"id": "rutas", "metodo": "GET", "url": "/rutas/"},
+                                       {"metodo": "PATCH", "url": "/despachos/5/", "cuerpo": {...}}]}
+
+    Ejecuta varias llamadas a los ViewSets en un solo request y responde
+    {"respuestas": [{"id", "status", "cuerpo"}, ...]} en el mismo orden
+    (ver `transporte.batch`). Admite `Idempotency-Key`.
+    """
+
+    def post(self, request):
+        return idempotente(request, lambda: self._procesar(request))
+
+    def _procesar(self, request):
+        datos = request.data if isinstance(request.data, dict) else {}
+        solicitudes = datos.get('solicitudes')
+        if not isinstance(solicitudes, list) or not solicitudes:
+            return Response({"detail": "'solicitudes' debe ser una lista no vacía."}, status=400)
+        if len(solicitudes) > BATCH_MAXIMO:
+            return Response(
+                {"detail": f"Se admiten hasta {BATCH_MAXIMO} solicitudes por lote."}, status=400
+            )
+        atomico = datos.get('atomico') in (True, 'true', '1', 1)
+        return Response({"respuestas": ejecutar_lote(request, solicitudes, atomico=atomico)})
+
+
+# ==========================================
+# SALUD DEL SERVICIO
+# ==========================================
+
+def _estadisticas_pool():
+    """
+    Retorna el uso del pool de conexiones de la base de datos por defecto,
+    o None si el backend no usa pool (SQLite o conexiones persistentes).
+    """
+    pool = getattr(connection, "pool", None)
+    if pool is None:
+        return None
+    stats = pool.get_stats()
+    return {
+        "tamano": stats.get("pool_size", 0),
+        "disponibles": stats.get("pool_available", 0),
+        "en_uso": stats.get("pool_size", 0) - stats.get("pool_available", 0),
+        "min": pool.min_size,
+        "max": pool.max_size,
+        "en_espera": stats.get("requests_waiting", 0),
+    }
+
+
+@api_view(["GET"])
+@permission_classes([AllowAny])
+@throttle_classes([])
+def salud(request):
+    """
+    Health check para el balanceador.
+    Verifica la conexión a la base de datos y reporta el uso del pool.
+    """
+    inicio = time.perf_counter()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+    except Exception:
+        # El detalle (host, driver) va al log, no a la respuesta pública
+        logger.exception("Health check: la base de datos no responde")
+        return Response({"estado": "error", "detalle": "Base de datos no disponible."}, status=503)
+
+    return Response({
+        "estado": "ok",
+        "base_datos": {
+            "motor": connection.vendor,
+            "latencia_ms": round((time.perf_counter() - inicio) * 1000, 2),
+            "conn_max_age": connection.settings_dict.get("CONN_MAX_AGE"),
+            "pool": _estadisticas_pool(),
+        },
+    })
+
+
+# ==========================================
+# AUTENTICACIÓN
+# ==========================================
+
+class TokenLogoutView(APIView):
+    """
+    POST /api/token/logout/ {"refresh": "...", "todos": false}
+    Cierra la sesión JWT: revoca el access token del request y, si se
+    envía, el refresh token del mismo usuario. Con `todos` revoca todos
+    los tokens emitidos al usuario.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        if request.data.get('todos') in (True, 'true', '1', 1):
+            revocar_usuario(request.user.pk)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        refresh = request.data.get('refresh')
+        if refresh:
+            try:
+                refresh = RefreshToken(refresh)
+            except TokenError:
+                return Response({"detail": "'refresh' no es un token válido."}, status=400)
+            if str(refresh.get(jwt_settings.USER_ID_CLAIM)) != str(request.user.pk):
+                return Response({"detail": "'refresh' pertenece a otro usuario."}, status=400)
+            revocar_token(refresh)
+        if request.auth is not None:
+            revocar_token(request.auth)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 # ==========================================
@@ -121,104 +844,202 @@ def home(request):
     Recopila estadísticas de despachos, rutas, clientes y flota para mostrar en gráficos.
     Requiere autenticación.
     """
-    try:
-        # Consumir API para obtener conteos
-        despachos = requests.get(API_BASE + "despachos/").json()
-        rutas = requests.get(API_BASE + "rutas/").json()
-        clientes = requests.get(API_BASE + "clientes/").json()
-        vehiculos = requests.get(API_BASE + "vehiculos/").json()
-        aeronaves = requests.get(API_BASE + "aeronaves/").json()
-
-        # Datos para gráficos
-        transport_types = [len(vehiculos), len(aeronaves)]
-        
-        # Agrupar despachos por estado (ejemplo simple)
-        estados = {}
-        for d in despachos:
-            estado = d.get('estado', 'Desconocido')
-            estados[estado] = estados.get(estado, 0) + 1
-        
-        despachos_labels = list(estados.keys())
-        despachos_data = list(estados.values())
-
+    # Conteos agregados en la base (réplica si hay), sin traer las filas
+    with usar_replica():
+        estados = dict(
+            Despacho.objects.order_by('estado').values_list('estado').annotate(total=Count('id'))
+        )
         context = {
-            "despachos_count": len(despachos),
-            "rutas_count": len(rutas),
-            "clientes_count": sum(1 for c in clientes if c.get('activo')),
-            "transport_types": transport_types,
-            "despachos_labels": despachos_labels,
-            "despachos_data": despachos_data,
+            "despachos_count": sum(estados.values()),
+            "rutas_count": Ruta.objects.count(),
+            "clientes_count": Cliente.objects.filter(activo=True).count(),
+            "transport_types": [Vehiculo.objects.count(), Aeronave.objects.count()],
+            "despachos_labels": list(estados),
+            "despachos_data": list(estados.values()),
         }
-    except Exception:
-        context = {
-            "despachos_count": "-",
-            "rutas_count": "-",
-            "clientes_count": "-",
-            "transport_types": [0, 0],
-            "despachos_labels": [],
-            "despachos_data": [],
-        }
-    
+
     return render(request, "home.html", context)
 
 
+# ==========================================
+# LISTAS HTML (renderizadas en servidor)
+# ==========================================
+
+LISTA_POR_PAGINA = 25
+LISTA_CACHE_SEGUNDOS = 600
+
+
+def _contexto_lista(request, queryset, filtros, dependencias=()):
+    """
+    Arma el contexto de una lista HTML paginada.
+
+    `filtros` mapea cada parámetro GET a su lookup del ORM
+    (ej. {'rut': 'rut__icontains'}). La página se evalúa de forma perezosa:
+    si el fragmento ya está en caché la plantilla no la usa y no se
+    consulta la base. La clave del fragmento incluye la versión de la tabla
+    y de las `dependencias` que se muestran en las filas.
+    """
+    valores = {param: request.GET.get(param, '').strip() for param in filtros}
+    for param, lookup in filtros.items():
+        if valores[param]:
+            try:
+                queryset = queryset.filter(**{lookup: valores[param]})
+            except (ValidationError, ValueError):
+                # Filtro mal formado (ej. fecha inválida): se ignora
+                valores[param] = ''
+
+    paginator = Paginator(queryset, LISTA_POR_PAGINA)
+    numero = request.GET.get('page', '1')
+
+    return {
+        "page_obj": SimpleLazyObject(lambda: paginator.get_page(numero)),
+        "pagina": numero,
+        "filtros": valores,
+        "filtros_qs": urlencode({k: v for k, v in valores.items() if v}),
+        "version": version_tablas(queryset.model, *dependencias),
+        "cache_timeout": LISTA_CACHE_SEGUNDOS,
+    }
+
+
 @login_required
 def despachos_html(request):
     """Renderiza la lista de despachos."""
-    return render(request, "despachos.html")
+    context = _contexto_lista(
+        request,
+        Despacho.objects.select_related('ruta', 'carga').order_by('-fecha', '-id'),
+        {
+            'codigo': 'codigo__icontains',
+            'estado': 'estado',
+            'desde': 'fecha__gte',
+            'hasta': 'fecha__lte',
+        },
+        dependencias=(Ruta, Carga),
+    )
+    return render(request, "despachos.html", context)
 
 
 @login_required
 def rutas_html(request):
     """Renderiza la lista de rutas."""
-    return render(request, "rutas.html")
+    context = _contexto_lista(
+        request,
+        Ruta.objects.order_by('origen', 'destino', 'id'),
+        {
+            'origen': 'origen__icontains',
+            'destino': 'destino__icontains',
+            'tipo_transporte': 'tipo_transporte',
+        },
+    )
+    return render(request, "rutas.html", context)
 
 
 @login_required
 def clientes_html(request):
     """Renderiza la lista de clientes."""
-    return render(request, "clientes.html")
+    context = _contexto_lista(
+        request,
+        Cliente.objects.order_by('nombre', 'id'),
+        {'nombre': 'nombre__icontains', 'rut': 'rut__icontains'},
+    )
+    return render(request, "clientes.html", context)
 
 
 @login_required
 def vehiculos_list(request):
     """Renderiza la lista de vehículos."""
-    return render(request, "vehiculos.html")
+    context = _contexto_lista(
+        request,
+        Vehiculo.objects.order_by('patente'),
+        {'patente': 'patente__icontains', 'marca': 'marca__icontains'},
+    )
+    return render(request, "vehiculos.html", context)
 
 
 @login_required
 def aeronaves_list(request):
     """Renderiza la lista de aeronaves."""
-    return render(request, "aeronaves.html")
+    context = _contexto_lista(
+        request,
+        Aeronave.objects.order_by('codigo'),
+        {'codigo': 'codigo__icontains', 'modelo': 'modelo__icontains'},
+    )
+    return render(request, "aeronaves.html", context)
 
 
 @login_required
 def conductores_list(request):
     """Renderiza la lista de conductores."""
-    return render(request, "conductores.html")
+    context = _contexto_lista(
+        request,
+        Conductor.objects.order_by('apellido', 'nombre', 'id'),
+        {'nombre': 'nombre__icontains', 'licencia': 'licencia__icontains'},
+    )
+    return render(request, "conductores.html", context)
 
 
 @login_required
 def pilotos_list(request):
     """Renderiza la lista de pilotos."""
-    return render(request, "pilotos.html")
+    context = _contexto_lista(
+        request,
+        Piloto.objects.order_by('apellido', 'nombre', 'id'),
+        {'nombre': 'nombre__icontains', 'certificacion': 'certificacion__icontains'},
+    )
+    return render(request, "pilotos.html", context)
 
 
 @login_required
 def cargas_list(request):
     """Renderiza la lista de cargas."""
-    return render(request, "cargas.html")
+    context = _contexto_lista(
+        request,
+        Carga.objects.select_related('cliente').order_by('-id'),
+        {'tipo': 'tipo__icontains', 'descripcion': 'descripcion__icontains'},
+        dependencias=(Cliente,),
+    )
+    return render(request, "cargas.html", context)
+
+
+# ==========================================
+# CRUD HTML
+# ==========================================
+# Los formularios usan los mismos serializadores del API, pero llamándolos
+# directamente: sin requests HTTP internos (que compartían el límite de
+# tasa de 127.0.0.1 entre todos los usuarios del sitio).
+
+def _guardar(serializer_class, data, instancia=None):
+    """Valida y guarda con el serializador del API. Retorna True si se guardó."""
+    serializer = serializer_class(instancia, data=data)
+    if not serializer.is_valid():
+        return False
+    serializer.save()
+    return True
+
+
+def _eliminar(instancia):
+    """
+    Elimina el registro (los despachos, de forma lógica). Retorna False si
+    otros registros lo referencian.
+    """
+    if isinstance(instancia, Despacho):
+        instancia.eliminar()
+        return True
+    try:
+        instancia.delete()
+    except ProtectedError:
+        return False
+    return True
 
 
 # ==========================================
-# CRUD CLIENTES (HTML + API)
+# CRUD CLIENTES
 # ==========================================
 
 @login_required
 def clientes_crear(request):
     """
     Vista para crear un nuevo cliente.
-    Maneja GET para mostrar el formulario y POST para enviar datos a la API.
+    Maneja GET para mostrar el formulario y POST para guardar los datos.
     """
     if request.method == "POST":
         data = {
@@ -228,9 +1049,7 @@ def clientes_crear(request):
             "activo": request.POST.get("estado") == "1",
         }
 
-        resp = requests.post(API_BASE + "clientes/", json=data)
-
-        if resp.status_code == 201:
+        if _guardar(ClienteSerializer, data):
             messages.success(request, "Cliente creado exitosamente.")
             return redirect("clientes_list")
 
@@ -243,10 +1062,9 @@ def clientes_crear(request):
 def clientes_editar(request, pk):
     """
     Vista para editar un cliente existente.
-    Recupera datos actuales vía API y envía actualizaciones vía PUT.
+    Muestra los datos actuales y guarda las modificaciones.
     """
-    # Obtener cliente desde la API
-    cliente = requests.get(API_BASE + f"clientes/{pk}/").json()
+    cliente = get_object_or_404(Cliente, pk=pk)
 
     if request.method == "POST":
         data = {
@@ -256,34 +1074,30 @@ def clientes_editar(request, pk):
             "activo": True if request.POST.get("estado") == "1" else False,
         }
 
-        resp = requests.put(API_BASE + f"clientes/{pk}/", json=data)
-
-        if resp.status_code in (200, 202):
+        if _guardar(ClienteSerializer, data, cliente):
             messages.success(request, "Cliente actualizado correctamente.")
             return redirect("clientes_list")
 
         messages.error(request, "Error al actualizar cliente.")
 
-    return render(request, "clientes/editar.html", {"cliente": cliente})
+    return render(request, "clientes/editar.html", {"cliente": ClienteSerializer(cliente).data})
 
 
 @login_required
 def clientes_eliminar(request, pk):
     """
     Vista para eliminar un cliente.
-    Solicita confirmación y ejecuta DELETE contra la API.
+    Solicita confirmación y elimina el cliente.
     """
     if request.method == "POST":
 
-        resp = requests.delete(API_BASE + f"clientes/{pk}/")
-
-        if resp.status_code in (200, 204):
+        if _eliminar(get_object_or_404(Cliente, pk=pk)):
             messages.success(request, "Cliente eliminado.")
             return redirect("clientes_list")
 
         messages.error(request, "Error al eliminar cliente.")
 
-    cliente = requests.get(API_BASE + f"clientes/{pk}/").json()
+    cliente = ClienteSerializer(get_object_or_404(Cliente, pk=pk)).data
 
     return render(request, "clientes/eliminar.html", {"cliente": cliente})
 
@@ -309,8 +1123,7 @@ def vehiculos_crear(request):
             "capacidad_kg": request.POST.get("capacidad_kg"),
             "tipo_transporte": request.POST.get("tipo_transporte"),
         }
-        resp = requests.post(API_BASE + "vehiculos/", json=data)
-        if resp.status_code == 201:
+        if _guardar(VehiculoSerializer, data):
             messages.success(request, "Vehículo creado exitosamente.")
             return redirect("vehiculos_list")
         messages.error(request, "Error al crear vehículo.")
@@ -328,26 +1141,24 @@ def vehiculos_editar(request, pk):
             "capacidad_kg": request.POST.get("capacidad_kg"),
             "tipo_transporte": request.POST.get("tipo_transporte"),
         }
-        resp = requests.put(API_BASE + f"vehiculos/{pk}/", json=data)
-        if resp.status_code in (200, 202):
+        if _guardar(VehiculoSerializer, data, get_object_or_404(Vehiculo, pk=pk)):
             messages.success(request, "Vehículo actualizado.")
             return redirect("vehiculos_list")
         messages.error(request, "Error al actualizar vehículo.")
 
-    vehiculo = requests.get(API_BASE + f"vehiculos/{pk}/").json()
+    vehiculo = VehiculoSerializer(get_object_or_404(Vehiculo, pk=pk)).data
     return render(request, "vehiculos/editar.html", {"vehiculo": vehiculo})
 
 
 @login_required
 def vehiculos_eliminar(request, pk):
     if request.method == "POST":
-        resp = requests.delete(API_BASE + f"vehiculos/{pk}/")
-        if resp.status_code in (200, 204):
+        if _eliminar(get_object_or_404(Vehiculo, pk=pk)):
             messages.success(request, "Vehículo eliminado.")
             return redirect("vehiculos_list")
         messages.error(request, "Error al eliminar vehículo.")
 
-    vehiculo = requests.get(API_BASE + f"vehiculos/{pk}/").json()
+    vehiculo = VehiculoSerializer(get_object_or_404(Vehiculo, pk=pk)).data
     return render(request, "vehiculos/eliminar.html", {"vehiculo": vehiculo})
 
 
@@ -366,8 +1177,7 @@ def aeronaves_crear(request):
             "modelo": request.POST.get("modelo"),
             "capacidad_kg": request.POST.get("capacidad_kg"),
         }
-        resp = requests.post(API_BASE + "aeronaves/", json=data)
-        if resp.status_code == 201:
+        if _guardar(AeronaveSerializer, data):
             messages.success(request, "Aeronave creada exitosamente.")
             return redirect("aeronaves_list")
         messages.error(request, "Error al crear aeronave.")
@@ -384,13 +1194,12 @@ def aeronaves_editar(request, pk):
             "modelo": request.POST.get("modelo"),
             "capacidad_kg": request.POST.get("capacidad_kg"),
         }
-        resp = requests.put(API_BASE + f"aeronaves/{pk}/", json=data)
-        if resp.status_code in (200, 202):
+        if _guardar(AeronaveSerializer, data, get_object_or_404(Aeronave, pk=pk)):
             messages.success(request, "Aeronave actualizada.")
             return redirect("aeronaves_list")
         messages.error(request, "Error al actualizar aeronave.")
 
-    aeronave = requests.get(API_BASE + f"aeronaves/{pk}/").json()
+    aeronave = AeronaveSerializer(get_object_or_404(Aeronave, pk=pk)).data
     return render(request, "aeronaves/editar.html", {"aeronave": aeronave})
 
 @login_required
@@ -399,13 +1208,12 @@ def aeronaves_eliminar(request, pk):
     Vista para eliminar una aeronave.
     """
     if request.method == "POST":
-        resp = requests.delete(API_BASE + f"aeronaves/{pk}/")
-        if resp.status_code in (200, 204):
+        if _eliminar(get_object_or_404(Aeronave, pk=pk)):
             messages.success(request, "Aeronave eliminada.")
             return redirect("aeronaves_list")
         messages.error(request, "Error al eliminar aeronave.")
 
-    aeronave = requests.get(API_BASE + f"aeronaves/{pk}/").json()
+    aeronave = AeronaveSerializer(get_object_or_404(Aeronave, pk=pk)).data
     return render(request, "aeronaves/eliminar.html", {"aeronave": aeronave})
 
 
@@ -425,8 +1233,7 @@ def conductores_crear(request):
             "licencia": request.POST.get("licencia"),
             "vigente": request.POST.get("vigente") == "1",
         }
-        resp = requests.post(API_BASE + "conductores/", json=data)
-        if resp.status_code == 201:
+        if _guardar(ConductorSerializer, data):
             messages.success(request, "Conductor creado exitosamente.")
             return redirect("conductores_list")
         messages.error(request, "Error al crear conductor.")
@@ -444,13 +1251,12 @@ def conductores_editar(request, pk):
             "licencia": request.POST.get("licencia"),
             "vigente": request.POST.get("vigente") == "1",
         }
-        resp = requests.put(API_BASE + f"conductores/{pk}/", json=data)
-        if resp.status_code in (200, 202):
+        if _guardar(ConductorSerializer, data, get_object_or_404(Conductor, pk=pk)):
             messages.success(request, "Conductor actualizado.")
             return redirect("conductores_list")
         messages.error(request, "Error al actualizar conductor.")
 
-    conductor = requests.get(API_BASE + f"conductores/{pk}/").json()
+    conductor = ConductorSerializer(get_object_or_404(Conductor, pk=pk)).data
     return render(request, "conductores/editar.html", {"conductor": conductor})
 
 @login_required
@@ -459,13 +1265,12 @@ def conductores_eliminar(request, pk):
     Vista para eliminar un conductor.
     """
     if request.method == "POST":
-        resp = requests.delete(API_BASE + f"conductores/{pk}/")
-        if resp.status_code in (200, 204):
+        if _eliminar(get_object_or_404(Conductor, pk=pk)):
             messages.success(request, "Conductor eliminado.")
             return redirect("conductores_list")
         messages.error(request, "Error al eliminar conductor.")
 
-    conductor = requests.get(API_BASE + f"conductores/{pk}/").json()
+    conductor = ConductorSerializer(get_object_or_404(Conductor, pk=pk)).data
     return render(request, "conductores/eliminar.html", {"conductor": conductor})
 
 
@@ -485,8 +1290,7 @@ def pilotos_crear(request):
             "certificacion": request.POST.get("certificacion"),
             "vigente": request.POST.get("vigente") == "1",
         }
-        resp = requests.post(API_BASE + "pilotos/", json=data)
-        if resp.status_code == 201:
+        if _guardar(PilotoSerializer, data):
             messages.success(request, "Piloto creado exitosamente.")
             return redirect("pilotos_list")
         messages.error(request, "Error al crear piloto.")
@@ -504,13 +1308,12 @@ def pilotos_editar(request, pk):
             "certificacion": request.POST.get("certificacion"),
             "vigente": request.POST.get("vigente") == "1",
         }
-        resp = requests.put(API_BASE + f"pilotos/{pk}/", json=data)
-        if resp.status_code in (200, 202):
+        if _guardar(PilotoSerializer, data, get_object_or_404(Piloto, pk=pk)):
             messages.success(request, "Piloto actualizado.")
             return redirect("pilotos_list")
         messages.error(request, "Error al actualizar piloto.")
 
-    piloto = requests.get(API_BASE + f"pilotos/{pk}/").json()
+    piloto = PilotoSerializer(get_object_or_404(Piloto, pk=pk)).data
     return render(request, "pilotos/editar.html", {"piloto": piloto})
 
 @login_required
@@ -519,13 +1322,12 @@ def pilotos_eliminar(request, pk):
     Vista para eliminar un piloto.
     """
     if request.method == "POST":
-        resp = requests.delete(API_BASE + f"pilotos/{pk}/")
-        if resp.status_code in (200, 204):
+        if _eliminar(get_object_or_404(Piloto, pk=pk)):
             messages.success(request, "Piloto eliminado.")
             return redirect("pilotos_list")
         messages.error(request, "Error al eliminar piloto.")
 
-    piloto = requests.get(API_BASE + f"pilotos/{pk}/").json()
+    piloto = PilotoSerializer(get_object_or_404(Piloto, pk=pk)).data
     return render(request, "pilotos/eliminar.html", {"piloto": piloto})
 
 
@@ -547,13 +1349,12 @@ def cargas_crear(request):
             "valor": request.POST.get("valor"),
             "cliente": request.POST.get("cliente"),
         }
-        resp = requests.post(API_BASE + "cargas/", json=data)
-        if resp.status_code == 201:
+        if _guardar(CargaSerializer, data):
             messages.success(request, "Carga creada exitosamente.")
             return redirect("cargas_list")
         messages.error(request, "Error al crear carga.")
     
-    clientes = requests.get(API_BASE + "clientes/").json()
+    clientes = ClienteFilaSerializer.lista(Cliente.objects.all())
     return render(request, "cargas/crear.html", {"clientes": clientes})
 
 @login_required
@@ -569,14 +1370,13 @@ def cargas_editar(request, pk):
             "valor": request.POST.get("valor"),
             "cliente": request.POST.get("cliente"),
         }
-        resp = requests.put(API_BASE + f"cargas/{pk}/", json=data)
-        if resp.status_code in (200, 202):
+        if _guardar(CargaSerializer, data, get_object_or_404(Carga, pk=pk)):
             messages.success(request, "Carga actualizada.")
             return redirect("cargas_list")
         messages.error(request, "Error al actualizar carga.")
 
-    carga = requests.get(API_BASE + f"cargas/{pk}/").json()
-    clientes = requests.get(API_BASE + "clientes/").json()
+    carga = CargaSerializer(get_object_or_404(Carga, pk=pk)).data
+    clientes = ClienteFilaSerializer.lista(Cliente.objects.all())
     return render(request, "cargas/editar.html", {"carga": carga, "clientes": clientes})
 
 @login_required
@@ -585,13 +1385,12 @@ def cargas_eliminar(request, pk):
     Vista para eliminar una carga.
     """
     if request.method == "POST":
-        resp = requests.delete(API_BASE + f"cargas/{pk}/")
-        if resp.status_code in (200, 204):
+        if _eliminar(get_object_or_404(Carga, pk=pk)):
             messages.success(request, "Carga eliminada.")
             return redirect("cargas_list")
         messages.error(request, "Error al eliminar carga.")
 
-    carga = requests.get(API_BASE + f"cargas/{pk}/").json()
+    carga = CargaSerializer(get_object_or_404(Carga, pk=pk)).data
     return render(request, "cargas/eliminar.html", {"carga": carga})
 
 
@@ -611,8 +1410,7 @@ def rutas_crear(request):
             "tipo_transporte": request.POST.get("tipo_transporte"),
             "distancia_km": request.POST.get("distancia_km"),
         }
-        resp = requests.post(API_BASE + "rutas/", json=data)
-        if resp.status_code == 201:
+        if _guardar(RutaSerializer, data):
             messages.success(request, "Ruta creada exitosamente.")
             return redirect("rutas_list")
         messages.error(request, "Error al crear ruta.")
@@ -630,13 +1428,12 @@ def rutas_editar(request, pk):
             "tipo_transporte": request.POST.get("tipo_transporte"),
             "distancia_km": request.POST.get("distancia_km"),
         }
-        resp = requests.put(API_BASE + f"rutas/{pk}/", json=data)
-        if resp.status_code in (200, 202):
+        if _guardar(RutaSerializer, data, get_object_or_404(Ruta, pk=pk)):
             messages.success(request, "Ruta actualizada.")
             return redirect("rutas_list")
         messages.error(request, "Error al actualizar ruta.")
 
-    ruta = requests.get(API_BASE + f"rutas/{pk}/").json()
+    ruta = RutaSerializer(get_object_or_404(Ruta, pk=pk)).data
     return render(request, "rutas/editar.html", {"ruta": ruta})
 
 @login_required
@@ -645,13 +1442,12 @@ def rutas_eliminar(request, pk):
     Vista para eliminar una ruta.
     """
     if request.method == "POST":
-        resp = requests.delete(API_BASE + f"rutas/{pk}/")
-        if resp.status_code in (200, 204):
+        if _eliminar(get_object_or_404(Ruta, pk=pk)):
             messages.success(request, "Ruta eliminada.")
             return redirect("rutas_list")
         messages.error(request, "Error al eliminar ruta.")
 
-    ruta = requests.get(API_BASE + f"rutas/{pk}/").json()
+    ruta = RutaSerializer(get_object_or_404(Ruta, pk=pk)).data
     return render(request, "rutas/eliminar.html", {"ruta": ruta})
 
 
@@ -667,7 +1463,7 @@ def despachos_crear(request):
     """
     if request.method == "POST":
         data = {
-            "codigo": request.POST.get("codigo"),
+            "codigo": request.POST.get("codigo") or None,
             "fecha": request.POST.get("fecha"),
             "ruta": request.POST.get("ruta"),
             "carga": request.POST.get("carga"),
@@ -677,19 +1473,18 @@ def despachos_crear(request):
             "piloto": request.POST.get("piloto") or None,
             "estado": request.POST.get("estado"),
         }
-        resp = requests.post(API_BASE + "despachos/", json=data)
-        if resp.status_code == 201:
+        if _guardar(DespachoSerializer, data):
             messages.success(request, "Despacho creado exitosamente.")
             return redirect("despachos_list")
         messages.error(request, "Error al crear despacho.")
 
     context = {
-        "rutas": requests.get(API_BASE + "rutas/").json(),
-        "cargas": requests.get(API_BASE + "cargas/").json(),
-        "vehiculos": requests.get(API_BASE + "vehiculos/").json(),
-        "aeronaves": requests.get(API_BASE + "aeronaves/").json(),
-        "conductores": requests.get(API_BASE + "conductores/").json(),
-        "pilotos": requests.get(API_BASE + "pilotos/").json(),
+        "rutas": RutaFilaSerializer.lista(Ruta.objects.all()),
+        "cargas": CargaFilaSerializer.lista(Carga.objects.all()),
+        "vehiculos": VehiculoFilaSerializer.lista(Vehiculo.objects.all()),
+        "aeronaves": AeronaveFilaSerializer.lista(Aeronave.objects.all()),
+        "conductores": ConductorFilaSerializer.lista(Conductor.objects.all()),
+        "pilotos": PilotoFilaSerializer.lista(Piloto.objects.all()),
     }
     return render(request, "despachos/crear.html", context)
 
@@ -700,7 +1495,7 @@ def despachos_editar(request, pk):
     """
     if request.method == "POST":
         data = {
-            "codigo": request.POST.get("codigo"),
+            "codigo": request.POST.get("codigo") or None,
             "fecha": request.POST.get("fecha"),
             "ruta": request.POST.get("ruta"),
             "carga": request.POST.get("carga"),
@@ -710,21 +1505,20 @@ def despachos_editar(request, pk):
             "piloto": request.POST.get("piloto") or None,
             "estado": request.POST.get("estado"),
         }
-        resp = requests.put(API_BASE + f"despachos/{pk}/", json=data)
-        if resp.status_code in (200, 202):
+        if _guardar(DespachoSerializer, data, get_object_or_404(Despacho, pk=pk)):
             messages.success(request, "Despacho actualizado.")
             return redirect("despachos_list")
         messages.error(request, "Error al actualizar despacho.")
 
-    despacho = requests.get(API_BASE + f"despachos/{pk}/").json()
+    despacho = DespachoSerializer(get_object_or_404(Despacho, pk=pk)).data
     context = {
         "despacho": despacho,
-        "rutas": requests.get(API_BASE + "rutas/").json(),
-        "cargas": requests.get(API_BASE + "cargas/").json(),
-        "vehiculos": requests.get(API_BASE + "vehiculos/").json(),
-        "aeronaves": requests.get(API_BASE + "aeronaves/").json(),
-        "conductores": requests.get(API_BASE + "conductores/").json(),
-        "pilotos": requests.get(API_BASE + "pilotos/").json(),
+        "rutas": RutaFilaSerializer.lista(Ruta.objects.all()),
+        "cargas": CargaFilaSerializer.lista(Carga.objects.all()),
+        "vehiculos": VehiculoFilaSerializer.lista(Vehiculo.objects.all()),
+        "aeronaves": AeronaveFilaSerializer.lista(Aeronave.objects.all()),
+        "conductores": ConductorFilaSerializer.lista(Conductor.objects.all()),
+        "pilotos": PilotoFilaSerializer.lista(Piloto.objects.all()),
     }
     return render(request, "despachos/editar.html", context)
 
@@ -736,11 +1530,10 @@ def despachos_eliminar(request, pk):
     """
     # Eliminar despacho
     if request.method == "POST":
-        resp = requests.delete(API_BASE + f"despachos/{pk}/")
-        if resp.status_code in (200, 204):
+        if _eliminar(get_object_or_404(Despacho, pk=pk)):
             messages.success(request, "Despacho eliminado.")
             return redirect("despachos_list")
         messages.error(request, "Error al eliminar despacho.")
 
-    despacho = requests.get(API_BASE + f"despachos/{pk}/").json()
+    despacho = DespachoSerializer(get_object_or_404(Despacho, pk=pk)).data
     return render(request, "despachos/eliminar.html", {"despacho": despacho})